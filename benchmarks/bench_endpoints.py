@@ -0,0 +1,82 @@
+# coding: utf8
+
+"""
+Per-call overhead of api methods: old frame introspection vs methods generated by endpoints table.
+Network is not used, _request returns prepared response.
+
+    PYTHONPATH=. python benchmarks/bench_endpoints.py
+"""
+
+import inspect
+import timeit
+from functools import wraps
+
+from yandex_pdd import YandexPdd
+
+RESPONSE = {'success': 'ok', 'uid': 1}
+
+
+def inspect_args_func(frame):
+    """ Arguments of current def, as methods read them before endpoints table """
+    args, _, _, values = inspect.getargvalues(frame)
+    return {key: values[key] for key in args if key != 'self'}
+
+
+def response_full_d(key):
+    """ Full response or only one key, as methods returned it before endpoints table """
+    def wrapper(func):
+        @wraps(func)
+        def authorize_and_call(*args, **kwargs):
+            r = func(*args, **kwargs)
+            if args[0].response_full:
+                return r
+            if type(key) is bool:
+                return key
+            return r[key]
+        return authorize_and_call
+    return wrapper
+
+
+class Legacy(YandexPdd):
+    """ Methods as they were written before endpoints table """
+
+    def _request(self, name, data, method='post'):
+        for key in list(data.keys()):
+            if data[key] is None:
+                del data[key]
+        return RESPONSE
+
+    @response_full_d('uid')
+    def email_add(self, login, password):
+        return self._request('email/add', inspect_args_func(inspect.currentframe()))
+
+    @response_full_d(True)
+    def email_edit(self, login=None, uid=None, password=None, iname=None, fname=None, enabled=None, birth_date=None,
+                   sex=None, hintq=None, hinta=None):
+        if not login and not uid:
+            raise ValueError('Login or uid required')
+        data = inspect_args_func(inspect.currentframe())
+        if data.get('enabled'):
+            data['enabled'] = 'yes' if data['enabled'] else 'no'
+        return self._request('email/edit', data)
+
+
+class Generated(YandexPdd):
+    """ Methods generated by endpoints table """
+
+    def _request(self, name, data, method='post'):
+        return RESPONSE
+
+
+def main(number=200000):
+    for name, client in (('legacy', Legacy('domain.com', 'token')), ('generated', Generated('domain.com', 'token'))):
+        for title, stmt in (
+            ('email_add', lambda: client.email_add('login', 'password')),
+            ('email_edit', lambda: client.email_edit(login='login', iname='Name', enabled=True)),
+        ):
+            seconds = min(timeit.repeat(stmt, number=number, repeat=3))
+            print('%-10s %-12s %8.3f us/call' % (name, title, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# coding: utf8
+
+"""
+Throughput and latency of client against local fake api (FakePddServer) at several concurrency levels:
+paginated email listing, bulk email_add, DNS operations. Results are reproducible without network and token.
+
+    PYTHONPATH=. python benchmarks/bench_fake.py [--latency 0.005] [--accounts 3000] [--ops 300] [--async]
+"""
+
+import argparse
+import asyncio
+import time
+
+from yandex_pdd import BulkJob, YandexPdd
+from yandex_pdd.fake import FakePddServer
+
+DOMAIN = 'bench.local'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Durations(object):
+    """ After request hook collecting durations """
+
+    def __init__(self):
+        self.values = []
+
+    def __call__(self, info):
+        self.values.append(info.duration)
+
+
+def report(name, workers, ops, elapsed, durations):
+    print('%-22s workers=%-3d ops=%-6d %7.2fs %9.1f ops/s  p50=%6.1fms p95=%6.1fms' % (
+        name, workers, ops, elapsed, ops / elapsed if elapsed else 0, percentile(durations, 0.5) * 1000,
+        percentile(durations, 0.95) * 1000))
+
+
+def run(name, server, workers, func):
+    """
+    Run benchmark case
+    :param name: name of case
+    :param server: FakePddServer
+    :param workers: concurrency
+    :param func: callable(client, workers) -> count of operations
+    """
+    durations = Durations()
+    with YandexPdd(DOMAIN, server.token, url=server.url, pool_size=max(workers, 1)) as client:
+        client.add_hook(after=durations)
+        started = time.time()
+        ops = func(client, workers)
+        report(name, workers, ops, time.time() - started, durations.values)
+
+
+def case_list(client, workers):
+    return len(client.email_list_all(workers=workers, on_page=100)) // 100
+
+
+def case_iter(client, workers):
+    return sum(1 for _ in client.iter_emails(on_page=100)) // 100
+
+
+def case_add(ops):
+    def case(client, workers):
+        prefix = 'bench%d_%d' % (workers, time.time() * 1000)
+        specs = [{'login': '%s_%d' % (prefix, i), 'password': 'password'} for i in range(ops)]
+        results = client.email_add_many(specs, workers=workers).results()
+        client.email_del_many([{'login': r.spec['login']} for r in results if r.ok], workers=workers).results()
+        return len(results) * 2
+    return case
+
+
+def case_dns(ops):
+    def case(client, workers):
+        specs = [{'type': 'TXT', 'subdomain': 'bench%d' % i, 'content': 'value%d' % i} for i in range(ops)]
+        desired = client.dns_list() + specs
+        plan = client.sync_dns(desired, workers=workers, keep_types=None)
+        ids = [r.result['record_id'] for _, r in plan.results if r.ok]
+        BulkJob(client.dns_del, [{'record_id': record_id} for record_id in ids], workers=workers).results()
+        return len(ids) * 2 + 2
+    return case
+
+
+def run_async(server, workers, ops):
+    from yandex_pdd import AsyncYandexPdd
+
+    async def main():
+        durations = Durations()
+        async with AsyncYandexPdd(DOMAIN, server.token, url=server.url, pool_size=max(workers, 1)) as client:
+            client.add_hook(after=durations)
+            started = time.time()
+            accounts = await client.email_list_all(workers=workers, on_page=100)
+            report('async email_list_all', workers, len(accounts) // 100, time.time() - started, durations.values)
+            durations.values = []
+            specs = [{'login': 'abench%d_%d' % (workers, i), 'password': 'password'} for i in range(ops)]
+            started = time.time()
+            results = await client.email_add_many(specs, workers=workers).results()
+            await client.email_del_many([{'login': r.spec['login']} for r in results if r.ok],
+                                        workers=workers).results()
+            report('async email_add+del', workers, ops * 2, time.time() - started, durations.values)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.005, help='seconds added by fake server to request')
+    parser.add_argument('--accounts', type=int, default=3000, help='accounts of domain for listing')
+    parser.add_argument('--ops', type=int, default=300, help='operations of bulk cases')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--async', dest='aio', action='store_true', help='run AsyncYandexPdd cases too')
+    args = parser.parse_args()
+
+    with FakePddServer(latency=args.latency) as server:
+        server.add_domain(DOMAIN, accounts=args.accounts)
+        print('fake api %s, latency %.1fms, %d accounts' % (server.url, args.latency * 1000, args.accounts))
+        for workers in args.workers:
+            run('email_list_all pages', server, workers, case_list)
+        run('iter_emails pages', server, 1, case_iter)
+        for workers in args.workers:
+            run('email_add+del', server, workers, case_add(args.ops))
+        for workers in args.workers:
+            run('dns add+del', server, workers, case_dns(args.ops))
+        if args.aio:
+            for workers in args.workers:
+                run_async(server, workers, args.ops)
+        print('requests served: %d' % server.pdd.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# coding: utf8
+
+"""
+Memory and parse time of email_list_all result: response dicts vs typed records (YandexPdd(..., typed=True)),
+stdlib json vs decoder selected by yandex_pdd.records (orjson / ujson when installed).
+
+    PYTHONPATH=. python benchmarks/bench_records.py [--accounts 200000] [--on-page 1000]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from yandex_pdd.records import Account, json_loads, records_convert
+
+
+def pages(accounts, on_page):
+    """
+    Response bodies of email/list
+    :return: list of bytes
+    """
+    ret = []
+    for start in range(0, accounts, on_page):
+        ret.append(json.dumps({
+            'success': 'ok', 'page': start // on_page + 1, 'on_page': on_page, 'total': accounts, 'found': accounts,
+            'pages': (accounts + on_page - 1) // on_page,
+            'accounts': [{
+                'login': 'user%d@domain.com' % i, 'uid': 1130000000000000 + i, 'enabled': 'yes', 'ready': 'yes',
+                'maillist': 'no', 'iname': 'Name%d' % (i % 500), 'fname': '', 'sex': 0, 'birth_date': '',
+                'hintq': '', 'aliases': [],
+            } for i in range(start, min(accounts, start + on_page))],
+        }).encode('utf8'))
+    return ret
+
+
+def parse(bodies, loads, typed):
+    ret = []
+    for body in bodies:
+        r = loads(body)
+        if typed:
+            r = records_convert(r, 'accounts', Account)
+        ret += r['accounts']
+    return ret
+
+
+def measure(name, bodies, loads, typed):
+    gc.collect()
+    started = time.perf_counter()
+    parse(bodies, loads, typed)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    ret = parse(bodies, loads, typed)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-20s %8.3fs  kept %8.1f MB  peak %8.1f MB  %6d bytes/account' % (
+        name, elapsed, size / 2.0 ** 20, peak / 2.0 ** 20, size // len(ret)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=200000)
+    parser.add_argument('--on-page', type=int, default=1000)
+    args = parser.parse_args()
+
+    bodies = pages(args.accounts, args.on_page)
+    print('%d accounts, %.1f MB of json, decoder %s' % (
+        args.accounts, sum(len(b) for b in bodies) / 2.0 ** 20, json_loads.__module__))
+    measure('dicts, json', bodies, json.loads, False)
+    measure('dicts, decoder', bodies, json_loads, False)
+    measure('records, json', bodies, json.loads, True)
+    measure('records, decoder', bodies, json_loads, True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# coding: utf8
+
+"""
+Import time of package and per-call latency of transports (http, requests) against local fake api.
+
+    PYTHONPATH=. python benchmarks/bench_transport.py [--calls 2000] [--workers 1,8]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.fake import FakePddServer
+from yandex_pdd.transport import HTTP, REQUESTS
+
+DOMAIN = 'bench.local'
+
+
+def import_time(statement, repeat=5):
+    """
+    Best wall time of statement in fresh interpreter
+    :return: seconds
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.time()
+        subprocess.check_call([sys.executable, '-c', statement])
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_calls(server, transport, workers, calls):
+    durations = []
+    with YandexPdd(DOMAIN, server.token, url=server.url, pool_size=workers, transport=transport) as app:
+        app.hooks_after = (lambda info: durations.append(info.duration),)
+        app.domain_details()  # connect
+        durations.clear()
+        started = time.time()
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(lambda _: app.email_counters(login='user0'), range(calls)))
+        elapsed = time.time() - started
+    durations.sort()
+    print('%-9s workers=%-3d calls=%-6d %7.2fs %9.1f calls/s  p50=%6.3fms p95=%6.3fms' % (
+        transport, workers, calls, elapsed, calls / elapsed, durations[len(durations) // 2] * 1000,
+        durations[int(len(durations) * 0.95)] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--workers', default='1,8')
+    args = parser.parse_args()
+
+    base = import_time('pass')
+    for statement in ('import yandex_pdd', 'import yandex_pdd; yandex_pdd.AsyncYandexPdd', 'import requests'):
+        print('%-50s %7.1fms' % (statement, (import_time(statement) - base) * 1000))
+
+    with FakePddServer() as server:
+        server.add_domain(DOMAIN, accounts=10)
+        for workers in [int(w) for w in args.workers.split(',')]:
+            for transport in (HTTP, REQUESTS):
+                bench_calls(server, transport, workers, args.calls)
+
+
+if __name__ == '__main__':
+    main()
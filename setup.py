@@ -10,7 +10,13 @@ setup(name='yandex_pdd',
       author_email='n@akolka.ru',
       license='MIT',
       packages=['yandex_pdd'],
-      install_requires=[
-          'requests',
-      ],
+      python_requires='>=3.7',
+      extras_require={
+          'requests': ['requests'],
+          'async': ['aiohttp'],
+          'fast': ['orjson'],
+      },
+      entry_points={
+          'console_scripts': ['yandex-pdd = yandex_pdd.cli:main'],
+      },
       zip_safe=False)
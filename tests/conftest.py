@@ -0,0 +1,11 @@
+# coding: utf8
+
+import pytest
+
+from yandex_pdd.fake import FakePddServer
+
+
+@pytest.fixture
+def server():
+    with FakePddServer() as server:
+        yield server
@@ -0,0 +1,58 @@
+# coding: utf8
+
+import asyncio
+import time
+
+import pytest
+
+from yandex_pdd import YandexPddExceptionY
+
+aio = pytest.importorskip('yandex_pdd.aio')
+
+
+def run(server, func, **kwargs):
+    async def main():
+        async with aio.AsyncYandexPdd('domain.com', server.token, url=server.url, **kwargs) as client:
+            return await func(client)
+    return asyncio.run(main())
+
+
+def test_methods_are_coroutines(server):
+    server.add_domain('domain.com')
+
+    async def func(client):
+        uid = await client.email_add('user', 'secret')
+        assert await client.email_edit(uid=uid, iname='Name') is True
+        with pytest.raises(YandexPddExceptionY) as e:
+            await client.email_add('user', 'secret')
+        assert e.value.args[0] == 'occupied'
+        return await client.email_list_all()
+
+    accounts = run(server, func, typed=True)
+    assert [(a.login, a.iname) for a in accounts] == [('user@domain.com', 'Name')]
+
+
+def test_requests_run_concurrently(server):
+    server.add_domain('domain.com')
+    server.pdd.latency = 0.1
+
+    async def func(client):
+        started = time.time()
+        await asyncio.gather(*[client.email_add('user%d' % i, 'secret') for i in range(20)])
+        return time.time() - started
+
+    assert run(server, func) < 1.0
+    assert len(server.pdd.domains['domain.com'].accounts) == 20
+
+
+def test_lists_and_bulk(server):
+    server.add_domain('domain.com', accounts=75)
+
+    async def func(client):
+        logins = [a['login'] async for a in client.iter_emails(on_page=30)]
+        assert logins == [a['login'] for a in await client.email_list_all(on_page=30)]
+        results = await client.email_del_many(logins[:10], workers=4).results()
+        assert all(r.ok for r in results)
+        return await client.email_list_all(on_page=30)
+
+    assert len(run(server, func)) == 65
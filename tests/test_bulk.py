@@ -0,0 +1,60 @@
+# coding: utf8
+
+import threading
+import time
+
+from yandex_pdd import YandexPdd
+
+
+def test_email_add_many_results(server):
+    server.add_domain('domain.com', accounts=1)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    done = []
+    specs = [('user%d' % i, 'secret') for i in range(40)]
+    job = client.email_add_many(specs, workers=8, on_done=done.append)
+    results = job.results()
+    assert [r.spec for r in results] == specs
+    assert results[0].error.args[0] == 'occupied'
+    assert all(r.ok for r in results[1:])
+    assert (job.total, job.ok, job.failed) == (40, 39, 1)
+    assert done == [job]
+    assert job.report().startswith('40 items, 39 ok, 1 failed')
+
+
+def test_concurrency_bounded(server):
+    server.add_domain('domain.com')
+    handle = server.pdd.handle
+    lock = threading.Lock()
+    running = [0, 0]  # now, max
+
+    def slow(method, path, data, token):
+        # Handlers run under lock of FakePdd: requests in flight are counted before it
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return handle(method, path, data, token)
+
+    server.pdd.handle = slow
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    assert all(r.ok for r in client.email_add_many([('user%d' % i, 'secret') for i in range(30)], workers=4))
+    assert 1 < running[1] <= 4
+
+
+def test_specs_taken_lazily(server):
+    server.add_domain('domain.com', accounts=50)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    taken = []
+
+    def specs():
+        for i in range(50):
+            taken.append(i)
+            yield 'user%d' % i
+
+    job = iter(client.email_del_many(specs(), workers=4))
+    next(job)
+    assert len(taken) <= 9
+    assert len(list(job)) == 49
+    assert not server.pdd.domains['domain.com'].accounts
@@ -0,0 +1,53 @@
+# coding: utf8
+
+import time
+
+from yandex_pdd import ResponseCache, YandexPdd
+
+
+def test_get_cached_until_mutation(server):
+    server.add_domain('domain.com', records=2)
+    client = YandexPdd('domain.com', server.token, url=server.url, cache=True)
+    assert len(client.dns_list()) == 2
+    assert len(client.dns_list()) == 2
+    assert server.pdd.requests == 1
+    client.dns_add('A', content='10.1.1.1', subdomain='new')
+    assert len(client.dns_list()) == 3
+    assert server.pdd.requests == 3
+    assert client.cache.stats()['hits'] == 1
+
+
+def test_mutation_keeps_other_paths(server):
+    server.add_domain('domain.com', accounts=1)
+    client = YandexPdd('domain.com', server.token, url=server.url, cache=True)
+    client.deputy_list()
+    client.dkim_status()
+    client.deputy_add(login='user0')
+    assert client.deputy_list() == ['user0']
+    client.dkim_status()
+    assert server.pdd.requests == 4
+
+
+def test_cache_shared_by_domain_and_expires(server):
+    server.add_domain('one.com')
+    server.add_domain('two.com')
+    cache = ResponseCache(ttls={'dns/list': 0.2})
+    one = YandexPdd('one.com', server.token, url=server.url, cache=cache)
+    two = YandexPdd('two.com', server.token, url=server.url, cache=cache)
+    one.dns_list()
+    two.dns_list()
+    YandexPdd('one.com', server.token, url=server.url, cache=cache).dns_list()
+    assert server.pdd.requests == 2
+    two.dns_add('A', content='10.1.1.1')
+    one.dns_list()
+    assert server.pdd.requests == 3
+    time.sleep(0.25)
+    one.dns_list()
+    assert server.pdd.requests == 4
+
+
+def test_cached_response_is_copy(server):
+    server.add_domain('domain.com', records=1)
+    client = YandexPdd('domain.com', server.token, url=server.url, cache=True)
+    client.dns_list()[0]['content'] = 'changed'
+    assert client.dns_list()[0]['content'] != 'changed'
@@ -0,0 +1,71 @@
+# coding: utf8
+
+import pytest
+
+from yandex_pdd import Checkpoint, RetryPolicy, YandexPdd
+from yandex_pdd.fake import FakeError
+
+SPECS = [('user%d' % i, 'password') for i in range(3)]
+
+
+@pytest.fixture
+def client(server):
+    server.add_domain('domain.com')
+    return YandexPdd('domain.com', server.token, url=server.url)
+
+
+def add_many(client, path, specs=SPECS):
+    with Checkpoint(path) as checkpoint:
+        job = client.email_add_many(specs, workers=2).resume(checkpoint, 'migration')
+        return job, job.results()
+
+
+def test_resume_skips_done_items(server, client, tmp_path):
+    path = str(tmp_path / 'job.checkpoint')
+    add_many(client, path, SPECS[:2])
+    requests = server.pdd.requests
+    job, results = add_many(client, path)
+    assert job.restored == 2
+    assert all(r.ok for r in results)
+    assert server.pdd.requests == requests + 1
+
+
+def test_resume_after_truncated_line(server, client, tmp_path):
+    path = str(tmp_path / 'job.checkpoint')
+    add_many(client, path, SPECS[:1])
+    with open(path, 'a', encoding='utf8') as f:
+        f.write('{"event": "done", "job": "migra')  # crash while event was written
+    job, _ = add_many(client, path, SPECS[:2])
+    assert job.restored == 1
+    requests = server.pdd.requests
+    job, results = add_many(client, path, SPECS[:2])
+    assert job.restored == 2
+    assert all(r.ok for r in results)
+    assert server.pdd.requests == requests
+    with open(path, encoding='utf8') as f:
+        assert all(line.endswith('\n') for line in f)
+
+
+def test_list_walk_continues_from_failed_page(server, tmp_path):
+    server.add_domain('domain.com', accounts=100)
+    email_list = server.pdd.email_list
+    pages = []
+    failed = []
+
+    def failing(domain, data):
+        pages.append(int(data['page']))
+        if int(data['page']) == 3 and not failed:
+            failed.append(data)
+            raise FakeError('no_reply')
+        return email_list(domain, data)
+
+    server.pdd.email_list = failing
+    client = YandexPdd('domain.com', server.token, url=server.url, retry=RetryPolicy(retries=0))
+    with Checkpoint(str(tmp_path / 'list.checkpoint')) as checkpoint:
+        with pytest.raises(Exception):
+            client.email_list_all(on_page=10, checkpoint=checkpoint)
+        del pages[:]
+        accounts = client.email_list_all(on_page=10, checkpoint=checkpoint)
+        assert checkpoint.job('domain.com email_list.accounts on_page=10') is None
+    assert len(accounts) == 100
+    assert pages == [3]
@@ -0,0 +1,68 @@
+# coding: utf8
+
+import json
+import time
+
+import pytest
+
+from yandex_pdd.cli import Batch, main, operation_parse, client_methods
+
+
+def lines(ops):
+    return [json.dumps(op) for op in ops]
+
+
+def test_operation_args_checked():
+    methods = client_methods()
+    operation_parse(0, '{"method": "email_add", "args": ["login", "password"]}', 'domain.com', methods)
+    with pytest.raises(ValueError):
+        operation_parse(0, '{"method": "email_add", "args": ["login"]}', 'domain.com', methods)
+    with pytest.raises(ValueError):
+        operation_parse(0, '{"method": "email_edit", "kwargs": {"login": "a", "nick": "b"}}', 'domain.com', methods)
+
+
+def test_helpers_are_not_operations():
+    methods = client_methods()
+    assert 'email_add' in methods
+    for name in ('close', 'add_hook', 'email_edit_queue', 'import_watch'):
+        assert name not in methods
+
+
+def test_results_in_input_order(server):
+    server.add_domain('domain.com')
+    ops = [{'method': 'email_add', 'args': ['user%d' % i, 'password']} for i in range(20)]
+    ops.insert(5, {'method': 'unknown'})
+    with Batch(server.token, domain='domain.com', workers=4, url=server.url) as batch:
+        results = list(batch.run(lines(ops)))
+    assert [r['line'] for r in results] == list(range(21))
+    assert [r['ok'] for r in results].count(False) == 1
+    assert batch.offset == 21
+    assert len(server.pdd.domains['domain.com'].accounts) == 20
+
+
+def test_waiting_results_limited(server):
+    server.add_domain('domain.com')
+    email_add = server.pdd.email_add
+
+    def slow(domain, data):
+        if data['login'] == 'user0':
+            time.sleep(0.3)
+        return email_add(domain, data)
+
+    server.pdd.email_add = slow
+    ops = [{'method': 'email_add', 'args': ['user%d' % i, 'password']} for i in range(200)]
+    sizes = []
+    with Batch(server.token, domain='domain.com', workers=2, url=server.url) as batch:
+        for _ in batch.run(lines(ops)):
+            sizes.append(len(batch._finished))
+    assert len(sizes) == 200
+    assert max(sizes) <= 2 * batch.buffer
+
+
+def test_dry_run(tmp_path, capsys):
+    path = tmp_path / 'ops.jsonl'
+    path.write_text('\n'.join(lines([{'method': 'email_add', 'args': ['login', 'password']},
+                                     {'method': 'email_add', 'args': ['login']}])), encoding='utf8')
+    assert main([str(path), '--dry-run', '--domain', 'domain.com']) == 1
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r['ok'] for r in results] == [True, False]
@@ -0,0 +1,78 @@
+# coding: utf8
+
+import threading
+
+from yandex_pdd import Subscriber, SingleFlight, YandexPdd
+from yandex_pdd.fake import FakePddServer
+
+
+def test_callers_get_own_copies():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def func():
+        started.set()
+        release.wait(5)
+        return {'items': [1, 2]}
+
+    def call():
+        results.append(flight.do('key', func))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['coalesced'] < 4:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+    assert len({id(r) for r in results}) == 5
+    assert all(r == {'items': [1, 2]} for r in results)
+
+
+def test_coalesced_typed_records():
+    with FakePddServer(latency=0.05) as server:
+        server.add_domain('domain.com', accounts=20, maillists=1)
+        flight = SingleFlight()
+        results = []
+
+        def run():
+            client = YandexPdd('domain.com', server.token, url=server.url, typed=True, coalesce=flight)
+            for _ in range(5):
+                results.append(client.email_ml_subscribers('list0'))
+
+        threads = [threading.Thread(target=run) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert flight.coalesced
+    assert len(results) == 80
+    for subscribers in results:
+        assert len(subscribers) == 20
+        assert all(isinstance(s, Subscriber) and isinstance(s.email, str) for s in subscribers)
+
+
+def test_new_leader_after_completion():
+    flight = SingleFlight()
+    errors = []
+
+    def run():
+        for i in range(2000):
+            try:
+                assert flight.do('key', lambda: {'i': i}) is not None
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert flight.stats()['in_flight'] == 0
@@ -0,0 +1,57 @@
+# coding: utf8
+
+import asyncio
+
+import pytest
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.fake import FakeError
+
+
+def test_collect_counters(server):
+    server.add_domain('domain.com', accounts=45)
+    server.pdd.domains['domain.com'].accounts['user3@domain.com']['counters'] = {'unread': 7, 'new': 2}
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    counters = client.collect_counters(workers=8, on_page=20)
+    assert len(counters) == 45
+    assert counters['user3@domain.com'] == {'unread': 7, 'new': 2}
+    assert server.pdd.requests == 3 + 45
+
+
+def test_counters_kept_for_ttl(server):
+    server.add_domain('domain.com', accounts=10)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    client.collect_counters(cache_ttl=60)
+    assert server.pdd.requests == 11
+    assert len(client.collect_counters(cache_ttl=60)) == 10
+    assert server.pdd.requests == 12
+    client.collect_counters()
+    assert server.pdd.requests == 23
+
+
+def test_failed_accounts_reported(server):
+    server.add_domain('domain.com', accounts=10)
+    email_counters = server.pdd.email_counters
+
+    def failing(domain, data):
+        if data.get('login') == 'user3@domain.com':
+            raise FakeError('no_reply')
+        return email_counters(domain, data)
+
+    server.pdd.email_counters = failing
+    errors = []
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    counters = client.collect_counters(on_error=lambda account, e: errors.append((account['login'], e.args[0])))
+    assert len(counters) == 9
+    assert errors == [('user3@domain.com', 'no_reply')]
+
+
+def test_collect_counters_async(server):
+    aio = pytest.importorskip('yandex_pdd.aio')
+    server.add_domain('domain.com', accounts=25)
+
+    async def collect():
+        async with aio.AsyncYandexPdd('domain.com', server.token, url=server.url) as client:
+            return await client.collect_counters(on_page=10)
+
+    assert sorted(asyncio.run(collect())) == sorted(server.pdd.domains['domain.com'].accounts)
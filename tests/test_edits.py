@@ -0,0 +1,77 @@
+# coding: utf8
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from yandex_pdd import YandexPdd, YandexPddExceptionY
+
+
+def test_edits_merged(server):
+    server.add_domain('domain.com', accounts=2)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    with client.email_edit_queue(window=0.2) as queue:
+        futures = [queue.edit('user0', iname='Ivan', fname='Petrov'), queue.edit('User0@domain.com', iname='Ivan2'),
+                   queue.edit('user0', enabled=False), queue.edit('user1', fname='Sidorov')]
+        assert all(future.result(5) is True for future in futures)
+        assert queue.stats()['merged'] == 2
+    accounts = server.pdd.domains['domain.com'].accounts
+    assert (accounts['user0@domain.com']['iname'], accounts['user0@domain.com']['fname']) == ('Ivan2', 'Petrov')
+    assert accounts['user1@domain.com']['fname'] == 'Sidorov'
+    assert server.pdd.requests == 2
+
+
+def test_error_set_to_all_edits(server):
+    server.add_domain('domain.com')
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    with client.email_edit_queue(window=0.05) as queue:
+        futures = [queue.edit('missing', iname='Ivan'), queue.edit('missing', fname='Petrov')]
+        for future in futures:
+            with pytest.raises(YandexPddExceptionY):
+                future.result(5)
+        with pytest.raises(ValueError):
+            queue.edit('missing', unknown='value')
+
+
+def test_mailbox_edits_not_concurrent(server):
+    server.add_domain('domain.com', accounts=1)
+    handle = server.pdd.handle
+    lock = threading.Lock()
+    running = [0, 0]  # now, max
+
+    def slow(method, path, data, token):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return handle(method, path, data, token)
+
+    server.pdd.handle = slow
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    with client.email_edit_queue(window=0, workers=4) as queue:
+        queue.edit('user0', iname='First')
+        time.sleep(0.05)
+        queue.edit('user0', iname='Second')
+        queue.flush(5)
+    assert running[1] == 1
+    assert server.pdd.domains['domain.com'].accounts['user0@domain.com']['iname'] == 'Second'
+
+
+def test_async_edits_merged(server):
+    aio = pytest.importorskip('yandex_pdd.aio')
+    server.add_domain('domain.com', accounts=1)
+
+    async def edit():
+        async with aio.AsyncYandexPdd('domain.com', server.token, url=server.url) as client:
+            async with client.email_edit_queue(window=0.1) as queue:
+                results = await asyncio.gather(queue.edit('user0', iname='Ivan'), queue.edit('user0', fname='Petrov'))
+                return results, queue.stats()
+
+    results, stats = asyncio.run(edit())
+    assert results == [True, True]
+    assert (stats['edits'], stats['requests']) == (2, 1)
+    assert server.pdd.domains['domain.com'].accounts['user0@domain.com']['fname'] == 'Petrov'
@@ -0,0 +1,38 @@
+# coding: utf8
+
+import inspect
+
+import pytest
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.yandex_pdd import inspect_args_func, response_full_d
+
+
+def test_generated_methods(server):
+    server.add_domain('domain.com')
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    assert list(inspect.signature(YandexPdd.email_add).parameters) == ['self', 'login', 'password']
+    uid = client.email_add('user', 'secret')
+    assert client.email_edit(uid=uid, iname='Name') is True
+    with pytest.raises(TypeError):
+        client.email_add('user')
+    full = YandexPdd('domain.com', server.token, url=server.url, response_full=True)
+    assert full.email_list()['accounts'][0]['iname'] == 'Name'
+
+
+def test_deprecated_helpers():
+    with pytest.warns(DeprecationWarning):
+        wrap = response_full_d('uid')
+
+    class Client(object):
+        response_full = False
+
+        @wrap
+        def email_add(self, login, password=None):
+            return dict(inspect_args_func(inspect.currentframe()), uid=1)
+
+    with pytest.warns(DeprecationWarning):
+        assert Client().email_add('user') == 1
+    Client.response_full = True
+    with pytest.warns(DeprecationWarning):
+        assert Client().email_add('user') == {'login': 'user', 'password': None, 'uid': 1}
@@ -0,0 +1,35 @@
+# coding: utf8
+
+import pytest
+
+from yandex_pdd import RetryPolicy, YandexPdd, YandexPddExceptionY
+from yandex_pdd.fake import FakePdd, FakePddServer
+
+
+def test_errors_of_fake():
+    pdd = FakePdd(token='token', rate_limit=2)
+    pdd.add_domain('domain.com')
+    assert pdd.handle('GET', '/api2/admin/dns/list', {'domain': 'domain.com'}, 'other')['error'] == 'bad_token'
+    assert pdd.handle('GET', '/api2/admin/handle', {'domain': 'domain.com'}, 'token')['error'] == 'unknown_method'
+    assert pdd.handle('GET', '/api2/admin/dns/list', {'domain': 'other.com'}, 'token')['error'] == 'bad_domain'
+    assert pdd.handle('GET', '/api2/admin/dns/list', {'domain': 'domain.com'}, 'token')['error'] == 'too_many_requests'
+
+
+def test_random_errors_retried():
+    with FakePddServer(error_rate=0.3, seed=1) as server:
+        server.add_domain('domain.com', accounts=40)
+        client = YandexPdd('domain.com', server.token, url=server.url, retry=RetryPolicy(retries=10, backoff=0.001, jitter=False))
+        assert len(client.email_list_all(on_page=5)) == 40
+        assert server.pdd.requests > 8
+        with pytest.raises(YandexPddExceptionY):
+            for _ in range(20):
+                YandexPdd('domain.com', server.token, url=server.url).dns_list()
+
+
+def test_registration_polls(server):
+    server.pdd.registration_polls = 2
+    client = YandexPdd('new.com', server.token, url=server.url, registrar=True)
+    client.domain_register()
+    statuses = [client.domain_registration_status() for _ in range(3)]
+    assert statuses[-1] == 'added'
+    assert statuses[0] != 'added'
@@ -0,0 +1,30 @@
+# coding: utf8
+
+from yandex_pdd import YandexPddFleet
+
+
+def fleet_of(server, **kwargs):
+    for i in range(6):
+        server.add_domain('domain%d.com' % i, accounts=i, status='added' if i % 2 else 'domain-activate')
+    return YandexPddFleet(server.token, url=server.url, workers=4, **kwargs)
+
+
+def test_map_discovers_domains(server):
+    with fleet_of(server) as fleet:
+        results = {r.spec: r.result for r in fleet.map('domain_details')}
+        assert sorted(results) == ['domain%d.com' % i for i in range(6)]
+        assert results['domain3.com']['accounts-count'] == 3
+        assert fleet.client('domain3.com') is fleet.client('domain3.com')
+        assert fleet.client('domain3.com')._get_session() is fleet.client('domain4.com')._get_session()
+
+
+def test_map_filter_and_errors(server):
+    with fleet_of(server) as fleet:
+        job = fleet.map(lambda client: client.email_add('admin', 'secret'),
+                        domains=lambda d: d['status'] == 'added')
+        results = {r.spec: r for r in job}
+        assert sorted(results) == ['domain1.com', 'domain3.com', 'domain5.com']
+        assert all(r.ok for r in results.values())
+        failed = [r for r in fleet.map('email_add', 'admin', 'secret', domains=['domain1.com', 'domain2.com'])
+                  if not r.ok]
+        assert [(r.spec, r.error.args[0]) for r in failed] == [('domain1.com', 'occupied')]
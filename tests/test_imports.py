@@ -0,0 +1,49 @@
+# coding: utf8
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.fake import FakeError
+from yandex_pdd.imports import CHANGED, FAILED, FINISHED
+
+
+def spec(login):
+    return {'method': 'imap', 'server': 'imap.example.com', 'ext_login': login, 'ext_passwd': 'secret',
+            'int_login': login}
+
+
+def test_import_migrate_events(server):
+    server.add_domain('domain.com')
+    server.pdd.import_duration = 0.2
+    start = server.pdd.import_start_one_import
+
+    def failing(domain, data):
+        if data.get('int-login') == 'broken':
+            raise FakeError('bad_server')
+        return start(domain, data)
+
+    server.pdd.import_start_one_import = failing
+    events = []
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    watcher = client.import_migrate([spec('user%d' % i) for i in range(12)] + [spec('broken')], timeout=10,
+                                    min_interval=0.05, max_interval=0.2,
+                                    on_event=lambda event, job: events.append((event, job)))
+    assert watcher.done
+    assert sum(job.ok for job in watcher.jobs.values()) == 12
+    assert watcher.jobs['broken@domain.com'].error.args[0] == 'bad_server'
+    assert [job.login for event, job in events if event == FAILED] == ['broken@domain.com']
+    assert len([event for event, _ in events if event == FINISHED]) == 12
+    assert CHANGED in [event for event, _ in events]
+    assert watcher.report() == '13 imports: done 12, failed to start 1'
+
+
+def test_watch_discovers_and_stalls(server):
+    server.add_domain('domain.com')
+    server.pdd.import_duration = 3600
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    for i in range(3):
+        client.import_start_one_import(**spec('user%d' % i))
+    watcher = client.import_watch(min_interval=0.05, stall_timeout=0.2)
+    watcher.watch(timeout=5)
+    assert sorted(watcher.jobs) == ['user%d@domain.com' % i for i in range(3)]
+    assert all(job.stalled for job in watcher.jobs.values())
+    assert watcher.interval > watcher.min_interval
+    assert watcher.report() == '3 imports: stalled 3'
@@ -0,0 +1,64 @@
+# coding: utf8
+
+import time
+
+import pytest
+
+from yandex_pdd import YandexPdd, YandexPddExceptionY
+from yandex_pdd.fake import FakeError
+
+
+def test_list_all_fetches_pages_in_parallel(server):
+    server.add_domain('domain.com', accounts=250)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    expected = sorted(server.pdd.domains['domain.com'].accounts)
+    server.pdd.latency = 0.1
+    started = time.time()
+    accounts = client.email_list_all(workers=4, on_page=50)
+    assert time.time() - started < 0.45
+    assert [a['login'] for a in accounts] == expected
+    assert server.pdd.requests == 5
+
+
+def test_domain_list_all(server):
+    for i in range(5):
+        server.add_domain('domain%d.com' % i)
+    client = YandexPdd(None, server.token, url=server.url, registrar=True)
+    assert [d['name'] for d in client.domain_list_all(on_page=2)] == ['domain%d.com' % i for i in range(5)]
+
+
+def test_list_all_page_error(server):
+    server.add_domain('domain.com', accounts=100)
+    email_list = server.pdd.email_list
+
+    def failing(domain, data):
+        if data.get('page') == '3':
+            raise FakeError('no_reply')
+        return email_list(domain, data)
+
+    server.pdd.email_list = failing
+    with pytest.raises(YandexPddExceptionY) as e:
+        YandexPdd('domain.com', server.token, url=server.url).email_list_all(on_page=30)
+    assert e.value.args[0] == 'no_reply'
+
+
+def test_iter_emails_fetches_pages_lazily(server):
+    server.add_domain('domain.com', accounts=90)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    emails = client.iter_emails(on_page=30)
+    assert next(emails)['login'] == 'user0@domain.com'
+    time.sleep(0.1)
+    assert server.pdd.requests == 2  # current page and next one fetched in background
+    assert len(list(emails)) == 89
+    assert server.pdd.requests == 3
+
+
+def test_iter_domains_stops_early(server):
+    for i in range(10):
+        server.add_domain('domain%d.com' % i)
+    client = YandexPdd(None, server.token, url=server.url, registrar=True)
+    for domain in client.iter_domains(on_page=2):
+        if domain['name'] == 'domain1.com':
+            break
+    time.sleep(0.1)
+    assert server.pdd.requests == 2
@@ -0,0 +1,45 @@
+# coding: utf8
+
+import socket
+
+import pytest
+
+from yandex_pdd import Metrics, YandexPdd, YandexPddException, YandexPddExceptionY
+
+
+def test_metrics_by_outcome(server):
+    server.add_domain('domain.com')
+    metrics = Metrics(buckets=(0.5, 10.0))
+    client = YandexPdd('domain.com', server.token, url=server.url, metrics=metrics)
+    client.email_add('user', 'secret')
+    with pytest.raises(YandexPddExceptionY):
+        client.email_add('user', 'secret')
+    client.dns_list()
+    snapshot = metrics.snapshot()
+    assert snapshot['requests'] == {('email/add', 'post', 'ok'): 1, ('email/add', 'post', 'error'): 1,
+                                    ('dns/list', 'get', 'ok'): 1}
+    assert snapshot['errors'] == {('email/add', 'occupied'): 1}
+    assert snapshot['latency'][('email/add', 'post')][-1] == 2
+    assert snapshot['bytes'][('dns/list', 'get')] > 0
+    text = metrics.to_prometheus()
+    assert 'yandex_pdd_requests_total{endpoint="email/add",method="post",outcome="error"} 1\n' in text
+    assert 'yandex_pdd_errors_total{endpoint="email/add",error="occupied"} 1\n' in text
+    assert 'yandex_pdd_request_duration_seconds_bucket{endpoint="email/add",method="post",le="10.0"} 2\n' in text
+    assert 'yandex_pdd_request_duration_seconds_count{endpoint="dns/list",method="get"} 1\n' in text
+    metrics.reset()
+    assert metrics.snapshot()['requests'] == {}
+
+
+def test_hooks_and_transport_outcome():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    url = 'http://127.0.0.1:%d/api2/' % sock.getsockname()[1]
+    sock.close()
+    before, after = [], []
+    client = YandexPdd('domain.com', 'token', url=url, timeout=1)
+    client.add_hook(before=before.append, after=after.append)
+    with pytest.raises(YandexPddException):
+        client.dns_list()
+    assert before == after
+    assert [(i.endpoint, i.method, i.outcome) for i in after] == [('dns/list', 'get', 'transport')]
+    assert after[0].duration is not None
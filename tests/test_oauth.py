@@ -0,0 +1,39 @@
+# coding: utf8
+
+import pytest
+
+from yandex_pdd import OAuthTokenCache, YandexPdd
+
+
+def test_token_cached_by_login(server):
+    server.add_domain('domain.com', accounts=2)
+    client = YandexPdd('domain.com', server.token, url=server.url, oauth_cache=True)
+    token = client.oauth_token(login='user0')
+    assert client.oauth_token(login='User0@domain.com') == token
+    link = client.passport_oauth('https://example.com', email='user0@domain.com')
+    assert 'access_token=%s&' % token in link
+    assert server.pdd.requests == 1
+    client.oauth_token(login='user0', refresh=True)
+    assert server.pdd.requests == 2
+    assert client.oauth_cache.stats()['hits'] == 2
+
+
+def test_prefetch_fetches_missing_and_expiring(server):
+    server.add_domain('domain.com', accounts=20)
+    cache = OAuthTokenCache(ttl=1800, refresh_before=300)
+    client = YandexPdd('domain.com', server.token, url=server.url, oauth_cache=cache)
+    client.oauth_token(login='user0')
+    cache.set('domain.com', 'expiring', login='user1', ttl=60)
+    results = client.oauth_prefetch(['user%d' % i for i in range(20)], workers=4)
+    assert [r.spec[0] for r in results] == ['user%d' % i for i in range(1, 20)]
+    assert all(r.ok for r in results)
+    assert cache.get('domain.com', login='user1') != 'expiring'
+    assert server.pdd.requests == 20
+    for i in range(20):
+        client.passport_oauth('https://example.com', email='user%d' % i)
+    assert server.pdd.requests == 20
+
+
+def test_prefetch_requires_cache(server):
+    with pytest.raises(ValueError):
+        YandexPdd('domain.com', server.token, url=server.url).oauth_prefetch(['user0'])
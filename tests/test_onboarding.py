@@ -0,0 +1,51 @@
+# coding: utf8
+
+from yandex_pdd import RetryPolicy, YandexPdd, YandexPddFleet
+from yandex_pdd.fake import FakeError
+from yandex_pdd.onboarding import DNS
+
+
+def onboarding(server, domains, **kwargs):
+    fleet = YandexPddFleet(server.token, domains=[], registrar=True, url=server.url, workers=4,
+                           retry=RetryPolicy(retries=0))
+    return fleet, fleet.onboard(domains, min_interval=0.01, max_interval=0.1, **kwargs)
+
+
+def test_default_fake_finishes(server):
+    fleet, job = onboarding(server, ['domain%d.com' % i for i in range(10)])
+    with fleet:
+        job.run(timeout=10)
+    assert job.stats()['stages'] == {'done': 10}
+
+
+def test_poll_error_is_not_fatal(server):
+    domain_domains = server.pdd.domain_domains
+    failures = []
+
+    def failing(data):
+        if len(failures) < 2:
+            failures.append(data)
+            raise FakeError('no_reply')
+        return domain_domains(data)
+
+    server.pdd.domain_domains = failing
+    fleet, job = onboarding(server, ['domain%d.com' % i for i in range(5)])
+    with fleet:
+        job.run(timeout=10)
+    assert job.poll_errors == 2
+    assert job.stats()['stages'] == {'done': 5}
+
+
+def test_dns_stage_reads_current_zone(server):
+    server.add_domain('domain.com')
+    fleet = YandexPddFleet(server.token, domains=[], registrar=True, url=server.url, workers=4, cache=True,
+                           retry=RetryPolicy(retries=0))
+    record = {'type': 'A', 'content': '10.1.1.1', 'subdomain': 'www'}
+    with fleet:
+        assert fleet.client('domain.com').dns_list() == []
+        YandexPdd('domain.com', server.token, url=server.url).dns_add(**record)
+        job = fleet.onboard([{'domain': 'domain.com', 'dns': [record]}], min_interval=0.01, max_interval=0.1)
+        job.states['domain.com'].stage = DNS  # resumed by checkpoint: no add cleared the cache before dns stage
+        job.run(timeout=10)
+    assert job.stats()['stages'] == {'done': 1}
+    assert len(server.pdd.domains['domain.com'].records) == 1
@@ -0,0 +1,54 @@
+# coding: utf8
+
+import threading
+import time
+
+from yandex_pdd import RateLimiter, RetryPolicy, YandexPdd
+from yandex_pdd.fake import FakePddServer
+
+
+def test_concurrent_throttles_cut_rate_once():
+    limiter = RateLimiter(20, min_rate=0.5)
+    for _ in range(16):
+        limiter.throttled()
+    assert limiter.rate == 10
+
+
+def test_rate_cut_again_after_cooldown():
+    limiter = RateLimiter(20, cooldown=0)
+    limiter.throttled()
+    limiter.throttled()
+    assert limiter.rate == 5
+
+
+def test_recovery_proportional_to_rate():
+    limiter = RateLimiter(20, min_rate=0.5, cooldown=0)
+    for _ in range(5):
+        limiter.throttled()
+    assert limiter.rate < 1
+    for _ in range(200):
+        limiter.success()
+    assert limiter.rate == 20
+
+
+def test_limiter_above_server_rate_recovers():
+    with FakePddServer(rate_limit=20) as server:
+        server.add_domain('domain.com', accounts=1)
+        limiter = RateLimiter(25)
+        done = []
+        stop = time.time() + 3
+
+        def run():
+            client = YandexPdd('domain.com', server.token, url=server.url, rate_limiter=limiter,
+                               retry=RetryPolicy(retries=5, backoff=0.05))
+            while time.time() < stop:
+                client.email_list(page=1, on_page=1)
+                done.append(1)
+
+        threads = [threading.Thread(target=run) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(done) / 3.0 > 10
+    assert limiter.rate > 5
@@ -0,0 +1,16 @@
+# coding: utf8
+
+from yandex_pdd import Account
+
+
+def test_shared_fields_keep_type():
+    Account({'login': 'a', 'enabled': True, 'maillist': False})
+    account = Account({'login': 'b', 'sex': 1, 'ready': 0})
+    assert account.sex == 1 and type(account.sex) is int
+    assert account.ready == 0 and type(account.ready) is int
+
+
+def test_shared_strings_interned():
+    a = Account({'login': 'a', 'enabled': ''.join(['y', 'es'])})
+    b = Account({'login': 'b', 'enabled': ''.join(['ye', 's'])})
+    assert a.enabled is b.enabled
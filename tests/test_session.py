@@ -0,0 +1,54 @@
+# coding: utf8
+
+import pytest
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.transport import HTTP, REQUESTS
+
+
+def connections(server):
+    accepted = []
+    process_request = server._httpd.process_request
+
+    def counting(request, address):
+        accepted.append(address)
+        return process_request(request, address)
+
+    server._httpd.process_request = counting
+    return accepted
+
+
+@pytest.mark.parametrize('transport', [HTTP, REQUESTS])
+def test_requests_reuse_connection(server, transport):
+    if transport == REQUESTS:
+        pytest.importorskip('requests')
+    server.add_domain('domain.com', accounts=3)
+    accepted = connections(server)
+    with YandexPdd('domain.com', server.token, url=server.url, transport=transport) as client:
+        for _ in range(10):
+            assert client.email_list()['total'] == 3
+    assert len(accepted) == 1
+    assert server.pdd.requests == 10
+
+
+def test_shared_session(server):
+    server.add_domain('domain.com')
+    first = YandexPdd('domain.com', server.token, url=server.url, share_session=True)
+    second = YandexPdd('domain.com', server.token, url=server.url, share_session=True)
+    session = first._get_session()
+    assert second._get_session() is session
+    first.close()
+    assert second.domain_details()['domain']
+    second.close()
+    assert YandexPdd('domain.com', server.token, url=server.url, share_session=True)._get_session() is not session
+
+
+def test_own_session_not_closed(server):
+    server.add_domain('domain.com')
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    session = client._get_session()
+    with YandexPdd('domain.com', server.token, url=server.url, session=session) as other:
+        other.domain_details()
+    assert client._get_session() is session
+    client.close()
+    assert client._get_session() is not session
@@ -0,0 +1,64 @@
+# coding: utf8
+
+import asyncio
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.snapshot import Snapshot
+
+
+def test_refresh_writes_changed_rows(server):
+    server.add_domain('domain.com', accounts=3, maillists=1, records=2)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    with Snapshot() as snapshot:
+        counts = snapshot.refresh(client)
+        assert counts['accounts']['inserted'] == 3
+        assert counts['dns']['inserted'] == 2
+        assert snapshot.maillists_of('domain.com', 'user0@domain.com') == ['list0@domain.com']
+        client.email_del(login='user1')
+        counts = snapshot.refresh(client)
+        assert counts['accounts'] == {'inserted': 0, 'updated': 0, 'deleted': 1, 'unchanged': 2}
+        assert counts['maillists']['deleted'] == 1
+        assert snapshot.subscribers('domain.com', 'list0@domain.com') == ['user0@domain.com', 'user2@domain.com']
+
+
+def test_refresh_bypasses_cache(server):
+    server.add_domain('domain.com', records=2)
+    client = YandexPdd('domain.com', server.token, url=server.url, cache=True)
+    with Snapshot() as snapshot:
+        snapshot.refresh(client, parts=('dns', 'deputies'))
+        other = YandexPdd('domain.com', server.token, url=server.url)
+        other.dns_add('A', content='10.1.1.1', subdomain='new')
+        other.deputy_add(login='user0')
+        counts = snapshot.refresh(client, parts=('dns', 'deputies'))
+        assert counts['dns']['inserted'] == 1
+        assert snapshot.deputies('domain.com') == ['user0']
+        assert len(snapshot.dns('domain.com', type='a', subdomain='new')) == 1
+
+
+def test_refresh_async(server):
+    from yandex_pdd.aio import AsyncYandexPdd
+
+    server.add_domain('domain.com', accounts=2, maillists=1)
+
+    async def refresh(snapshot):
+        async with AsyncYandexPdd('domain.com', server.token, url=server.url, cache=True) as client:
+            return await snapshot.refresh_async(client, parts=('accounts', 'maillists'))
+
+    with Snapshot() as snapshot:
+        assert asyncio.run(refresh(snapshot))['accounts']['inserted'] == 2
+        assert snapshot.subscribers('domain.com', 'list0') == ['user0@domain.com', 'user1@domain.com']
+
+
+def test_login_lookups_qualified(server):
+    server.add_domain('domain.com', accounts=1)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    with Snapshot() as snapshot:
+        snapshot.refresh(client, parts=('accounts',))
+        uid = snapshot.uid('domain.com', 'user0@domain.com')
+        assert uid is not None
+        assert snapshot.uid('domain.com', 'User0') == uid
+        assert snapshot.account('domain.com', login='user0')['uid'] == snapshot.account('domain.com', uid=uid)['uid']
+        assert snapshot.login('domain.com', uid) == 'user0@domain.com'
+        snapshot.write('domain.com', 'accounts', [{'login': 'bare', 'uid': 7}])
+        assert snapshot.uid('domain.com', 'bare@domain.com') == '7'
+        assert snapshot.login('domain.com', 7) == 'bare@domain.com'
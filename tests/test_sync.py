@@ -0,0 +1,46 @@
+# coding: utf8
+
+import asyncio
+
+from yandex_pdd import MaillistPlan, YandexPdd, YandexPddExceptionY
+from yandex_pdd.aio import AsyncYandexPdd
+
+
+def test_sync_maillists_names(server):
+    server.add_domain('domain.com', accounts=3, maillists=1)
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    plans = client.sync_maillists({'list0': ['user0@domain.com'], 'missing': []}, dry_run=True)
+    assert isinstance(plans['list0@domain.com'], MaillistPlan)
+    assert isinstance(plans['missing@domain.com'], YandexPddExceptionY)
+
+
+def test_sync_maillists_keys_lowercase(server):
+    server.add_domain('domain.com', accounts=2, maillists=1)
+    email_ml_list = server.pdd.email_ml_list
+
+    def capitalized(domain, data):
+        r = email_ml_list(domain, data)
+        for item in r['maillists']:
+            item['maillist'] = item['maillist'].capitalize()
+        return r
+
+    server.pdd.email_ml_list = capitalized
+    client = YandexPdd('domain.com', server.token, url=server.url)
+    plans = client.sync_maillists({'LIST0': ['user0@domain.com'], 'Missing@Domain.com': []}, dry_run=True)
+    assert sorted(plans) == ['list0@domain.com', 'missing@domain.com']
+    assert [u['subscriber'] for u in plans['list0@domain.com'].unsubscribes] == ['user1@domain.com']
+
+    async def sync():
+        async with AsyncYandexPdd('domain.com', server.token, url=server.url) as client:
+            return await client.sync_maillists({'LIST0': ['user0@domain.com']}, dry_run=True)
+
+    assert list(asyncio.run(sync())) == ['list0@domain.com']
+
+
+def test_sync_dns_reads_current_zone(server):
+    server.add_domain('domain.com', records=2)
+    client = YandexPdd('domain.com', server.token, url=server.url, cache=True)
+    records = [dict(r) for r in client.dns_list()]
+    YandexPdd('domain.com', server.token, url=server.url).dns_add('A', content='10.1.1.1', subdomain='new')
+    plan = client.sync_dns(records, dry_run=True)
+    assert len(plan.deletes) == 1
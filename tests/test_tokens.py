@@ -0,0 +1,80 @@
+# coding: utf8
+
+import asyncio
+import time
+
+import pytest
+
+from yandex_pdd import TokenPool, YandexPdd, YandexPddExceptionY
+from yandex_pdd.fake import FakePddServer
+from yandex_pdd.tokens import ROUND_ROBIN
+
+
+@pytest.fixture
+def tokens_server():
+    with FakePddServer(token=['token-one', 'token-two']) as server:
+        server.add_domain('domain.com', records=1)
+        handle = server.pdd.handle
+        server.used = []
+
+        def recording(method, path, data, token):
+            server.used.append(token)
+            return handle(method, path, data, token)
+
+        server.pdd.handle = recording
+        yield server
+
+
+def test_rejected_token_quarantined(tokens_server):
+    pool = TokenPool(['token-bad', 'token-one', 'token-two'], strategy=ROUND_ROBIN, quarantine=60)
+    client = YandexPdd('domain.com', pool, url=tokens_server.url)
+    for _ in range(10):
+        assert len(client.dns_list()) == 1
+    assert tokens_server.used.count('token-bad') == 1
+    assert tokens_server.used.count('token-one') == 5
+    stats = pool.stats()
+    assert [s['requests'] for s in stats] == [1, 5, 5]
+    assert [s['errors'] for s in stats] == [1, 0, 0]
+    assert stats[0]['quarantined'] > 59
+
+
+def test_throttled_token_switched(tokens_server):
+    handle = tokens_server.pdd.handle
+
+    def throttling(method, path, data, token):
+        if token == 'token-one':
+            tokens_server.used.append(token)
+            return {'success': 'error', 'error': 'too_many_requests'}
+        return handle(method, path, data, token)
+
+    tokens_server.pdd.handle = throttling
+    pool = TokenPool(['token-one', 'token-two'], throttle_quarantine=60)
+    client = YandexPdd('domain.com', pool, url=tokens_server.url)
+    for _ in range(5):
+        client.dns_list()
+    assert tokens_server.used == ['token-one'] + ['token-two'] * 5
+    assert [s.throttled for s in pool.states] == [1, 0]
+
+
+def test_all_tokens_rejected(tokens_server):
+    pool = TokenPool(['token-bad', 'token-worse'])
+    started = time.time()
+    with pytest.raises(YandexPddExceptionY) as e:
+        YandexPdd('domain.com', pool, url=tokens_server.url).dns_list()
+    assert time.time() - started < 5  # Quarantine of rejected tokens is not waited for
+    assert e.value.args[0] == 'bad_token'
+    assert [s.errors for s in pool.states] == [1, 1]
+    assert tokens_server.used == ['token-bad', 'token-worse']
+
+
+def test_all_tokens_rejected_async(tokens_server):
+    aio = pytest.importorskip('yandex_pdd.aio')
+    pool = TokenPool(['token-bad', 'token-worse'])
+
+    async def dns_list():
+        async with aio.AsyncYandexPdd('domain.com', pool, url=tokens_server.url) as client:
+            return await client.dns_list()
+
+    with pytest.raises(YandexPddExceptionY):
+        asyncio.run(asyncio.wait_for(dns_list(), 5))
+    assert tokens_server.used == ['token-bad', 'token-worse']
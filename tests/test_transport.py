@@ -0,0 +1,132 @@
+# coding: utf8
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from yandex_pdd import YandexPdd
+from yandex_pdd.transport import HTTP, REQUESTS, HttpSession, TransportError, ssl_context_create
+
+
+class DroppingServer(object):
+    """
+    Keep-alive http server: second request is read and connection is closed without response
+    """
+
+    def __init__(self):
+        self.requests = []  # (method, path, body)
+        self._sock = socket.socket()
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(8)
+        self.url = 'http://127.0.0.1:%d/api' % self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection):
+        f = connection.makefile('rb')
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            length = 0
+            while True:
+                header = f.readline()
+                if header in (b'\r\n', b''):
+                    break
+                name, value = header.decode().split(':', 1)
+                if name.lower() == 'content-length':
+                    length = int(value)
+            method, path = line.decode().split()[:2]
+            self.requests.append((method, path, f.read(length).decode()))
+            if len(self.requests) == 2:
+                connection.close()
+                return
+            connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+
+    def close(self):
+        self._sock.close()
+
+
+@pytest.fixture
+def dropping():
+    server = DroppingServer()
+    yield server
+    server.close()
+
+
+def test_post_not_resent_after_it_was_written(dropping):
+    session = HttpSession()
+    session.request('get', dropping.url)
+    with pytest.raises(TransportError) as e:
+        session.request('post', dropping.url, data={'login': 'user'})
+    assert e.value.sent
+    assert [r[0] for r in dropping.requests] == ['GET', 'POST']
+
+
+def test_get_resent_on_closed_keep_alive(dropping):
+    session = HttpSession()
+    session.request('get', dropping.url)
+    assert session.request('get', dropping.url).status_code == 200
+    assert [r[0] for r in dropping.requests] == ['GET', 'GET', 'GET']
+
+
+def test_none_values_not_sent(dropping):
+    session = HttpSession()
+    session.request('get', dropping.url, params={'page': 1, 'domain': None})
+    assert dropping.requests[0][1] == '/api?page=1'
+
+
+def test_http_proxy_gets_absolute_url(dropping):
+    session = HttpSession(proxies={'http': 'http://user:secret@' + dropping.url.split('://')[1].split('/')[0]})
+    assert session.request('get', 'http://pdd.example/api', params={'page': 1}).status_code == 200
+    assert dropping.requests[0][1] == 'http://pdd.example/api?page=1'
+
+
+def test_no_proxy_and_environment(dropping, monkeypatch):
+    monkeypatch.setenv('HTTP_PROXY', 'http://127.0.0.1:9')
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    session = HttpSession()
+    assert session.proxies['http'] == 'http://127.0.0.1:9'
+    assert session.request('get', dropping.url).status_code == 200
+    assert dropping.requests[0][1] == '/api'
+
+
+def test_ca_bundle_of_environment(tmp_path, monkeypatch):
+    certifi = pytest.importorskip('certifi')
+    with open(certifi.where()) as f:
+        pem = f.read()
+    end = '-----END CERTIFICATE-----'
+    bundle = tmp_path / 'ca.pem'
+    bundle.write_text(pem[pem.index('-----BEGIN CERTIFICATE-----'):pem.index(end) + len(end)] + '\n')
+    monkeypatch.delenv('CURL_CA_BUNDLE', raising=False)
+    monkeypatch.setenv('REQUESTS_CA_BUNDLE', str(bundle))
+    assert len(ssl_context_create().get_ca_certs()) == 1
+
+
+def test_import_is_lazy():
+    code = ('import sys, yandex_pdd; '
+            'print([m for m in ("requests", "aiohttp", "asyncio", "sqlite3") if m in sys.modules])')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.check_output([sys.executable, '-c', code], cwd=root).decode().strip() == '[]'
+
+
+@pytest.mark.parametrize('transport', [HTTP, REQUESTS])
+def test_transport_against_fake(server, transport):
+    if transport == REQUESTS:
+        pytest.importorskip('requests')
+    server.add_domain('domain.com', accounts=1)
+    with YandexPdd('domain.com', server.token, url=server.url, transport=transport) as client:
+        assert client.email_add(u'пользователь', 'secret')
+        assert client.email_list(on_page=1, page=2)['accounts'][0]['login'] == u'пользователь@domain.com'
+        assert client.email_del(login=u'пользователь') is True
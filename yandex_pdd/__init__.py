@@ -1,3 +1,39 @@
 # coding: utf8
 
-from .yandex_pdd import *
\ No newline at end of file
+from .yandex_pdd import *
+from .cache import ResponseCache
+from .bulk import BulkJob, BulkResult
+from .ratelimit import RateLimiter, RetryPolicy
+from .sync import DnsPlan
+from .fleet import YandexPddFleet
+from .sync import MaillistPlan
+from .metrics import Metrics, RequestInfo
+from .records import Account, DnsRecord, Domain, Subscriber
+from .imports import ImportJob, ImportWatcher
+from .coalesce import AsyncSingleFlight, SingleFlight
+from .tokens import TokenPool
+from .oauth import OAuthTokenCache
+from .edits import AsyncEditQueue, EditQueue
+from .checkpoint import Checkpoint
+from .onboarding import DomainState, Onboarding
+from .transport import HttpSession, TransportError
+
+# Imported on first access: aiohttp, asyncio and sqlite3 are not loaded by sync clients
+_LAZY = {
+    'AsyncYandexPdd': 'aio',
+    'Snapshot': 'snapshot',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
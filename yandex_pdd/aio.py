@@ -0,0 +1,483 @@
+# coding: utf8
+
+"""
+Yandex.PDD API asyncio client
+Requires aiohttp: pip install yandex_pdd[async]
+"""
+
+import asyncio
+
+from .bulk import AsyncBulkJob
+from .cache import ResponseCache
+from .coalesce import AsyncSingleFlight
+from .edits import AsyncEditQueue
+from .imports import ImportWatcher
+from .records import json_loads
+from .sync import DNS_KEEP_TYPES, DnsPlan, MaillistPlan, maillists_map
+from .yandex_pdd import YandexPdd, YandexPddException, YandexPddExceptionY, pages_count
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+def _form_value(value):
+    """
+    Value for aiohttp form / query, encoded like requests does
+    :param value: mixed
+    :return: str
+    """
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+class AsyncYandexPdd(YandexPdd):
+    """
+    YandexPdd API object for asyncio.
+    Same methods as YandexPdd, but every api method is coroutine:
+
+        async with AsyncYandexPdd('domain.com', '<TOKEN>') as app:
+            uid = await app.email_add('login', 'password')
+    """
+
+    pool_size = 100  # Max connections in pool
+    keepalive_timeout = 30  # Seconds idle connection is kept open
+
+    def __init__(self, domain, token, registrar=False, response_full=False, session=None, pool_size=100,
+                 timeout=(10, 60), keepalive_timeout=30, cache=None, rate_limiter=None, retry=None, metrics=None,
+                 url=None, typed=False, coalesce=None, oauth_cache=None):
+        """
+        Init
+        :param token: PDD Token / TokenPool / list of tokens
+        :param domain: Domain name
+        :param response_full: Return full response by method or only functional key
+        :param registrar: Request as registrar
+        :param session: aiohttp.ClientSession to use, not closed by client
+        :param pool_size: Max connections in pool - requests in flight
+        :param timeout: (connect, read) timeouts in seconds / float for both
+        :param keepalive_timeout: Seconds idle connection is kept open
+        :param cache: ResponseCache / True - cache with default ttls
+        :param rate_limiter: RateLimiter / True - limiter shared by clients with token
+        :param retry: RetryPolicy / int - count of retries
+        :param metrics: Metrics / True - new Metrics
+        :param url: API url, for example of FakePddServer
+        :param typed: Return records of yandex_pdd.records instead of dicts for lists of accounts, domains, DNS
+        :param coalesce: AsyncSingleFlight / True - new one: concurrent identical GET requests share one request
+        :param oauth_cache: OAuthTokenCache / True - new one: oauth tokens of passport_oauth
+        """
+        if aiohttp is None:
+            raise ImportError('aiohttp required for AsyncYandexPdd: pip install yandex_pdd[async]')
+        if coalesce is True:
+            coalesce = AsyncSingleFlight()
+        super(AsyncYandexPdd, self).__init__(domain, token, registrar=registrar, response_full=response_full,
+                                             session=session, pool_size=pool_size, timeout=timeout, cache=cache,
+                                             rate_limiter=rate_limiter, retry=retry, metrics=metrics, url=url,
+                                             typed=typed, coalesce=coalesce, oauth_cache=oauth_cache)
+        self.keepalive_timeout = keepalive_timeout
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError('Use "async with" for AsyncYandexPdd')
+
+    def _get_session(self):
+        """
+        Session of client, created on first call inside event loop
+        :return: aiohttp.ClientSession
+        """
+        if self._session is None:
+            if isinstance(self.timeout, tuple):
+                connect, read = self.timeout
+            else:
+                connect = read = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Close connections of client
+        """
+        if self._session is None or not self._session_own:
+            return
+        session, self._session = self._session, None
+        await session.close()
+
+    async def _send(self, name, data, method, url, kwargs):
+        """
+        Send request
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param url: request url
+        :param kwargs: aiohttp args
+        :raise YandexPddException: bad request, jsonify failed
+        :raise YandexPddExceptionY: yandex exception - success=false
+        :return: dict
+        """
+        for key in ('data', 'params'):
+            if key in kwargs:
+                kwargs[key] = {k: _form_value(v) for k, v in kwargs[key].items() if v is not None}
+        info = self._request_start(name, method, data)
+        size = None
+        try:
+            try:
+                async with self._get_session().request(method, url, **kwargs) as r:
+                    body = await r.read()
+            except Exception as e:
+                raise YandexPddException(u'Request error: send', name, data, transport=True,
+                                         sent=not isinstance(e, aiohttp.ClientConnectorError))
+            size = len(body)
+            try:
+                json = json_loads(body)
+            except Exception:
+                raise YandexPddException(u'Request error: json', name, data, body.decode('utf8', 'replace'),
+                                         status=r.status)
+            json = self._response_check(json)
+        except Exception as e:
+            self._request_end(info, size, e)
+            raise
+        self._request_end(info, size, None)
+        return json
+
+    async def _send_retry(self, name, data, method, url, kwargs):
+        """
+        Send request with rate limit and retries
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param url: request url
+        :param kwargs: aiohttp args
+        :return: dict
+        """
+        attempt = 0
+        switches = 0
+        while True:
+            token = None
+            if self.tokens is not None:
+                token, delay = self.tokens.take()
+                kwargs['headers'] = {'PddToken': token.token}
+                if delay:
+                    await asyncio.sleep(delay)
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.delay()
+                if delay:
+                    await asyncio.sleep(delay)
+            try:
+                json = await self._send(name, data, method, url, kwargs)
+            except (YandexPddException, YandexPddExceptionY) as e:
+                # Each token is tried once, quarantine of rejected ones is not waited for
+                if token is not None and self.tokens.release(token, e) and switches < len(self.tokens) - 1:
+                    switches += 1
+                    continue
+                delay = self._retry_delay(e, attempt, name, method)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            if token is not None:
+                self.tokens.release(token)
+            if self.rate_limiter is not None:
+                self.rate_limiter.success()
+            return json
+
+    async def _request(self, name, data, method='post'):
+        """
+        Base request method
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :raise YandexPddException: bad request, jsonify failed
+        :raise YandexPddExceptionY: yandex exception - success=false
+        :return: dict
+        """
+        method, url, kwargs = self._request_args(name, data, method)
+        params = kwargs.get('params', kwargs.get('data'))
+        key, json = self._cache_get(name, method, params)
+        if json is not None:
+            return json
+        try:
+            if method == 'get' and self.coalesce is not None:
+                json = await self.coalesce.do(key or ResponseCache.key(self._registrar, name, params),
+                                              lambda: self._send_retry(name, data, method, url, kwargs))
+            else:
+                json = await self._send_retry(name, data, method, url, kwargs)
+        finally:
+            if method == 'post':
+                self._cache_invalidate(name, params)
+        if key is not None:
+            self.cache.set(key, json, self.cache.ttl(name))
+        return json
+
+    async def _call(self, endpoint, data):
+        """
+        Call api method
+        :param endpoint: endpoints.Endpoint
+        :param data: arguments of method
+        :return: mixed
+        """
+        return endpoint.response(self, await self._request(endpoint.path, endpoint.prepare(data), endpoint.method))
+
+    async def _list_all(self, func, key, on_page, workers, checkpoint=None):
+        """
+        Fetch all pages of list: first one for count of pages, others concurrently
+        :param func: list method with page, on_page args
+        :param key: key of items in response
+        :param on_page: Items on page
+        :param workers: Pages fetched concurrently
+        :param checkpoint: Checkpoint: fetched pages are saved, pages saved by failed walk are not fetched again
+        :return: list
+        """
+        job, saved = self._list_checkpoint(func, key, on_page, checkpoint)
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def fetch(page):
+            if page in saved:
+                return self._page_restore(func, key, saved[page])
+            async with semaphore:
+                r = await func(page=page, on_page=on_page)
+            if checkpoint is not None:
+                self._page_save(checkpoint, job, page, key, r)
+            return r
+
+        r = await fetch(1)
+        ret = list(r[key])
+        pages = pages_count(r, on_page)
+        results = await asyncio.gather(*[fetch(page) for page in range(2, pages + 1)], return_exceptions=True)
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+            ret += r[key]
+        if checkpoint is not None:
+            checkpoint.clear(job)
+        return ret
+
+    async def _iter_pages(self, func, key, on_page):
+        """
+        Iterate items of list page by page, next page is fetched in background while current one is processed
+        :param func: list method with page, on_page args, returns full response
+        :param key: key of items in response
+        :param on_page: Items on page
+        :return: async generator
+        """
+        page = 1
+        pages = None
+        task = asyncio.ensure_future(func(page=page, on_page=on_page))
+        try:
+            while task is not None:
+                r = await task
+                items = r[key]
+                if pages is None and (r.get('pages') is not None or r.get('total') is not None):
+                    pages = pages_count(r, on_page)
+                page += 1
+                task = None
+                if (page <= pages) if pages is not None else (len(items) >= on_page):
+                    task = asyncio.ensure_future(func(page=page, on_page=on_page))
+                for item in items:
+                    yield item
+        finally:
+            if task is not None:
+                task.cancel()
+
+    def _bulk(self, func, specs, workers, on_done):
+        """
+        Bulk call of coroutine method
+        :param func: method
+        :param specs: iterable of items - dict of kwargs / tuple of args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: AsyncBulkJob
+        """
+        return AsyncBulkJob(func, specs, workers=workers, on_done=on_done)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # EMAIL ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def email_edit_queue(self, window=0.2, workers=4):
+        """
+        Write-behind queue of email edit: changes of mailbox made within window are sent by one request
+        :param window: seconds changes of mailbox are collected before request
+        :param workers: requests sent concurrently
+        :return: AsyncEditQueue
+        """
+        return AsyncEditQueue(self, window, workers)
+
+    async def _counters_of(self, account, cache_ttl=None):
+        """
+        Counters of account, kept for cache_ttl
+        :param account: dict of email_list
+        :param cache_ttl: seconds / None - not kept
+        :return: dict
+        """
+        if not cache_ttl:
+            return await self.email_counters(login=account['login'])
+        key, counters = self._counters_cached(account)
+        if counters is None:
+            counters = await self.email_counters(login=account['login'])
+            self._counters_cache.set(key, counters, cache_ttl)
+        return counters
+
+    async def iter_counters(self, workers=8, on_page=100, cache_ttl=None):
+        """
+        Counters of all accounts: accounts are listed page by page, counters are fetched concurrently
+        while next pages are loading
+        :param workers: counters fetched concurrently
+        :param on_page: Items on page of email_list
+        :param cache_ttl: seconds counters are kept by client for next calls / None - not kept
+        :return: async generator of BulkResult in order of completion: spec - account, result - counters dict
+        """
+        async def accounts():
+            async for account in self.iter_emails(on_page=on_page):
+                yield account, cache_ttl
+
+        async for r in self._bulk(self._counters_of, accounts(), workers, None):
+            r.spec = r.spec[0]
+            yield r
+
+    async def collect_counters(self, workers=8, on_page=100, cache_ttl=None, on_error=None):
+        """
+        Counters of all accounts, see iter_counters
+        :param workers: counters fetched concurrently
+        :param on_page: Items on page of email_list
+        :param cache_ttl: seconds counters are kept by client for next calls / None - not kept
+        :param on_error: callback(account, exception) for failed accounts, they are missing in result
+        :return: dict: login -> counters dict
+        """
+        ret = {}
+        async for r in self.iter_counters(workers, on_page, cache_ttl):
+            if r.ok:
+                ret[r.spec['login']] = r.result
+            elif on_error is not None:
+                on_error(r.spec, r.error)
+        return ret
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # MAIL LIST ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    async def sync_maillist(self, maillist, desired_subscribers, dry_run=False, workers=4, prune=True):
+        """
+        Bring subscribers of mail list to desired ones
+        :param maillist: Email of mail list
+        :param desired_subscribers: iterable of email / mapping email -> can send on behalf
+        :param dry_run: only plan changes
+        :param workers: operations run concurrently
+        :param prune: unsubscribe emails missing in desired
+        :return: MaillistPlan
+        """
+        self._cache_drop('email/ml/subscribers')
+        current = (await self._request('email/ml/subscribers', {'maillist': maillist}, method='get'))['subscribers']
+        plan = MaillistPlan.plan(maillist, current, desired_subscribers, prune=prune)
+        if dry_run:
+            return plan
+        return await plan.apply_async(self, workers=workers)
+
+    async def sync_maillists(self, desired, dry_run=False, workers=4, prune=True, list_workers=1):
+        """
+        Bring subscribers of mail lists to desired ones. Lists of email_ml_list missing in desired are not changed
+        :param desired: mapping email / name of mail list -> desired subscribers of sync_maillist
+        :param dry_run: only plan changes
+        :param workers: mail lists processed concurrently
+        :param prune: unsubscribe emails missing in desired
+        :param list_workers: operations of one mail list run concurrently, up to workers * list_workers requests
+        :return: dict: lower email of mail list -> MaillistPlan / exception, YandexPddExceptionY('not_found') - no list
+        """
+        desired = maillists_map(desired, self._domain)
+        self._cache_drop('email/ml/list')
+        maillists = (await self._request('email/ml/list', {}, method='get'))['maillists']
+        maillists = {item['maillist'].lower(): item['maillist'] for item in maillists}
+
+        def sync(maillist):
+            return self.sync_maillist(maillist, desired[maillist.lower()], dry_run=dry_run, workers=list_workers,
+                                      prune=prune)
+
+        job = self._bulk(sync, [maillists[maillist] for maillist in desired if maillist in maillists], workers, None)
+        ret = {r.spec.lower(): r.result if r.ok else r.error async for r in job}
+        for maillist in desired:
+            if maillist not in maillists:
+                ret[maillist] = YandexPddExceptionY('not_found')
+        return ret
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # IMPORT MAILBOX ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    async def import_migrate(self, specs, workers=4, timeout=None, **kwargs):
+        """
+        Start imports of mailboxes and wait until all of them are finished or stalled
+        :param specs: iterable of dict of import_start_one_import args
+        :param workers: imports started concurrently
+        :param timeout: max seconds of watching / None - no limit
+        :param kwargs: args of ImportWatcher: on_event, min_interval, max_interval, stall_timeout...
+        :return: ImportWatcher
+        """
+        watcher = ImportWatcher(self, [], **kwargs)
+        for r in await self.import_start_many(specs, workers).results():
+            watcher.add(r.spec, r.error)
+        return await watcher.watch_async(timeout)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # DNS ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    async def sync_dns(self, desired_records, dry_run=False, workers=4, keep_types=DNS_KEEP_TYPES):
+        """
+        Bring DNS zone to desired records by minimal count of dns_add / dns_edit / dns_del
+        :param desired_records: list of dict: type, subdomain, content, priority, weight, port, target, ttl
+        :param dry_run: only plan changes
+        :param workers: operations run concurrently
+        :param keep_types: types of records not deleted when missing in desired
+        :return: DnsPlan
+        """
+        self._cache_drop('dns/list')
+        current = (await self._request('dns/list', {}, method='get'))['records']
+        plan = DnsPlan.plan(current, desired_records, keep_types=keep_types)
+        if dry_run:
+            return plan
+        return await plan.apply_async(self, workers=workers)
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # AUTH ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    async def oauth_token(self, login=None, uid=None, refresh=False):
+        """
+        Oauth token of mailbox, from oauth cache when it is set
+        :param login: |Email / login
+        :param uid: |Email uid
+        :param refresh: get new token even if cached one is not expired
+        :return: str
+        """
+        cache = self.oauth_cache
+        if cache is not None and not refresh:
+            token = cache.get(self._domain, login, uid)
+            if token is not None:
+                return token
+        token = await self.email_get_oauth_token(login=login, uid=uid)
+        if cache is not None:
+            cache.set(self._domain, token, login, uid)
+        return token
+
+    async def passport_oauth(self, retpath, access_token=None, email=None):
+        """
+        Get link for auth
+        :param retpath: return url
+        :param access_token: |access token
+        :param email: |email, token is taken from oauth cache when it is set
+        :return: str
+        """
+        if not access_token:
+            if not email:
+                raise ValueError('Access token or email required')
+            access_token = await self.oauth_token(login=email)
+        return super(AsyncYandexPdd, self).passport_oauth(retpath, access_token=access_token)
@@ -0,0 +1,272 @@
+# coding: utf8
+
+"""
+Bulk calls of api methods with bounded concurrency
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .checkpoint import json_dumps
+
+
+class BulkResult(object):
+    """
+    Result of one item of bulk call
+    """
+
+    __slots__ = ('index', 'spec', 'result', 'error')
+
+    def __init__(self, index, spec, result=None, error=None):
+        """
+        Init
+        :param index: index of item in specs
+        :param spec: item - dict of kwargs / tuple of args
+        :param result: result of method
+        :param error: exception raised by method
+        """
+        self.index = index
+        self.spec = spec
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return '<BulkResult %s error %r>' % (self.index, self.error)
+        return '<BulkResult %s %r>' % (self.index, self.result)
+
+
+def spec_call(func, spec):
+    """
+    Call func with item of bulk call
+    :param func: method
+    :param spec: dict of kwargs / tuple of args / single arg
+    :return: mixed
+    """
+    if isinstance(spec, dict):
+        return func(**spec)
+    if isinstance(spec, (tuple, list)):
+        return func(*spec)
+    return func(spec)
+
+
+class BulkJob(object):
+    """
+    Bulk call of method in thread pool. Iterate it to get BulkResult in order of completion,
+    errors are returned with item and do not stop the batch. Stats are filled during iteration:
+
+        job = app.email_add_many([('login1', 'pass1'), ('login2', 'pass2')], workers=8)
+        for r in job:
+            print(r.spec, r.result if r.ok else r.error)
+        print(job.report())
+    """
+
+    def __init__(self, func, specs, workers=8, on_done=None, hold=None):
+        """
+        Init
+        :param func: method
+        :param specs: iterable of items - dict of kwargs / tuple of args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :param hold: callable() -> bool: next items are not taken from specs while it is true and items are in flight
+        """
+        self.func = func
+        self.specs = specs
+        self.workers = max(1, workers)
+        self.on_done = on_done
+        self.hold = hold
+        self.checkpoint = None
+        self.job = None
+        self.total = 0
+        self.ok = 0
+        self.failed = 0
+        self.restored = 0  # done items of checkpoint, not called again
+        self.started = None
+        self.finished = None
+        self._saved = None
+
+    def resume(self, checkpoint, job):
+        """
+        Save done and failed items to checkpoint, items done by previous run of job are not called again:
+        their BulkResult has result of checkpoint. Failed items are called again. Specs must be in same order
+        :param checkpoint: Checkpoint
+        :param job: job name
+        :return: self
+        """
+        self.checkpoint = checkpoint
+        self.job = job
+        return self
+
+    @property
+    def elapsed(self):
+        """
+        Seconds from start to finish / now
+        :return: float
+        """
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rate(self):
+        """
+        Items per second
+        :return: float
+        """
+        elapsed = self.elapsed
+        return self.total / elapsed if elapsed else 0.0
+
+    def report(self):
+        """
+        Throughput report
+        :return: str
+        """
+        report = u'%d items, %d ok, %d failed in %.2fs: %.1f/s' % (self.total, self.ok, self.failed, self.elapsed,
+                                                                      self.rate)
+        if self.restored:
+            report += u', %d restored from checkpoint' % self.restored
+        return report
+
+    def _restore(self, index, spec):
+        """
+        Result of item done by previous run of job
+        :raise ValueError: item of checkpoint is other spec
+        :return: BulkResult / None - item is not done
+        """
+        if self.checkpoint is None:
+            return None
+        if self._saved is None:
+            state = self.checkpoint.job(self.job)
+            self._saved = dict(state.done) if state is not None else {}
+        saved = self._saved.get(index)
+        if saved is None:
+            return None
+        if saved[0] != json.loads(json_dumps(spec)):
+            raise ValueError(u'Item %d of job %s in checkpoint is other spec: %r' % (index, self.job, saved[0]))
+        self.restored += 1
+        return BulkResult(index, spec, result=saved[1])
+
+    def _save(self, r):
+        if self.checkpoint is None:
+            return r
+        if r.ok:
+            self.checkpoint.done(self.job, r.index, r.spec, r.result)
+        else:
+            self.checkpoint.failed(self.job, r.index, r.spec, r.error)
+        return r
+
+    def _done(self, result):
+        self.total += 1
+        if result.ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+        return result
+
+    def _held(self, pending):
+        return bool(pending) and self.hold is not None and self.hold()
+
+    def _finish(self):
+        self.finished = time.time()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def _call(self, index, spec):
+        try:
+            r = BulkResult(index, spec, result=spec_call(self.func, spec))
+        except Exception as e:
+            r = BulkResult(index, spec, error=e)
+        return self._save(r)
+
+    def __iter__(self):
+        self.started = time.time()
+        specs = enumerate(self.specs)
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(pending) < self.workers * 2 and not self._held(pending):
+                    item = next(specs, None)
+                    if item is None:
+                        break
+                    index, spec = item
+                    restored = self._restore(index, spec)
+                    if restored is not None:
+                        yield self._done(restored)
+                        continue
+                    pending.add(executor.submit(self._call, index, spec))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self._done(future.result())
+        self._finish()
+
+    def results(self):
+        """
+        Run all items
+        :return: list of BulkResult in order of specs
+        """
+        return sorted(self, key=lambda r: r.index)
+
+
+class AsyncBulkJob(BulkJob):
+    """
+    Bulk call of coroutine method. Iterate it with "async for" to get BulkResult in order of completion.
+    Specs can be async iterable: items are called while next ones are fetched
+    """
+
+    async def _call(self, index, spec):
+        try:
+            r = BulkResult(index, spec, result=await spec_call(self.func, spec))
+        except Exception as e:
+            r = BulkResult(index, spec, error=e)
+        return self._save(r)
+
+    def __iter__(self):
+        raise TypeError('Use "async for" for AsyncBulkJob')
+
+    async def _specs(self):
+        index = 0
+        if hasattr(self.specs, '__aiter__'):
+            async for spec in self.specs:
+                yield index, spec
+                index += 1
+        else:
+            for spec in self.specs:
+                yield index, spec
+                index += 1
+
+    async def __aiter__(self):
+        import asyncio  # imported by async clients only
+        self.started = time.time()
+        specs = self._specs()
+        pending = set()
+        while True:
+            while len(pending) < self.workers and not self._held(pending):
+                try:
+                    index, spec = await specs.__anext__()
+                except StopAsyncIteration:
+                    break
+                restored = self._restore(index, spec)
+                if restored is not None:
+                    yield self._done(restored)
+                    continue
+                pending.add(asyncio.ensure_future(self._call(index, spec)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield self._done(future.result())
+        self._finish()
+
+    async def results(self):
+        """
+        Run all items
+        :return: list of BulkResult in order of specs
+        """
+        return sorted([r async for r in self], key=lambda r: r.index)
@@ -0,0 +1,122 @@
+# coding: utf8
+
+"""
+Response cache for GET api methods
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTLS = {
+    'domain/details': 300,
+    'dkim/status': 300,
+    'dns/list': 60,
+    'deputy/list': 60,
+    'email/ml/list': 60,
+    'email/ml/subscribers': 60,
+}  # url path -> seconds
+
+
+class ResponseCache(object):
+    """
+    TTL + LRU cache of responses. Keyed by domain, url path and params.
+    Can be shared by several clients, thread safe
+    """
+
+    def __init__(self, ttls=None, default_ttl=0, max_size=1024):
+        """
+        Init
+        :param ttls: url path -> seconds, DEFAULT_TTLS by default
+        :param default_ttl: seconds for other GET paths, 0 - not cached
+        :param max_size: max count of responses, least recently used are removed
+        """
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (expire time, response)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def ttl(self, path):
+        """
+        Cache time of path
+        :param path: url path
+        :return: seconds
+        """
+        return self.ttls.get(path, self.default_ttl)
+
+    @staticmethod
+    def key(registrar, path, data):
+        """
+        Key of response
+        :param registrar: request as registrar
+        :param path: url path
+        :param data: request params, with domain
+        :return: tuple
+        """
+        params = tuple(sorted((k, str(v)) for k, v in data.items() if k != 'domain'))
+        return data.get('domain'), path, registrar, params
+
+    def get(self, key):
+        """
+        Get response
+        :param key: key()
+        :return: dict / None
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] < time.time():
+                del self._items[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(item[1])
+
+    def set(self, key, response, ttl):
+        """
+        Save response
+        :param key: key()
+        :param response: dict
+        :param ttl: seconds
+        """
+        if ttl <= 0:
+            return
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._items[key] = (time.time() + ttl, response)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, domain, paths=None):
+        """
+        Remove responses of domain
+        :param domain: Domain name
+        :param paths: url paths / None - all of domain
+        """
+        with self._lock:
+            for key in [key for key in self._items if key[0] == domain and (paths is None or key[1] in paths)]:
+                del self._items[key]
+
+    def clear(self):
+        """
+        Remove all responses
+        """
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """
+        Counters of cache
+        :return: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
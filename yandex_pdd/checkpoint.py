@@ -0,0 +1,214 @@
+# coding: utf8
+
+"""
+Checkpoint file of long jobs: pages of list_all walks, done items of bulk calls and states of onboarded domains
+are saved as they are done, job started again after crash continues from checkpoint
+"""
+
+import json
+import os
+import threading
+
+
+def json_default(value):
+    """
+    JSON of results: records, dates
+    :param value: value not serializable by json
+    :return: serializable value
+    """
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return str(value)
+
+
+def json_dumps(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=json_default)
+
+
+class JobState(object):
+    """
+    Progress of one job of checkpoint
+    """
+
+    __slots__ = ('pages', 'done', 'failed', 'states')
+
+    def __init__(self):
+        self.pages = {}  # page -> (items, response without items)
+        self.done = {}  # index -> (spec json, result)
+        self.failed = {}  # index -> (spec json, error)
+        self.states = {}  # key -> last saved state
+
+
+class Checkpoint(object):
+    """
+    Append-only JSONL journal of jobs, thread safe. Each event is written and flushed as soon as it is done,
+    truncated last line of crashed process is cut from file on load:
+
+        checkpoint = Checkpoint('migration.checkpoint')
+        accounts = app.email_list_all(checkpoint=checkpoint)  # pages fetched before crash are not fetched again
+        for r in app.email_add_many(specs).resume(checkpoint, 'migration'):  # done items are not called again
+            print(r.spec, r.result if r.ok else r.error)
+
+    Finished list walk is removed from checkpoint, compact() rewrites file without removed jobs
+    """
+
+    def __init__(self, path, fsync=False):
+        """
+        Init
+        :param path: file path
+        :param fsync: fsync file after each event: survive crash of OS, slower
+        """
+        self.path = path
+        self.fsync = fsync
+        self.jobs = {}  # job -> JobState
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<Checkpoint %s %d jobs>' % (self.path, len(self.jobs))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        end = 0  # offset after last complete line
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # truncated by crash
+                end += len(line)
+                try:
+                    event = json.loads(line.decode('utf8'))
+                except ValueError:
+                    continue
+                self._apply(event)
+        if end < os.path.getsize(self.path):
+            # Cut truncated line: next event appended to it would be lost on load
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def _apply(self, event):
+        kind, job = event['event'], event['job']
+        if kind == 'clear':
+            self.jobs.pop(job, None)
+            return
+        state = self.jobs.get(job)
+        if state is None:
+            state = self.jobs[job] = JobState()
+        if kind == 'page':
+            state.pages[event['page']] = (event['items'], event['response'])
+        elif kind == 'done':
+            state.done[event['index']] = (event['spec'], event['result'])
+            state.failed.pop(event['index'], None)
+        elif kind == 'failed':
+            state.failed[event['index']] = (event['spec'], event['error'])
+        elif kind == 'state':
+            state.states[event['key']] = event['state']
+
+    def _write(self, event):
+        line = json_dumps(event) + '\n'
+        with self._lock:
+            self._apply(json.loads(line))
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf8')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def job(self, job):
+        """
+        Progress of job
+        :param job: job name
+        :return: JobState / None - no progress
+        """
+        with self._lock:
+            return self.jobs.get(job)
+
+    def page(self, job, page, items, response=None):
+        """
+        Save page of list walk
+        :param job: job name
+        :param page: page number
+        :param items: items of page
+        :param response: response without items: pages, total...
+        """
+        self._write({'event': 'page', 'job': job, 'page': page, 'items': items, 'response': response or {}})
+
+    def done(self, job, index, spec, result):
+        """
+        Save done item of bulk call
+        :param job: job name
+        :param index: index of item in specs
+        :param spec: item
+        :param result: result of method
+        """
+        self._write({'event': 'done', 'job': job, 'index': index, 'spec': spec, 'result': result})
+
+    def failed(self, job, index, spec, error):
+        """
+        Save failed item of bulk call, it is called again when job is resumed
+        :param job: job name
+        :param index: index of item in specs
+        :param spec: item
+        :param error: exception
+        """
+        self._write({'event': 'failed', 'job': job, 'index': index, 'spec': spec,
+                     'error': str(error.args[0]) if error.args else type(error).__name__})
+
+    def state(self, job, key, state):
+        """
+        Save state of object of job, last one is kept
+        :param job: job name
+        :param key: key of object
+        :param state: dict
+        """
+        self._write({'event': 'state', 'job': job, 'key': key, 'state': state})
+
+    def clear(self, job):
+        """
+        Remove job
+        :param job: job name
+        """
+        with self._lock:
+            if job not in self.jobs:
+                return
+        self._write({'event': 'clear', 'job': job})
+
+    def compact(self):
+        """
+        Rewrite file with progress of current jobs only
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf8') as f:
+                for job, state in self.jobs.items():
+                    for page, (items, response) in sorted(state.pages.items()):
+                        f.write(json_dumps({'event': 'page', 'job': job, 'page': page, 'items': items,
+                                            'response': response}) + '\n')
+                    for index, (spec, result) in sorted(state.done.items()):
+                        f.write(json_dumps({'event': 'done', 'job': job, 'index': index, 'spec': spec,
+                                            'result': result}) + '\n')
+                    for index, (spec, error) in sorted(state.failed.items()):
+                        f.write(json_dumps({'event': 'failed', 'job': job, 'index': index, 'spec': spec,
+                                            'error': error}) + '\n')
+                    for key, value in state.states.items():
+                        f.write(json_dumps({'event': 'state', 'job': job, 'key': key, 'state': value}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
@@ -0,0 +1,333 @@
+# coding: utf8
+
+"""
+Batch operations from command line: JSONL operations are called concurrently, JSONL results are streamed back.
+One operation per line, method is any api method of YandexPdd, args are checked by its signature:
+
+    {"domain": "domain.com", "method": "email_add", "args": ["login", "password"]}
+    {"domain": "domain.com", "method": "email_edit", "kwargs": {"login": "login", "iname": "Ivan"}}
+
+    yandex-pdd --token <TOKEN> ops.jsonl > results.jsonl
+    yandex-pdd --token <TOKEN> --offset 1500 --progress 5 ops.jsonl >> results.jsonl
+
+Result line: {"line": 0, "domain": "domain.com", "method": "email_add", "ok": true, "result": ...}
+or {"line": 0, ..., "ok": false, "error": "occupied", "error_type": "YandexPddExceptionY"}.
+Line is index of operation in input, --offset of next run is printed in report.
+"""
+
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+from types import GeneratorType
+
+from .bulk import BulkJob, BulkResult
+from .ratelimit import RateLimiter, RetryPolicy
+from .tokens import TokenPool
+from .transport import DEFAULT_TRANSPORT, TRANSPORTS
+from .yandex_pdd import YandexPdd
+
+TOKEN_ENV = 'YANDEX_PDD_TOKEN'
+
+ORDER_INPUT = 'input'  # Results in order of operations
+ORDER_COMPLETION = 'completion'  # Results as soon as done
+
+NOT_OPERATIONS = frozenset(('close', 'add_hook', 'email_edit_queue', 'import_watch'))  # Client helpers, not api calls
+
+
+def client_methods(client_class=YandexPdd):
+    """
+    Methods which can be called by operations
+    :param client_class: class of clients
+    :return: dict: name -> inspect.Signature without self
+    """
+    ret = {}
+    for name in dir(client_class):
+        method = getattr(client_class, name)
+        if name.startswith('_') or name in NOT_OPERATIONS or not callable(method):
+            continue
+        signature = inspect.signature(method)
+        ret[name] = signature.replace(parameters=list(signature.parameters.values())[1:])
+    return ret
+
+
+class Operation(object):
+    """
+    Operation of input line
+    """
+
+    __slots__ = ('line', 'domain', 'method', 'args', 'kwargs', 'error')
+
+    def __init__(self, line, domain, method, args=(), kwargs=None, error=None):
+        """
+        Init
+        :param line: index of line in input
+        :param domain: Domain name / None
+        :param method: name of client method
+        :param args: list of args
+        :param kwargs: dict of kwargs
+        :param error: ValueError of bad line, raised when operation is called
+        """
+        self.line = line
+        self.domain = domain
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.error = error
+
+    def __repr__(self):
+        return '<Operation %s %s %s>' % (self.line, self.domain, self.method)
+
+
+def operation_parse(line, text, domain=None, methods=None):
+    """
+    Operation from line of input
+    :param line: index of line
+    :param text: JSON object
+    :param domain: default Domain name
+    :param methods: client_methods: allowed methods, args are checked by their signatures / None - all
+    :raise ValueError: bad operation: unknown method, args not accepted by method
+    :return: Operation
+    """
+    try:
+        item = json.loads(text)
+    except ValueError as e:
+        raise ValueError(u'Bad json: %s' % e)
+    if not isinstance(item, dict):
+        raise ValueError(u'Operation must be object')
+    method = item.get('method')
+    if not method or (methods is not None and method not in methods):
+        raise ValueError(u'Unknown method: %s' % method)
+    args = item.get('args', [])
+    if not isinstance(args, list):
+        args = [args]
+    kwargs = item.get('kwargs', {})
+    if not isinstance(kwargs, dict):
+        raise ValueError(u'kwargs must be object')
+    if methods is not None:
+        try:
+            methods[method].bind(*args, **kwargs)
+        except TypeError as e:
+            raise ValueError(u'Bad args of %s: %s' % (method, e))
+    return Operation(line, item.get('domain', domain), method, args, kwargs)
+
+
+def json_default(value):
+    """
+    JSON of results: records, BulkResult of *_many methods, iterators, dates
+    :param value: value not serializable by json
+    :return: serializable value
+    """
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if isinstance(value, BulkResult):
+        if value.ok:
+            return {'spec': value.spec, 'ok': True, 'result': value.result}
+        return {'spec': value.spec, 'ok': False, 'error': error_code(value.error)}
+    if hasattr(value, '__iter__'):
+        return list(value)
+    return str(value)
+
+
+def error_code(error):
+    """
+    Code of error: yandex error / message
+    :param error: exception
+    :return: str
+    """
+    return str(error.args[0]) if error.args else type(error).__name__
+
+
+class Batch(object):
+    """
+    Operations of input called by bounded pool of workers, clients of domains share one connection pool.
+    Results waiting for slow previous lines are limited: new lines are not started while 2 * workers of them wait:
+
+        with Batch('<TOKEN>', workers=16) as batch:
+            for result in batch.run(open('ops.jsonl'), offset=100):
+                print(result)
+    """
+
+    def __init__(self, token, domain=None, registrar=False, workers=8, order=ORDER_INPUT, dry_run=False,
+                 **client_kwargs):
+        """
+        Init
+        :param token: PDD Token / TokenPool / list of tokens
+        :param domain: Domain name of operations without domain
+        :param registrar: Request as registrar
+        :param workers: operations called concurrently
+        :param order: ORDER_INPUT / ORDER_COMPLETION
+        :param dry_run: parse and check operations, do not call them
+        :param client_kwargs: args of clients: url, transport, timeout, retry, rate_limiter...
+        """
+        from .fleet import YandexPddFleet
+        if order not in (ORDER_INPUT, ORDER_COMPLETION):
+            raise ValueError('Unknown order: %s' % order)
+        if isinstance(token, (list, tuple)):
+            token = TokenPool(token)
+        self.domain = domain
+        self.workers = max(1, workers)
+        self.order = order
+        self.dry_run = dry_run
+        self.methods = client_methods()
+        self.fleet = YandexPddFleet(token, domains=[], registrar=registrar, workers=self.workers, **client_kwargs)
+        self.job = None
+        self.buffer = 2 * self.workers  # max results waiting for previous lines
+        self.offset = 0  # All lines before it are done, --offset of next run
+        self.skipped = 0  # Lines before offset of run
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.fleet.close()
+
+    def _operations(self, lines, offset):
+        for line, text in enumerate(lines):
+            if line < offset:
+                self.skipped += 1
+                continue
+            text = text.strip()
+            if not text:
+                self._finished[line] = None  # Empty line is done
+                continue
+            try:
+                yield operation_parse(line, text, self.domain, self.methods)
+            except ValueError as e:
+                yield Operation(line, None, None, error=e)
+
+    def _call(self, operation):
+        if operation.error is not None:
+            raise operation.error
+        if self.dry_run:
+            return None
+        result = getattr(self.fleet.client(operation.domain), operation.method)(*operation.args, **operation.kwargs)
+        if isinstance(result, (GeneratorType, BulkJob)):
+            result = list(result)  # iter_* / *_many methods are run by worker
+        return result
+
+    def result(self, r):
+        """
+        Result line of operation
+        :param r: BulkResult of operation
+        :return: dict
+        """
+        operation = r.spec
+        item = {'line': operation.line, 'domain': operation.domain, 'method': operation.method, 'ok': r.ok}
+        if self.dry_run:
+            item['dry_run'] = True
+        if r.ok:
+            item['result'] = r.result
+        else:
+            item['error'] = error_code(r.error)
+            item['error_type'] = type(r.error).__name__
+        return item
+
+    def _advance(self):
+        while self.offset in self._finished:
+            item = self._finished.pop(self.offset)
+            self.offset += 1
+            if item is not None:
+                yield item
+
+    def run(self, lines, offset=0):
+        """
+        Call operations of input
+        :param lines: iterable of JSONL lines
+        :param offset: index of first line to call, lines before it are done by previous run
+        :return: generator of result dicts
+        """
+        self.offset = offset
+        self._finished = {}  # line -> result dict waiting for previous lines / None - line is done
+        self.job = BulkJob(self._call, self._operations(lines, offset), workers=self.workers,
+                           hold=lambda: len(self._finished) >= self.buffer)
+        for r in self.job:
+            item = self.result(r)
+            if self.order == ORDER_COMPLETION:
+                yield item
+                self._finished[item['line']] = None
+            else:
+                self._finished[item['line']] = item
+            for item in self._advance():
+                yield item
+        for item in self._advance():
+            yield item
+
+    def report(self):
+        """
+        Progress report
+        :return: str
+        """
+        if self.job is None:
+            return u'not started'
+        return u'%s, offset %d' % (self.job.report(), self.offset)
+
+
+def main(argv=None):
+    """
+    Console command yandex-pdd
+    :param argv: command line args / None - sys.argv
+    :return: exit code: 0 - all operations are done, 1 - some failed, 2 - bad args
+    """
+    parser = argparse.ArgumentParser(prog='yandex-pdd', description=u'Batch operations of Yandex.PDD API: '
+                                     u'JSONL operations from file / stdin, JSONL results to stdout')
+    parser.add_argument('input', nargs='?', default='-', help=u'JSONL operations file, - stdin')
+    parser.add_argument('--token', action='append', help=u'PDD Token, can be repeated for pool of tokens. '
+                        u'Default: $%s' % TOKEN_ENV)
+    parser.add_argument('--domain', help=u'Domain of operations without "domain"')
+    parser.add_argument('--registrar', action='store_true', help=u'Request as registrar')
+    parser.add_argument('--workers', type=int, default=8, help=u'Operations called concurrently')
+    parser.add_argument('--order', choices=(ORDER_INPUT, ORDER_COMPLETION), default=ORDER_INPUT,
+                        help=u'Results in order of input / as soon as done')
+    parser.add_argument('--offset', type=int, default=0, help=u'Skip lines before offset: resume of stopped run')
+    parser.add_argument('--dry-run', action='store_true', help=u'Check operations, do not call them')
+    parser.add_argument('--progress', type=float, default=0, help=u'Seconds between progress reports to stderr')
+    parser.add_argument('--retries', type=int, default=3, help=u'Retries of failed requests')
+    parser.add_argument('--rate', type=float, help=u'Requests per second of token, adaptive')
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default=DEFAULT_TRANSPORT)
+    parser.add_argument('--url', help=u'API url, for example of FakePddServer')
+    parser.add_argument('--typed', action='store_true', help=u'Lists as records: only fields of records')
+    args = parser.parse_args(argv)
+
+    tokens = args.token or [t for t in os.environ.get(TOKEN_ENV, '').split(',') if t]
+    if not tokens and not args.dry_run:
+        parser.print_usage(sys.stderr)
+        sys.stderr.write(u'%s: error: --token or $%s required\n' % (parser.prog, TOKEN_ENV))
+        return 2
+    token = tokens if len(tokens) > 1 else (tokens[0] if tokens else 'dry-run')
+    client_kwargs = {'retry': RetryPolicy(retries=args.retries), 'transport': args.transport, 'typed': args.typed}
+    if args.rate:
+        client_kwargs['rate_limiter'] = RateLimiter(args.rate)
+    if args.url:
+        client_kwargs['url'] = args.url
+
+    lines = sys.stdin if args.input == '-' else open(args.input, encoding='utf8')
+    batch = Batch(token, domain=args.domain, registrar=args.registrar, workers=args.workers, order=args.order,
+                  dry_run=args.dry_run, **client_kwargs)
+    reported = time.time()
+    try:
+        for item in batch.run(lines, offset=args.offset):
+            sys.stdout.write(json.dumps(item, ensure_ascii=False, default=json_default) + '\n')
+            if args.progress and time.time() - reported >= args.progress:
+                sys.stdout.flush()
+                sys.stderr.write(batch.report() + '\n')
+                reported = time.time()
+    except KeyboardInterrupt:
+        sys.stderr.write(u'Interrupted: resume by --offset %d\n' % batch.offset)
+        return 1
+    finally:
+        sys.stdout.flush()
+        batch.close()
+        if lines is not sys.stdin:
+            lines.close()
+    sys.stderr.write(batch.report() + '\n')
+    return 1 if batch.job.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# coding: utf8
+
+"""
+Single-flight: concurrent identical GET requests share one http request
+"""
+
+import copy
+import threading
+
+
+class SingleFlight(object):
+    """
+    Concurrent calls with same key wait for the first one and get own copy of its result or its exception.
+    Thread safe, can be shared by clients of one token: YandexPdd(..., coalesce=SingleFlight())
+    """
+
+    def __init__(self):
+        self.calls = 0  # all calls
+        self.coalesced = 0  # calls served by request of other call
+        self._flights = {}  # key -> [event, result, error, followers]
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        Counters
+        :return: dict
+        """
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._flights)}
+
+    def do(self, key, func):
+        """
+        Call func once for concurrent calls with key
+        :param key: key of request
+        :param func: callable() -> response
+        :return: response, own copy of it for waiting calls
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = [threading.Event(), None, None, 0]  # event, result, error, followers
+            else:
+                flight[3] += 1
+                self.coalesced += 1
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return copy.deepcopy(flight[1])
+        try:
+            result = func()
+        except BaseException as e:
+            flight[2] = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:  # removed once: new leader of key can be in flight already
+                    del self._flights[key]
+                followers = flight[3]
+            try:
+                # Followers copy private snapshot: result of leader can be changed by its caller meanwhile
+                if followers and flight[2] is None:
+                    flight[1] = copy.deepcopy(result)
+            finally:
+                flight[0].set()
+        return result
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    Single-flight for AsyncYandexPdd: concurrent calls with same key await one task
+    """
+
+    def __init__(self):
+        super(AsyncSingleFlight, self).__init__()
+        self._flights = {}  # key -> [asyncio.Task, followers]
+
+    async def do(self, key, func):
+        """
+        Await func once for concurrent calls with key
+        :param key: key of request
+        :param func: callable() -> coroutine of response
+        :return: response, own copy of it for each call when calls are coalesced
+        """
+        import asyncio  # imported by async clients only
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight[1] += 1
+            self.coalesced += 1
+            return copy.deepcopy(await asyncio.shield(flight[0]))
+
+        async def run():
+            try:
+                return await func()
+            finally:
+                if self._flights.get(key) is flight:  # no followers join after result is ready
+                    del self._flights[key]
+
+        flight = self._flights[key] = [None, 0]
+        flight[0] = asyncio.ensure_future(run())
+        result = await asyncio.shield(flight[0])
+        # Result of task is shared by followers: leader gets own copy too
+        return copy.deepcopy(result) if flight[1] else result
@@ -0,0 +1,341 @@
+# coding: utf8
+
+"""
+Write-behind queue of email_edit: changes of one mailbox made within window are sent by one request
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .endpoints import ENDPOINTS_BY_PATH
+
+EDIT_FIELDS = frozenset(p for p in ENDPOINTS_BY_PATH['email/edit'].params if p not in ('login', 'uid'))
+
+
+def edit_key(domain, login=None, uid=None):
+    """
+    Key of mailbox: changes with same key are merged. Login and uid of one mailbox are different keys
+    :param domain: Domain name
+    :param login: Login / email
+    :param uid: Email uid
+    :return: tuple
+    """
+    if login:
+        login = str(login).lower()
+        if '@' not in login and domain:
+            login = '%s@%s' % (login, domain)
+        return 'login', login
+    if uid:
+        return 'uid', str(uid)
+    raise ValueError('Login or uid required')
+
+
+class PendingEdit(object):
+    """
+    Merged changes of mailbox waiting to be sent
+    """
+
+    __slots__ = ('login', 'uid', 'fields', 'futures', 'deadline')
+
+    def __init__(self, login, uid, deadline):
+        self.login = login
+        self.uid = uid
+        self.fields = {}
+        self.futures = []
+        self.deadline = deadline
+
+    def kwargs(self):
+        """
+        Args of email_edit
+        :return: dict
+        """
+        kwargs = dict(self.fields)
+        if self.login:
+            kwargs['login'] = self.login
+        else:
+            kwargs['uid'] = self.uid
+        return kwargs
+
+
+def edit_fields(fields):
+    """
+    Check fields of email_edit
+    :param fields: dict
+    :raise ValueError: unknown field
+    :return: dict of set fields
+    """
+    unknown = set(fields) - EDIT_FIELDS
+    if unknown:
+        raise ValueError('Unknown fields of email_edit: %s' % ', '.join(sorted(unknown)))
+    return {k: v for k, v in fields.items() if v is not None}
+
+
+class EditQueue(object):
+    """
+    Write-behind queue of email_edit, thread safe. Changes of one mailbox made within window seconds from the first
+    one are merged, later value of field wins. Each edit returns Future resolved by result of merged request:
+
+        with app.email_edit_queue(window=0.5, workers=4) as queue:
+            queue.edit('login', iname='Ivan')
+            queue.edit('login', enabled=False).result()  # one request: iname and enabled
+
+    Error of merged request is set to futures of all its edits. Requests of one mailbox are not sent concurrently,
+    so later changes are never overwritten by earlier ones
+    """
+
+    def __init__(self, client, window=0.2, workers=4):
+        """
+        Init
+        :param client: YandexPdd
+        :param window: seconds changes of mailbox are collected before request
+        :param workers: requests sent concurrently
+        """
+        self.client = client
+        self.window = window
+        self.workers = max(1, workers)
+        self.edits = 0  # edit calls
+        self.requests = 0  # email_edit requests sent
+        self._pending = OrderedDict()  # key -> PendingEdit, in order of deadline
+        self._in_flight = set()  # keys
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def stats(self):
+        """
+        Counters
+        :return: dict
+        """
+        with self._cond:
+            return {'edits': self.edits, 'requests': self.requests, 'merged': self.edits - self.requests,
+                    'pending': len(self._pending), 'in_flight': len(self._in_flight)}
+
+    def _add(self, login, uid, fields, future):
+        key = edit_key(self.client._domain, login, uid)
+        fields = edit_fields(fields)
+        if self._closed:
+            raise RuntimeError('EditQueue is closed')
+        item = self._pending.get(key)
+        if item is None:
+            item = self._pending[key] = PendingEdit(login, uid, time.time() + self.window)
+        item.fields.update(fields)
+        item.futures.append(future)
+        self.edits += 1
+        return future
+
+    def edit(self, login=None, uid=None, **fields):
+        """
+        Queue change of mailbox
+        :param login: |Login / email
+        :param uid: |Email uid
+        :param fields: args of email_edit: password, iname, fname, enabled, birth_date, sex, hintq, hinta
+        :raise ValueError: no login and uid, unknown field
+        :return: Future of email_edit result
+        """
+        with self._cond:
+            future = self._add(login, uid, fields, Future())
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                self._thread = threading.Thread(target=self._run, name='EditQueue', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def _due(self, now):
+        """
+        Take items to send
+        :return: list of (key, PendingEdit)
+        """
+        due = []
+        for key, item in self._pending.items():
+            if not self._flushing and item.deadline > now:
+                break
+            if key not in self._in_flight and len(self._in_flight) < self.workers:
+                due.append((key, item))
+                self._in_flight.add(key)
+        for key, _ in due:
+            del self._pending[key]
+        return due
+
+    def _timeout(self, now):
+        """
+        Seconds until next item is due
+        :return: float / None - wait for request in flight or new edit
+        """
+        if self._flushing:
+            return None
+        for key, item in self._pending.items():
+            if key not in self._in_flight:
+                return item.deadline - now if item.deadline > now else None
+        return None
+
+    def _run(self):
+        with self._cond:
+            while True:
+                for key, item in self._due(time.time()):
+                    self._executor.submit(self._send, key, item)
+                if self._closed and not self._pending and not self._in_flight:
+                    return
+                self._cond.wait(self._timeout(time.time()))
+
+    def _send(self, key, item):
+        try:
+            result = self.client.email_edit(**item.kwargs())
+        except Exception as e:
+            for future in item.futures:
+                future.set_exception(e)
+        else:
+            for future in item.futures:
+                future.set_result(result)
+        finally:
+            with self._cond:
+                self._in_flight.discard(key)
+                self.requests += 1
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Send queued changes now and wait for them
+        :param timeout: max seconds / None - no limit
+        :return: bool - all changes are sent
+        """
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        """
+        Flush queued changes and stop queue
+        :param timeout: max seconds of flush / None - no limit
+        """
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+        if thread is not None:
+            thread.join(timeout)
+            executor.shutdown(wait=False)
+
+
+class AsyncEditQueue(EditQueue):
+    """
+    Write-behind queue of email_edit for AsyncYandexPdd, edit returns asyncio.Future:
+
+        async with app.email_edit_queue(window=0.5) as queue:
+            await queue.edit('login', iname='Ivan')
+    """
+
+    def __init__(self, client, window=0.2, workers=4):
+        super(AsyncEditQueue, self).__init__(client, window, workers)
+        self._task = None
+        self._wakeup = None  # asyncio.Event: queue is changed
+        self._sent = None  # asyncio.Condition: request is done
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError('Use "async with" for AsyncEditQueue')
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def edit(self, login=None, uid=None, **fields):
+        """
+        Queue change of mailbox
+        :param login: |Login / email
+        :param uid: |Email uid
+        :param fields: args of email_edit: password, iname, fname, enabled, birth_date, sex, hintq, hinta
+        :raise ValueError: no login and uid, unknown field
+        :return: asyncio.Future of email_edit result
+        """
+        import asyncio  # imported by async clients only
+        future = self._add(login, uid, fields, asyncio.get_running_loop().create_future())
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._sent = asyncio.Condition()
+            self._task = asyncio.ensure_future(self._run())
+        self._notify()
+        return future
+
+    async def _run(self):
+        import asyncio  # imported by async clients only
+        while True:
+            for key, item in self._due(time.time()):
+                asyncio.ensure_future(self._send(key, item))
+            if self._closed and not self._pending and not self._in_flight:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._timeout(time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, key, item):
+        try:
+            result = await self.client.email_edit(**item.kwargs())
+        except Exception as e:
+            for future in item.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in item.futures:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._in_flight.discard(key)
+            self.requests += 1
+            self._notify()
+            async with self._sent:
+                self._sent.notify_all()
+
+    async def flush(self, timeout=None):
+        """
+        Send queued changes now and wait for them
+        :param timeout: max seconds / None - no limit
+        :return: bool - all changes are sent
+        """
+        import asyncio  # imported by async clients only
+        if self._task is None:
+            return True
+        self._flushing += 1
+        self._notify()
+        try:
+            async with self._sent:
+                await asyncio.wait_for(self._sent.wait_for(lambda: not self._pending and not self._in_flight), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._flushing -= 1
+
+    async def close(self, timeout=None):
+        """
+        Flush queued changes and stop queue
+        :param timeout: max seconds of flush / None - no limit
+        """
+        await self.flush(timeout)
+        self._closed = True
+        self._notify()
+        if self._task is not None:
+            await self._task
+
@@ -0,0 +1,452 @@
+# coding: utf8
+
+"""
+Declarative table of Yandex.PDD API endpoints.
+Client methods are generated from it once, when client class is created.
+"""
+
+import datetime
+
+from .records import Account, DnsRecord, Domain, Subscriber, records_convert
+
+
+def yes_no(value):
+    """
+    bool -> yes/no
+    :param value: bool / None
+    :return: str / None
+    """
+    if value is None:
+        return None
+    return 'yes' if value else 'no'
+
+
+def yes_none(value):
+    """
+    bool -> yes/None
+    :param value: bool / None
+    :return: str / None
+    """
+    return 'yes' if value else None
+
+
+def date_format(value):
+    """
+    date -> %Y-%m-%d
+    :param value: datetime / str / None
+    :return: str / None
+    """
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+class Endpoint(object):
+    """
+    API endpoint description
+    """
+
+    __slots__ = ('name', 'path', 'method', 'params', 'defaults', 'required', 'rename', 'convert', 'result',
+                 'invalidates', 'idempotent', 'aliases', 'records', 'doc')
+
+    def __init__(self, name, path, method='post', params=(), required=(), rename=None, convert=None, result=None,
+                 invalidates=(), idempotent=None, aliases=(), records=None, doc=None):
+        """
+        Init
+        :param name: method name
+        :param path: url path
+        :param method: request method - get/post
+        :param params: arguments of method, name or (name, default)
+        :param required: groups of arguments, one of group required: ((name, ...), error message)
+        :param rename: argument name -> request param name
+        :param convert: argument name -> function for value
+        :param result: key of response returned by method / True / None - full response
+        :param invalidates: url paths of cached responses changed by method / None - all of domain
+        :param idempotent: request can be repeated safely, GET by default
+        :param aliases: other names of method
+        :param records: (key of items in response, Record class) for typed clients
+        :param doc: docstring of method
+        """
+        self.name = name
+        self.path = path
+        self.method = method
+        params = [p if isinstance(p, tuple) else (p,) for p in params]
+        self.params = tuple(p[0] for p in params)
+        self.defaults = tuple(p[1] for p in params if len(p) > 1)
+        self.required = tuple(required)
+        self.rename = rename or {}
+        self.convert = convert or {}
+        self.result = result
+        self.invalidates = invalidates if invalidates is None else tuple(invalidates)
+        self.idempotent = method == 'get' if idempotent is None else idempotent
+        self.aliases = tuple(aliases)
+        self.records = records
+        self.doc = doc
+
+    def __repr__(self):
+        return '<Endpoint %s %s %s>' % (self.name, self.method.upper(), self.path)
+
+    def prepare(self, data):
+        """
+        Check and convert arguments of method to request data
+        :param data: dict of arguments
+        :raise ValueError: required argument not set
+        :return: dict
+        """
+        for names, message in self.required:
+            for key in names:
+                if data.get(key):
+                    break
+            else:
+                raise ValueError(message)
+        ret = {}
+        for key, value in data.items():
+            if key in self.convert:
+                value = self.convert[key](value)
+            if value is None:
+                continue
+            ret[self.rename.get(key, key)] = value
+        return ret
+
+    def response(self, client, r):
+        """
+        Result of method by response
+        :param client: YandexPdd
+        :param r: response dict
+        :return: mixed
+        """
+        if self.records is not None and client.typed:
+            r = records_convert(r, *self.records)
+        if self.result is None or client.response_full:
+            return r
+        if self.result is True:
+            return True
+        return r[self.result]
+
+    def method_create(self):
+        """
+        Create client method: arguments are passed to client._call as dict
+        :return: function
+        """
+        args = ', '.join(('self',) + self.params)
+        data = ', '.join("'%s': %s" % (key, key) for key in self.params)
+        source = 'def %s(%s):\n    return self._call(endpoint, {%s})\n' % (self.name, args, data)
+        namespace = {'endpoint': self}
+        exec(source, namespace)
+        func = namespace[self.name]
+        func.__defaults__ = self.defaults or None
+        func.__doc__ = self.doc
+        func.endpoint = self
+        return func
+
+
+def endpoints_install(endpoints):
+    """
+    Class decorator, add methods of endpoints to class. Methods defined in class are kept
+    :param endpoints: list of Endpoint
+    :return: decorator
+    """
+    def wrapper(cls):
+        for endpoint in endpoints:
+            func = endpoint.method_create()
+            for name in (endpoint.name,) + endpoint.aliases:
+                if name not in cls.__dict__:
+                    setattr(cls, name, func)
+        return cls
+    return wrapper
+
+
+LOGIN_OR_UID = (('login', 'uid'), 'Login or uid required')
+MAILLIST_OR_UID = (('maillist', 'maillist_uid'), 'Maillist or uid required')
+SUBSCRIBER_OR_UID = (('subscriber', 'subscriber_uid'), 'Subscriber or uid required')
+
+DNS_PARAMS = (('admin_mail', None), ('content', None), ('priority', None), ('weight', None), ('port', None),
+              ('target', None), ('subdomain', None), ('ttl', None))
+EMAIL_PATHS = ('email/list', 'email/counters', 'domain/details')
+ML_PATHS = ('email/ml/list', 'email/ml/subscribers', 'email/ml/get_can_send_on_behalf')
+
+IMPORT_PARAMS = (('method', 'imap'), ('server', 'imap.yandex.ru'), ('port', 993), ('ssl', True))
+
+ENDPOINTS = [
+    # -----------------------------------------------------------------------------------------------------------------
+    # DOMAIN ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('domain_list', 'domain/domains', 'get', params=(('page', 1), ('on_page', 30)),
+             records=('domains', Domain), doc='''
+        Domain list
+        :param page: Page
+        :param on_page: Items on page
+        :return: dict
+        '''),
+    Endpoint('domain_register', 'domain/register', invalidates=None, doc='''
+        Register domain
+        :return: dict
+        '''),
+    Endpoint('domain_registration_status', 'domain/registration_status', 'get', result='status', doc='''
+        Registration status
+        :return: str: domain-activate;mx-activate;added / dict
+        '''),
+    Endpoint('domain_details', 'domain/details', 'get', doc='''
+        Domain details
+        :return: dict
+        '''),
+    Endpoint('domain_delete', 'domain/delete', result=True, invalidates=None, doc='''
+        Domain delete
+        :return: True / dict
+        '''),
+    Endpoint('domain_settings_set_country', 'domain/settings/set_country', params=('country',), result=True,
+             invalidates=('domain/details',), idempotent=True, doc='''
+        Set country for domain
+        :param country: Country name by ISO 3166-1
+        :return: True / dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # EMAIL ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('email_add', 'email/add', params=('login', 'password'), result='uid', invalidates=EMAIL_PATHS, doc='''
+        Email add
+        :param login: email
+        :param password: password
+        :return: uid(int) / dict
+        '''),
+    Endpoint('email_list', 'email/list', 'get', params=(('page', 1), ('on_page', 30)),
+             records=('accounts', Account), doc='''
+        Email list
+        :param page: Page
+        :param on_page: Items on page
+        :return: dict
+        '''),
+    Endpoint('email_edit', 'email/edit', params=(
+        ('login', None), ('uid', None), ('password', None), ('iname', None), ('fname', None), ('enabled', None),
+        ('birth_date', None), ('sex', None), ('hintq', None), ('hinta', None),
+    ), required=(LOGIN_OR_UID,), convert={'enabled': yes_no, 'birth_date': date_format}, result=True,
+       invalidates=EMAIL_PATHS, idempotent=True, doc='''
+        Email edit
+        :param login: |Login / email
+        :param uid: |Email uid
+        :param password: Password
+        :param iname: First name
+        :param fname: Second name
+        :param enabled: bool
+        :param birth_date: datetime / %Y-%m-%d
+        :param sex: 0-not set;1-male;2-female
+        :param hintq: Secret question
+        :param hinta: Secret answer
+        :return: True / dict
+        '''),
+    Endpoint('email_del', 'email/del', params=(('login', None), ('uid', None)), required=(LOGIN_OR_UID,),
+             result=True, invalidates=EMAIL_PATHS, doc='''
+        Email delete
+        :param login: |Login / email
+        :param uid: |Email uid
+        :return: True / dict
+        '''),
+    Endpoint('email_counters', 'email/counters', 'get', params=(('login', None), ('uid', None)),
+             required=(LOGIN_OR_UID,), result='counters', doc='''
+        Email counters - messages
+        :param login: |Login / email
+        :param uid: |Email uid
+        :return: dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # MAIL LIST ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('email_ml_add', 'email/ml/add', params=('maillist',), result='uid', aliases=('ml_add',),
+             invalidates=('email/ml/list',), doc='''
+        Mail list add
+        :param maillist: email
+        :return: uid(int) / dict
+        '''),
+    Endpoint('email_ml_list', 'email/ml/list', 'get', result='maillists', aliases=('ml_list',), doc='''
+        List of mail lists
+        :return: list / dict
+        '''),
+    Endpoint('email_ml_del', 'email/ml/del', params=(('maillist', None), ('maillist_uid', None)),
+             required=(MAILLIST_OR_UID,), result=True, aliases=('ml_del',), invalidates=ML_PATHS, doc='''
+        Mail list delete
+        :param maillist: |Email
+        :param maillist_uid: |Email uid
+        :return: True / dict
+        '''),
+    Endpoint('email_ml_subscribe', 'email/ml/subscribe', params=(
+        ('maillist', None), ('maillist_uid', None), ('subscriber', None), ('subscriber_uid', None),
+        ('can_send_on_behalf', None),
+    ), required=(MAILLIST_OR_UID, SUBSCRIBER_OR_UID), convert={'can_send_on_behalf': yes_no}, result=True,
+       aliases=('ml_subscribe',), invalidates=ML_PATHS, doc='''
+        Mail list subscribe email
+        :param maillist: |Email
+        :param maillist_uid: |Email uid
+        :param subscriber: |Email subscriber
+        :param subscriber_uid: |Email subscriber uid
+        :param can_send_on_behalf: can send by email list name
+        :return: True / dict
+        '''),
+    Endpoint('email_ml_subscribers', 'email/ml/subscribers', 'get', params=(('maillist', None), ('maillist_uid', None)),
+             required=(MAILLIST_OR_UID,), result='subscribers', aliases=('ml_subscribers',),
+             records=('subscribers', Subscriber), doc='''
+        Mail list subscribes list
+        :param maillist: | Email
+        :param maillist_uid: |Email uid
+        :return: list / dict
+        '''),
+    Endpoint('email_ml_unsubscribe', 'email/ml/unsubscribe', params=(
+        ('maillist', None), ('maillist_uid', None), ('subscriber', None), ('subscriber_uid', None),
+    ), required=(MAILLIST_OR_UID, SUBSCRIBER_OR_UID), result=True, aliases=('ml_unsubscribe',),
+       invalidates=ML_PATHS, doc='''
+        Email list unsubscribe email
+        :param maillist: |Email
+        :param maillist_uid: |Email uid
+        :param subscriber: |Email subscriber
+        :param subscriber_uid: |Email subscriber uid
+        :return: True / dict
+        '''),
+    Endpoint('email_ml_get_can_send_on_behalf', 'email/ml/get_can_send_on_behalf', 'get', params=(
+        ('maillist', None), ('maillist_uid', None), ('subscriber', None), ('subscriber_uid', None),
+    ), required=(MAILLIST_OR_UID, SUBSCRIBER_OR_UID), result='can_send_on_behalf', aliases=('ml_send_get',), doc='''
+        Email list get subscriber can send mail by name of mail list
+        :param maillist: |Email
+        :param maillist_uid: |Email uid
+        :param subscriber: |Email subscriber
+        :param subscriber_uid: |Email subscriber uid
+        :return: bool / dict
+        '''),
+    Endpoint('email_ml_set_can_send_on_behalf', 'email/ml/set_can_send_on_behalf', params=(
+        ('maillist', None), ('maillist_uid', None), ('subscriber', None), ('subscriber_uid', None),
+        ('can_send_on_behalf', None),
+    ), required=(MAILLIST_OR_UID, SUBSCRIBER_OR_UID), convert={'can_send_on_behalf': yes_no}, result=True,
+       aliases=('ml_send_set',), invalidates=ML_PATHS, idempotent=True, doc='''
+        Email list set subscriber can send mail by name of mail list
+        :param maillist: |Email
+        :param maillist_uid: |Email uid
+        :param subscriber: |Email subscriber
+        :param subscriber_uid: |Email subscriber uid
+        :param can_send_on_behalf: can send by email list name
+        :return: True / dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # IMPORT MAILBOX ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('import_check_settings', 'import/check_settings', 'get', params=IMPORT_PARAMS, result=True, doc='''
+        Check that yandex can import server
+        :param method: imap;imap4;pop;pop3
+        :param server: Domain name / ip ext server
+        :param port: Port
+        :param ssl: bool
+        :return: True / dict
+        '''),
+    Endpoint('import_start_one_import', 'import/start_one_import', params=IMPORT_PARAMS + (
+        ('ext_login', None), ('ext_passwd', None), ('int_login', None), ('int_passwd', None),
+    ), rename={
+        'ext_login': 'ext-login', 'ext_passwd': 'ext-passwd', 'int_login': 'int-login', 'int_passwd': 'int-passwd',
+    }, result=True, invalidates=('import/check_imports',), doc='''
+        Import mailbox
+        :param method: imap;imap4;pop;pop3
+        :param server: Domain name / ip ext server
+        :param port: Port
+        :param ssl: bool
+        :param ext_login: External login
+        :param ext_passwd: External password
+        :param int_login: opt, internal login
+        :param int_passwd: opt, internal password
+        :return: True / dict
+        '''),
+    Endpoint('import_check_imports', 'import/check_imports', 'get', params=(('page', 1), ('on_page', 10)),
+             result='import', doc='''
+        Check status of imports
+        :param page: Page
+        :param on_page: Items on page
+        :return: list / dict
+        '''),
+    Endpoint('import_stop_all_imports', 'import/stop_all_imports', result=True,
+             invalidates=('import/check_imports',), idempotent=True, doc='''
+        Stop all imports
+        :return: True / dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # ADMIN ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('deputy_add', 'deputy/add', params=('login',), result=True, invalidates=('deputy/list',), doc='''
+        Add subadmin for domain
+        :param login: Email, *@yandex.ru
+        :return: True / dict
+        '''),
+    Endpoint('deputy_list', 'deputy/list', 'get', result='deputies', doc='''
+        Get subadmin list for domain
+        :return: list / dict
+        '''),
+    Endpoint('deputy_delete', 'deputy/delete', params=('login',), result=True, invalidates=('deputy/list',), doc='''
+        Remove subadmin from domain
+        :param login: Email, *@yandex.ru
+        :return: True / dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # DKIM ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('dkim_status', 'dkim/status', 'get', params=(('secretkey', None),), convert={'secretkey': yes_none},
+             result='dkim', doc='''
+        DKIM get status
+        :param secretkey: bool, get secret key
+        :return: dict
+        '''),
+    Endpoint('dkim_enable', 'dkim/enable', result='dkim', invalidates=('dkim/status',), idempotent=True, doc='''
+        DKIM enable
+        :return: dict
+        '''),
+    Endpoint('dkim_disable', 'dkim/disable', result='dkim', invalidates=('dkim/status',), idempotent=True, doc='''
+        DKIM disable
+        :return: dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # DNS ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('dns_add', 'dns/add', params=('type',) + DNS_PARAMS, result='record', invalidates=('dns/list',),
+             records=('record', DnsRecord), doc='''
+        DNS add record
+        :param type: SRV;TXT;NS;MX;SOA;A;AAAA;CNAME.
+        :param admin_mail: admin mail
+        :param content: value
+        :param priority: int
+        :param weight: int
+        :param port: int
+        :param target: value
+        :param subdomain: value
+        :param ttl: int
+        :return: dict
+        '''),
+    Endpoint('dns_list', 'dns/list', 'get', result='records', records=('records', DnsRecord), doc='''
+        DNS get records
+        :return: list / dict
+        '''),
+    Endpoint('dns_edit', 'dns/edit', params=('record_id',) + DNS_PARAMS, result=True, invalidates=('dns/list',),
+             idempotent=True, doc='''
+        DNS edit record
+        :param record_id: Record id
+        :param admin_mail: admin mail
+        :param content: value
+        :param priority: int
+        :param weight: int
+        :param port: int
+        :param target: value
+        :param subdomain: value
+        :param ttl: int
+        :return: True / dict
+        '''),
+    Endpoint('dns_del', 'dns/del', params=('record_id',), result=True, invalidates=('dns/list',), doc='''
+        DNS delete record
+        :param record_id: Record id
+        :return: True / dict
+        '''),
+    # -----------------------------------------------------------------------------------------------------------------
+    # AUTH ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+    Endpoint('email_get_oauth_token', 'email/get_oauth_token', params=(('login', None), ('uid', None)),
+             result='oauth-token', idempotent=True, doc='''
+        Get oauth token
+        :param login: |Email / login
+        :param uid: |Email uid
+        :return: str / dict
+        '''),
+]
+
+ENDPOINTS_BY_NAME = {endpoint.name: endpoint for endpoint in ENDPOINTS}
+ENDPOINTS_BY_PATH = {endpoint.path: endpoint for endpoint in ENDPOINTS}
@@ -0,0 +1,566 @@
+# coding: utf8
+
+"""
+In-process fake of Yandex.PDD API for tests and benchmarks, no network access:
+
+    with FakePddServer(latency=0.005) as server:
+        server.add_domain('domain.com', accounts=1000)
+        app = YandexPdd('domain.com', server.token, url=server.url)
+        app.email_list_all()
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from .sync import flag
+
+
+class FakeError(Exception):
+    """
+    Yandex error of fake api: success=error
+    """
+    pass
+
+
+def page_of(items, data, on_page_default):
+    """
+    Page of list
+    :param items: list
+    :param data: request params: page, on_page
+    :param on_page_default: items on page by default
+    :return: dict
+    """
+    page = max(1, int(data.get('page') or 1))
+    on_page = max(1, int(data.get('on_page') or on_page_default))
+    return {
+        'page': page,
+        'on_page': on_page,
+        'total': len(items),
+        'found': len(items),
+        'pages': (len(items) + on_page - 1) // on_page,
+        'items': items[(page - 1) * on_page:page * on_page],
+    }
+
+
+class FakeDomain(object):
+    """
+    State of domain in fake api
+    """
+
+    def __init__(self, name, status='added'):
+        self.name = name
+        self.status = status
+        self.registration_polls = 0
+        self.registered = time.time()
+        self.country = 'ru'
+        self.accounts = {}  # login -> account dict
+        self.maillists = {}  # maillist -> {'uid': uid, 'subscribers': {email: can send on behalf}}
+        self.records = {}  # record_id -> record dict
+        self.deputies = []
+        self.imports = []
+        self.dkim = False
+
+    def email(self, login):
+        """
+        Full email of login
+        :param login: login / email
+        :return: str
+        """
+        login = str(login).lower()
+        return login if '@' in login else '%s@%s' % (login, self.name)
+
+
+class FakePdd(object):
+    """
+    State and handlers of fake api, without http
+    """
+
+    def __init__(self, token='fake-token', latency=0.0, error_rate=0.0, rate_limit=None, registration_polls=2,
+                 registration_duration=None, import_duration=1.0, seed=None):
+        """
+        Init
+        :param token: accepted PddToken / list of them / None - any
+        :param latency: seconds of every request
+        :param error_rate: part of requests failed with temporary error no_reply
+        :param rate_limit: requests per second of token, others fail with too_many_requests / None - no limit
+        :param registration_polls: count of polls before domain is added: domain_registration_status calls and
+            domain_list pages with domain
+        :param registration_duration: seconds after domain_register domain is added if polls did not add it before /
+            None - by polls only
+        :param import_duration: seconds of mailbox import
+        :param seed: seed of random errors
+        """
+        self.tokens = None if token is None else frozenset([token] if isinstance(token, str) else token)
+        self.token = token if token is None or isinstance(token, str) else list(token)[0]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.registration_polls = registration_polls
+        self.registration_duration = registration_duration
+        self.import_duration = import_duration
+        self.domains = {}
+        self.requests = 0
+        self._uid = 1000
+        self._random = random.Random(seed)
+        self._allowance = {}  # token -> (tokens, time)
+        self._lock = threading.RLock()
+
+    def uid(self):
+        with self._lock:
+            self._uid += 1
+            return self._uid
+
+    def add_domain(self, name, accounts=0, maillists=0, records=0, status='added'):
+        """
+        Add domain with generated state
+        :param name: Domain name
+        :param accounts: count of accounts user<n>
+        :param maillists: count of mail lists list<n> with all accounts
+        :param records: count of A records host<n>
+        :param status: registration status
+        :return: FakeDomain
+        """
+        with self._lock:
+            domain = self.domains[name] = FakeDomain(name, status=status)
+            for i in range(accounts):
+                self.email_add(domain, {'login': 'user%d' % i, 'password': 'password'})
+            for i in range(maillists):
+                maillist = self.email_ml_add(domain, {'maillist': 'list%d' % i})['maillist']
+                for login in domain.accounts:
+                    domain.maillists[maillist]['subscribers'][login] = False
+            for i in range(records):
+                self.dns_add(domain, {'type': 'A', 'subdomain': 'host%d' % i, 'content': '10.0.%d.%d' % (i // 256,
+                                                                                                        i % 256)})
+            return domain
+
+    def _throttled(self, token):
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._allowance.get(token, (float(self.rate_limit), now))
+            tokens = min(float(self.rate_limit), tokens + (now - updated) * self.rate_limit)
+            if tokens < 1:
+                self._allowance[token] = (tokens, now)
+                return True
+            self._allowance[token] = (tokens - 1, now)
+            return False
+
+    def handle(self, method, path, data, token):
+        """
+        Handle request
+        :param method: GET / POST
+        :param path: url path: /api2/admin/email/add
+        :param data: request params
+        :param token: PddToken header
+        :return: response dict
+        """
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = path.strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'api2' or parts[1] not in ('admin', 'registrar'):
+            return {'success': 'error', 'error': 'unknown_method'}
+        name = '_'.join(parts[2:])
+        try:
+            if self.tokens is not None and token not in self.tokens:
+                raise FakeError('bad_token')
+            if self._throttled(token):
+                raise FakeError('too_many_requests')
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise FakeError('no_reply')
+            handler = getattr(self, name, None)
+            if handler is None or name.startswith('_') or name in ('handle', 'uid', 'add_domain'):
+                raise FakeError('unknown_method')
+            with self._lock:
+                if name in ('domain_domains', 'domain_register'):
+                    ret = handler(data)
+                else:
+                    domain = self.domains.get(data.get('domain'))
+                    if domain is None:
+                        raise FakeError('bad_domain')
+                    ret = handler(domain, data)
+        except FakeError as e:
+            return {'success': 'error', 'error': e.args[0]}
+        ret = dict(ret or {})
+        ret['success'] = 'ok'
+        return ret
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # DOMAIN ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def _registration_poll(self, domain):
+        """
+        Status of domain is read: by domain_registration_status / domain_domains page with domain
+        """
+        domain.registration_polls += 1
+        if domain.status == 'added':
+            return
+        duration = self.registration_duration
+        if domain.registration_polls >= self.registration_polls or (
+                duration is not None and time.time() - domain.registered >= duration):
+            domain.status = 'added'
+
+    def domain_domains(self, data):
+        page = page_of(sorted(self.domains), data, 30)
+        page['domains'] = []
+        for name in page.pop('items'):
+            domain = self.domains[name]
+            self._registration_poll(domain)
+            page['domains'].append({'name': name, 'status': domain.status, 'country': domain.country})
+        del page['pages']
+        return page
+
+    def domain_register(self, data):
+        name = data.get('domain')
+        if not name:
+            raise FakeError('no_domain')
+        if name in self.domains:
+            raise FakeError('occupied')
+        self.domains[name] = FakeDomain(name, status='domain-activate')
+        return {'domain': name, 'stage': 'owner-check', 'secrets': {'name': 'secret', 'content': 'secret'}}
+
+    def domain_registration_status(self, domain, data):
+        self._registration_poll(domain)
+        return {'domain': domain.name, 'status': domain.status}
+
+    def domain_details(self, domain, data):
+        return {'domain': domain.name, 'status': domain.status, 'country': domain.country,
+                'accounts-count': len(domain.accounts)}
+
+    def domain_delete(self, domain, data):
+        del self.domains[domain.name]
+
+    def domain_settings_set_country(self, domain, data):
+        domain.country = data.get('country')
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # EMAIL ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def _account(self, domain, data):
+        if data.get('uid'):
+            for account in domain.accounts.values():
+                if str(account['uid']) == str(data['uid']):
+                    return account
+        elif data.get('login'):
+            account = domain.accounts.get(domain.email(data['login']))
+            if account is not None:
+                return account
+        raise FakeError('account_not_found')
+
+    def email_add(self, domain, data):
+        login = domain.email(data.get('login') or '')
+        if not data.get('password'):
+            raise FakeError('no_password')
+        if login in domain.accounts or login in domain.maillists:
+            raise FakeError('occupied')
+        domain.accounts[login] = {'login': login, 'uid': self.uid(), 'enabled': 'yes', 'iname': '', 'fname': '',
+                                  'birth_date': '', 'sex': 0, 'hintq': '', 'ready': 'yes', 'maillist': 'no',
+                                  'counters': {'unread': 0, 'new': 0}}
+        return {'login': login, 'uid': domain.accounts[login]['uid']}
+
+    def email_list(self, domain, data):
+        page = page_of([domain.accounts[login] for login in sorted(domain.accounts)], data, 30)
+        page['accounts'] = [{k: v for k, v in account.items() if k != 'counters'} for account in page.pop('items')]
+        return page
+
+    def email_edit(self, domain, data):
+        account = self._account(domain, data)
+        for key in ('iname', 'fname', 'enabled', 'birth_date', 'sex', 'hintq'):
+            if key in data:
+                account[key] = data[key]
+        return {'login': account['login'], 'uid': account['uid']}
+
+    def email_del(self, domain, data):
+        account = self._account(domain, data)
+        del domain.accounts[account['login']]
+        for maillist in domain.maillists.values():
+            maillist['subscribers'].pop(account['login'], None)
+        return {'login': account['login'], 'uid': account['uid']}
+
+    def email_counters(self, domain, data):
+        account = self._account(domain, data)
+        return {'login': account['login'], 'uid': account['uid'], 'counters': dict(account['counters'])}
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # MAIL LIST ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def _maillist(self, domain, data):
+        if data.get('maillist_uid'):
+            for name, maillist in domain.maillists.items():
+                if str(maillist['uid']) == str(data['maillist_uid']):
+                    return name, maillist
+        elif data.get('maillist'):
+            name = domain.email(data['maillist'])
+            if name in domain.maillists:
+                return name, domain.maillists[name]
+        raise FakeError('not_found')
+
+    def _subscriber(self, domain, data):
+        if data.get('subscriber_uid'):
+            return self._account(domain, {'uid': data['subscriber_uid']})['login']
+        if data.get('subscriber'):
+            return domain.email(data['subscriber'])
+        raise FakeError('no_subscriber')
+
+    def email_ml_add(self, domain, data):
+        name = domain.email(data.get('maillist') or '')
+        if name in domain.maillists or name in domain.accounts:
+            raise FakeError('occupied')
+        domain.maillists[name] = {'uid': self.uid(), 'subscribers': {}}
+        return {'maillist': name, 'uid': domain.maillists[name]['uid']}
+
+    def email_ml_list(self, domain, data):
+        return {'maillists': [{'maillist': name, 'uid': maillist['uid'], 'cnt': len(maillist['subscribers'])}
+                              for name, maillist in sorted(domain.maillists.items())]}
+
+    def email_ml_del(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        del domain.maillists[name]
+        return {'maillist': name, 'uid': maillist['uid']}
+
+    def email_ml_subscribe(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        subscriber = self._subscriber(domain, data)
+        maillist['subscribers'][subscriber] = bool(flag(data.get('can_send_on_behalf')))
+        return {'maillist': name, 'subscriber': subscriber}
+
+    def email_ml_subscribers(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        return {'maillist': name, 'subscribers': sorted(maillist['subscribers'])}
+
+    def email_ml_unsubscribe(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        subscriber = self._subscriber(domain, data)
+        if maillist['subscribers'].pop(subscriber, None) is None:
+            raise FakeError('not_subscribed')
+        return {'maillist': name, 'subscriber': subscriber}
+
+    def email_ml_get_can_send_on_behalf(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        subscriber = self._subscriber(domain, data)
+        if subscriber not in maillist['subscribers']:
+            raise FakeError('not_subscribed')
+        return {'can_send_on_behalf': 'yes' if maillist['subscribers'][subscriber] else 'no'}
+
+    def email_ml_set_can_send_on_behalf(self, domain, data):
+        name, maillist = self._maillist(domain, data)
+        subscriber = self._subscriber(domain, data)
+        if subscriber not in maillist['subscribers']:
+            raise FakeError('not_subscribed')
+        maillist['subscribers'][subscriber] = bool(flag(data.get('can_send_on_behalf')))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # IMPORT MAILBOX ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def import_check_settings(self, domain, data):
+        pass
+
+    def import_start_one_import(self, domain, data):
+        login = domain.email(data.get('int-login') or data.get('ext-login') or '')
+        domain.imports = [item for item in domain.imports if item['login'] != login]
+        domain.imports.append({'login': login, 'ext-login': data.get('ext-login'), 'state': 'running',
+                               'progress': 0, 'started': time.time()})
+
+    def import_check_imports(self, domain, data):
+        now = time.time()
+        for item in domain.imports:
+            if item['state'] == 'running':
+                item['progress'] = min(100, int((now - item['started']) * 100 / (self.import_duration or 1e-9)))
+                if item['progress'] >= 100:
+                    item['state'] = 'done'
+        page = page_of(domain.imports, data, 10)
+        page['import'] = [{k: v for k, v in item.items() if k != 'started'} for item in page.pop('items')]
+        return page
+
+    def import_stop_all_imports(self, domain, data):
+        for item in domain.imports:
+            if item['state'] == 'running':
+                item['state'] = 'stopped'
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # ADMIN ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def deputy_add(self, domain, data):
+        if data.get('login') in domain.deputies:
+            raise FakeError('occupied')
+        domain.deputies.append(data.get('login'))
+
+    def deputy_list(self, domain, data):
+        return {'deputies': list(domain.deputies)}
+
+    def deputy_delete(self, domain, data):
+        if data.get('login') not in domain.deputies:
+            raise FakeError('not_found')
+        domain.deputies.remove(data.get('login'))
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # DKIM ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def dkim_status(self, domain, data):
+        dkim = {'enabled': 'yes' if domain.dkim else 'no', 'mailbox': 'mail._domainkey.%s' % domain.name,
+                'txtrecord': 'v=DKIM1; k=rsa; t=s; p=FAKE'}
+        if data.get('secretkey') == 'yes':
+            dkim['secretkey'] = 'FAKE'
+        return {'domain': domain.name, 'dkim': dkim}
+
+    def dkim_enable(self, domain, data):
+        domain.dkim = True
+        return self.dkim_status(domain, {})
+
+    def dkim_disable(self, domain, data):
+        domain.dkim = False
+        return self.dkim_status(domain, {})
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # DNS ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def dns_add(self, domain, data):
+        if not data.get('type'):
+            raise FakeError('no_type')
+        record = {'record_id': self.uid(), 'domain': domain.name, 'type': data['type'].upper(),
+                  'subdomain': data.get('subdomain') or '@', 'content': data.get('content') or '',
+                  'ttl': int(data.get('ttl') or 21600), 'priority': data.get('priority') or ''}
+        for key in ('weight', 'port', 'target', 'admin_mail'):
+            if data.get(key) is not None:
+                record[key] = data[key]
+        record['fqdn'] = domain.name if record['subdomain'] == '@' else '%s.%s' % (record['subdomain'], domain.name)
+        domain.records[record['record_id']] = record
+        return {'domain': domain.name, 'record': dict(record)}
+
+    def dns_list(self, domain, data):
+        return {'domain': domain.name, 'records': [dict(record) for _, record in sorted(domain.records.items())]}
+
+    def dns_edit(self, domain, data):
+        record = domain.records.get(int(data.get('record_id') or 0))
+        if record is None:
+            raise FakeError('not_found')
+        for key in ('subdomain', 'content', 'priority', 'weight', 'port', 'target', 'admin_mail'):
+            if data.get(key) is not None:
+                record[key] = data[key]
+        if data.get('ttl') is not None:
+            record['ttl'] = int(data['ttl'])
+        return {'domain': domain.name, 'record_id': record['record_id'], 'record': dict(record)}
+
+    def dns_del(self, domain, data):
+        if domain.records.pop(int(data.get('record_id') or 0), None) is None:
+            raise FakeError('not_found')
+        return {'domain': domain.name, 'record_id': int(data['record_id'])}
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # AUTH ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def email_get_oauth_token(self, domain, data):
+        account = self._account(domain, data)
+        return {'oauth-token': 'token-%s-%s' % (account['uid'], self.uid())}
+
+
+class FakePddHandler(BaseHTTPRequestHandler):
+    """
+    Http handler of fake api
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        url = urlparse(self.path)
+        data = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            data.update(parse_qsl(self.rfile.read(length).decode('utf8')))
+        ret = self.server.pdd.handle(self.command, url.path, data, self.headers.get('PddToken'))
+        body = json.dumps(ret).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Default 5 drops connections of concurrent clients
+
+
+class FakePddServer(object):
+    """
+    Http server of fake api in background thread
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        """
+        Init
+        :param host: host to listen
+        :param port: port to listen, 0 - any free
+        :param kwargs: args of FakePdd: token, latency, error_rate, rate_limit, registration_polls, import_duration...
+        """
+        self.pdd = FakePdd(**kwargs)
+        self._httpd = FakeHTTPServer((host, port), FakePddHandler)
+        self._httpd.pdd = self.pdd
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def url(self):
+        """
+        Url for client: YandexPdd(..., url=server.url)
+        :return: str
+        """
+        host, port = self._httpd.server_address[:2]
+        return u'http://%s:%d/api2/' % (host, port)
+
+    @property
+    def token(self):
+        return self.pdd.token
+
+    def add_domain(self, name, **kwargs):
+        """
+        Add domain with generated state, args of FakePdd.add_domain
+        :return: FakeDomain
+        """
+        return self.pdd.add_domain(name, **kwargs)
+
+    def start(self):
+        """
+        Start serving in background thread
+        :return: self
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name='FakePddServer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving
+        """
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
@@ -0,0 +1,116 @@
+# coding: utf8
+
+"""
+Fleet of domains of one token: fan out api methods over many domains
+"""
+
+import threading
+
+from .bulk import BulkJob
+from .yandex_pdd import YandexPdd, session_create
+
+
+class YandexPddFleet(object):
+    """
+    Many domains of one token (registrar or admin). Clients of domains share one connection pool:
+
+        with YandexPddFleet('<TOKEN>', workers=16) as fleet:
+            for r in fleet.map('dkim_status'):
+                print(r.spec, r.result if r.ok else r.error)
+    """
+
+    def __init__(self, token, domains=None, registrar=True, workers=8, client_class=YandexPdd, **client_kwargs):
+        """
+        Init
+        :param token: PDD Token
+        :param domains: list of domain names / None - discovered by domain_list_all
+        :param registrar: Request as registrar
+        :param workers: domains processed concurrently
+        :param client_class: class of domain clients
+        :param client_kwargs: args of domain clients: response_full, timeout, transport, cache, rate_limiter, retry...
+        """
+        self._token = token
+        self._domains = list(domains) if domains is not None else None
+        self._registrar = registrar
+        self.workers = workers
+        self.client_class = client_class
+        self.client_kwargs = client_kwargs
+        self._session = session_create(pool_size=max(workers, 1), transport=client_kwargs.get('transport'))
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close connections of fleet
+        """
+        self._session.close()
+
+    def client(self, domain):
+        """
+        Client of domain
+        :param domain: Domain name / None - client for requests not bound to domain
+        :return: YandexPdd
+        """
+        with self._lock:
+            client = self._clients.get(domain)
+            if client is None:
+                client = self._clients[domain] = self.client_class(
+                    domain, self._token, registrar=self._registrar, session=self._session, **self.client_kwargs)
+            return client
+
+    def domains(self, refresh=False):
+        """
+        Domains of fleet, discovered by domain_list_all
+        :param refresh: discover again
+        :return: list of domain names
+        """
+        if self._domains is None or refresh:
+            self._domains = [d['name'] for d in self.client(None).domain_list_all(workers=self.workers)]
+        return self._domains
+
+    def domains_filter(self, condition):
+        """
+        Domains by condition
+        :param condition: callable(domain dict of domain_list_all) -> bool
+        :return: list of domain names
+        """
+        return [d['name'] for d in self.client(None).domain_list_all(workers=self.workers) if condition(d)]
+
+    def map(self, method, *args, domains=None, **kwargs):
+        """
+        Call method for domains concurrently. Error of one domain does not stop others
+        :param method: name of client method / callable(client)
+        :param args: args of method
+        :param domains: list of domain names / callable(domain dict) -> bool / None - all domains
+        :param kwargs: kwargs of method
+        :return: BulkJob - iterable of BulkResult in order of completion, BulkResult.spec is domain name
+        """
+        if domains is None:
+            domains = self.domains()
+        elif callable(domains):
+            domains = self.domains_filter(domains)
+
+        def call(domain):
+            client = self.client(domain)
+            if callable(method):
+                return method(client)
+            return getattr(client, method)(*args, **kwargs)
+
+        return BulkJob(call, domains, workers=self.workers)
+
+    def onboard(self, specs, **kwargs):
+        """
+        Onboarding of new domains: register, wait until added, dkim, country, dns, deputies, emails
+        :param specs: iterable of Domain name / dict: domain, country, dkim, dns, deputies, emails
+        :param kwargs: args of Onboarding: checkpoint, job, min_interval, max_interval, wait_timeout, on_event...
+        :return: Onboarding, run() it
+        """
+        from .onboarding import Onboarding
+        kwargs.setdefault('workers', self.workers)
+        return Onboarding(self, specs, **kwargs)
@@ -0,0 +1,222 @@
+# coding: utf8
+
+"""
+Mailbox import orchestration: start imports with bounded concurrency, watch all of them by one
+paginated poller with adaptive interval, status change events and stall detection
+"""
+
+import time
+
+DONE_STATES = ('done', 'finished', 'complete', 'completed', 'success', 'ok')  # Import finished successfully
+FAILED_STATES = ('error', 'failed', 'stopped', 'cancelled')  # Import finished with error
+
+CHANGED = 'changed'  # Status of job changed
+FINISHED = 'finished'  # Job reached final state
+STALLED = 'stalled'  # Status of job not changed for stall timeout
+FAILED = 'failed'  # Import was not started
+
+
+def import_login(spec, domain):
+    """
+    Internal login of import
+    :param spec: dict of import_start_one_import args / login
+    :param domain: Domain name
+    :return: lower email
+    """
+    if isinstance(spec, dict):
+        spec = spec.get('int_login') or spec.get('ext_login') or spec.get('login')
+    login = str(spec).lower()
+    return login if '@' in login or not domain else '%s@%s' % (login, domain)
+
+
+class ImportJob(object):
+    """
+    Tracked import of one mailbox
+    """
+
+    __slots__ = ('login', 'spec', 'state', 'status', 'changed', 'stalled', 'error')
+
+    def __init__(self, login, spec=None, error=None):
+        """
+        Init
+        :param login: internal email of mailbox
+        :param spec: args of import_start_one_import
+        :param error: exception of import start
+        """
+        self.login = login
+        self.spec = spec
+        self.state = None  # state of last status / None - not seen in import_check_imports yet
+        self.status = None  # last item of import_check_imports
+        self.changed = time.time()  # time of last status change
+        self.stalled = False
+        self.error = error
+
+    def __repr__(self):
+        return '<ImportJob %s %s%s>' % (self.login, self.error or self.state, ' stalled' if self.stalled else '')
+
+    @property
+    def finished(self):
+        return self.error is not None or self.state in DONE_STATES or self.state in FAILED_STATES
+
+    @property
+    def ok(self):
+        return self.error is None and self.state in DONE_STATES
+
+
+class ImportWatcher(object):
+    """
+    Poller of import_check_imports for many imports. Poll interval goes down while statuses change
+    and up while they do not. Events (event, ImportJob) are passed to on_event callback:
+
+        watcher = app.import_watch(['user1', 'user2'], on_event=lambda event, job: print(event, job))
+        watcher.watch()
+        print(watcher.report())
+    """
+
+    def __init__(self, client, logins=None, on_event=None, min_interval=2.0, max_interval=60.0, backoff=1.5,
+                 stall_timeout=600.0, on_page=10):
+        """
+        Init
+        :param client: YandexPdd / AsyncYandexPdd
+        :param logins: logins of tracked imports / None - all imports found by first poll
+        :param on_event: callback(event, job): CHANGED / FINISHED / STALLED / FAILED
+        :param min_interval: min seconds between polls
+        :param max_interval: max seconds between polls
+        :param backoff: interval multiplier after poll without changes
+        :param stall_timeout: seconds without status change to consider job stalled
+        :param on_page: Items on page of import_check_imports
+        """
+        self.client = client
+        self.on_event = on_event
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.stall_timeout = stall_timeout
+        self.on_page = on_page
+        self.interval = min_interval
+        self.polls = 0
+        self.jobs = {}
+        self._discover = logins is None
+        for login in logins or ():
+            self.add(login)
+
+    def __repr__(self):
+        return '<ImportWatcher %s>' % self.report()
+
+    def add(self, spec, error=None):
+        """
+        Track import
+        :param spec: login / dict of import_start_one_import args
+        :param error: exception of import start, job is finished with FAILED event
+        :return: ImportJob
+        """
+        job = ImportJob(import_login(spec, self.client._domain), spec if isinstance(spec, dict) else None, error)
+        self.jobs[job.login] = job
+        if error is not None:
+            self._emit(FAILED, job)
+        return job
+
+    @property
+    def pending(self):
+        """
+        Jobs not finished and not stalled
+        :return: list of ImportJob
+        """
+        return [job for job in self.jobs.values() if not job.finished and not job.stalled]
+
+    @property
+    def done(self):
+        return not self.pending and (self.polls > 0 or not self._discover)
+
+    def report(self):
+        """
+        Counts of jobs by state
+        :return: str
+        """
+        counts = {}
+        for job in self.jobs.values():
+            state = 'failed to start' if job.error is not None else 'stalled' if job.stalled else str(job.state)
+            counts[state] = counts.get(state, 0) + 1
+        return '%d imports: %s' % (len(self.jobs), ', '.join('%s %d' % item for item in sorted(counts.items())))
+
+    def _emit(self, event, job):
+        if self.on_event is not None:
+            self.on_event(event, job)
+
+    def update(self, items, now=None):
+        """
+        Apply statuses of one poll
+        :param items: items of import_check_imports
+        :param now: time of poll
+        :return: list of (event, ImportJob)
+        """
+        now = time.time() if now is None else now
+        events = []
+        for item in items:
+            login = import_login(item.get('login') or item.get('int-login') or '', self.client._domain)
+            job = self.jobs.get(login)
+            if job is None:
+                if not self._discover:
+                    continue
+                job = self.jobs[login] = ImportJob(login)
+            if item == job.status:
+                continue
+            job.status = item
+            job.state = item.get('state', item.get('status'))
+            job.changed = now
+            job.stalled = False
+            events.append((FINISHED if job.finished else CHANGED, job))
+        for job in self.jobs.values():
+            if not job.finished and not job.stalled and now - job.changed >= self.stall_timeout:
+                job.stalled = True
+                events.append((STALLED, job))
+        self._discover = False
+        self.polls += 1
+        if any(event != STALLED for event, _ in events):
+            self.interval = max(self.min_interval, self.interval / self.backoff ** 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        for event, job in events:
+            self._emit(event, job)
+        return events
+
+    def poll(self):
+        """
+        Fetch all pages of statuses once
+        :return: list of (event, ImportJob)
+        """
+        return self.update(list(self.client.iter_imports(on_page=self.on_page)))
+
+    def watch(self, timeout=None):
+        """
+        Poll until all jobs are finished or stalled
+        :param timeout: max seconds / None - no limit
+        :return: self
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.poll()
+            if self.done or (deadline is not None and time.time() + self.interval > deadline):
+                return self
+            time.sleep(self.interval)
+
+    async def poll_async(self):
+        """
+        Fetch all pages of statuses once by AsyncYandexPdd
+        :return: list of (event, ImportJob)
+        """
+        return self.update([item async for item in self.client.iter_imports(on_page=self.on_page)])
+
+    async def watch_async(self, timeout=None):
+        """
+        Poll by AsyncYandexPdd until all jobs are finished or stalled
+        :param timeout: max seconds / None - no limit
+        :return: self
+        """
+        import asyncio  # imported by async clients only
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            await self.poll_async()
+            if self.done or (deadline is not None and time.time() + self.interval > deadline):
+                return self
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,164 @@
+# coding: utf8
+
+"""
+Request hooks info and per endpoint metrics with Prometheus text export
+"""
+
+import threading
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+
+OK = 'ok'  # Success response
+ERROR = 'error'  # Yandex error: success != ok
+TRANSPORT = 'transport'  # Request failed on network level
+BAD_RESPONSE = 'bad_response'  # Response is not json
+
+
+class RequestInfo(object):
+    """
+    Request passed to hooks: before request duration, size and outcome are None
+    """
+
+    __slots__ = ('endpoint', 'method', 'domain', 'started', 'duration', 'size', 'outcome', 'error')
+
+    def __init__(self, endpoint, method, domain, started):
+        """
+        Init
+        :param endpoint: url path
+        :param method: request method - get/post
+        :param domain: Domain name
+        :param started: time.time() of start
+        """
+        self.endpoint = endpoint
+        self.method = method
+        self.domain = domain
+        self.started = started
+        self.duration = None
+        self.size = None
+        self.outcome = None
+        self.error = None
+
+    def __repr__(self):
+        return '<RequestInfo %s %s %s %s>' % (self.method.upper(), self.endpoint, self.outcome, self.duration)
+
+
+def label_value(value):
+    """
+    Escape Prometheus label value
+    :param value: str
+    :return: str
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics(object):
+    """
+    Latency histograms, request, error and response size counters per endpoint. Thread safe,
+    can be shared by clients. Pass it as client hook: YandexPdd(..., metrics=Metrics())
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Init
+        :param buckets: upper bounds of latency histogram, seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._latency = {}  # (endpoint, method) -> [bucket counts..., sum, count]
+        self._requests = {}  # (endpoint, method, outcome) -> count
+        self._errors = {}  # (endpoint, error) -> count
+        self._bytes = {}  # (endpoint, method) -> bytes
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        """
+        After request hook
+        :param info: RequestInfo
+        """
+        self.observe(info)
+
+    def observe(self, info):
+        """
+        Count finished request
+        :param info: RequestInfo
+        """
+        key = (info.endpoint, info.method)
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if info.duration <= bound:
+                    latency[i] += 1
+            latency[-2] += info.duration
+            latency[-1] += 1
+            key_outcome = key + (info.outcome,)
+            self._requests[key_outcome] = self._requests.get(key_outcome, 0) + 1
+            if info.outcome == ERROR:
+                key_error = (info.endpoint, info.error.args[0] if info.error.args else 'unknown')
+                self._errors[key_error] = self._errors.get(key_error, 0) + 1
+            if info.size:
+                self._bytes[key] = self._bytes.get(key, 0) + info.size
+
+    def snapshot(self):
+        """
+        Current values
+        :return: dict
+        """
+        with self._lock:
+            return {
+                'latency': {key: list(value) for key, value in self._latency.items()},
+                'requests': dict(self._requests),
+                'errors': dict(self._errors),
+                'bytes': dict(self._bytes),
+            }
+
+    def reset(self):
+        """
+        Reset all values
+        """
+        with self._lock:
+            self._latency.clear()
+            self._requests.clear()
+            self._errors.clear()
+            self._bytes.clear()
+
+    def to_prometheus(self, prefix='yandex_pdd'):
+        """
+        Snapshot in Prometheus text format
+        :param prefix: prefix of metric names
+        :return: str
+        """
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP %s_request_duration_seconds Duration of requests' % prefix,
+            '# TYPE %s_request_duration_seconds histogram' % prefix,
+        ]
+        for (endpoint, method), latency in sorted(snapshot['latency'].items()):
+            labels = 'endpoint="%s",method="%s"' % (label_value(endpoint), method)
+            for bound, count in zip(self.buckets, latency):
+                lines.append('%s_request_duration_seconds_bucket{%s,le="%s"} %d' % (prefix, labels, bound, count))
+            lines.append('%s_request_duration_seconds_bucket{%s,le="+Inf"} %d' % (prefix, labels, latency[-1]))
+            lines.append('%s_request_duration_seconds_sum{%s} %s' % (prefix, labels, repr(latency[-2])))
+            lines.append('%s_request_duration_seconds_count{%s} %d' % (prefix, labels, latency[-1]))
+        lines += [
+            '# HELP %s_requests_total Requests by outcome' % prefix,
+            '# TYPE %s_requests_total counter' % prefix,
+        ]
+        for (endpoint, method, outcome), count in sorted(snapshot['requests'].items()):
+            lines.append('%s_requests_total{endpoint="%s",method="%s",outcome="%s"} %d' % (
+                prefix, label_value(endpoint), method, outcome, count))
+        lines += [
+            '# HELP %s_errors_total Yandex errors by code' % prefix,
+            '# TYPE %s_errors_total counter' % prefix,
+        ]
+        for (endpoint, error), count in sorted(snapshot['errors'].items()):
+            lines.append('%s_errors_total{endpoint="%s",error="%s"} %d' % (
+                prefix, label_value(endpoint), label_value(error), count))
+        lines += [
+            '# HELP %s_response_bytes_total Size of responses' % prefix,
+            '# TYPE %s_response_bytes_total counter' % prefix,
+        ]
+        for (endpoint, method), size in sorted(snapshot['bytes'].items()):
+            lines.append('%s_response_bytes_total{endpoint="%s",method="%s"} %d' % (
+                prefix, label_value(endpoint), method, size))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,106 @@
+# coding: utf8
+
+"""
+Cache of oauth tokens of mailboxes for passport_oauth links
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class OAuthTokenCache(object):
+    """
+    Oauth tokens by domain and login / uid with expiry, least recently used are removed. Thread safe,
+    can be shared by clients: YandexPdd(..., oauth_cache=OAuthTokenCache(ttl=1800))
+    """
+
+    def __init__(self, ttl=1800, max_size=10000, refresh_before=300):
+        """
+        Init
+        :param ttl: seconds token is used
+        :param max_size: max count of tokens
+        :param refresh_before: seconds before expiry token is refreshed by prefetch
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.refresh_before = refresh_before
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (expires, token)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(domain, login=None, uid=None):
+        """
+        Key of token
+        :param domain: Domain name
+        :param login: Email / login
+        :param uid: Email uid
+        :return: tuple
+        """
+        if login is not None:
+            login = str(login).lower()
+            if '@' not in login and domain:
+                login = '%s@%s' % (login, domain)
+            return domain, 'login', login
+        return domain, 'uid', str(uid)
+
+    def get(self, domain, login=None, uid=None):
+        """
+        Token not expired
+        :return: str / None
+        """
+        key = self.key(domain, login, uid)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= time.time():
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def fresh(self, domain, login=None, uid=None):
+        """
+        Token is cached and is not going to expire in refresh_before seconds
+        :return: bool
+        """
+        with self._lock:
+            item = self._items.get(self.key(domain, login, uid))
+            return item is not None and item[0] - self.refresh_before > time.time()
+
+    def set(self, domain, token, login=None, uid=None, ttl=None):
+        """
+        Save token
+        :param domain: Domain name
+        :param token: oauth token
+        :param login: Email / login
+        :param uid: Email uid
+        :param ttl: seconds, ttl of cache by default
+        """
+        key = self.key(domain, login, uid)
+        with self._lock:
+            self._items[key] = (time.time() + (self.ttl if ttl is None else ttl), token)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, domain, login=None, uid=None):
+        """
+        Remove token
+        """
+        with self._lock:
+            self._items.pop(self.key(domain, login, uid), None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """
+        Counters
+        :return: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
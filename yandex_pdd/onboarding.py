@@ -0,0 +1,396 @@
+# coding: utf8
+
+"""
+Onboarding of many domains at once: each domain goes through stages
+register -> wait until added -> dkim -> country -> dns -> deputy -> email.
+Registration statuses of all waiting domains are polled together with adaptive interval,
+state of each domain is saved to checkpoint after every step
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .bulk import BulkJob, spec_call
+from .sync import DNS_IDENTITY, dns_changes, dns_name
+from .yandex_pdd import YandexPddExceptionY, pages_count
+
+REGISTER = 'register'  # domain_register
+WAIT = 'wait'  # domain_registration_status until added
+DKIM = 'dkim'  # dkim_enable
+COUNTRY = 'country'  # domain_settings_set_country
+DNS = 'dns'  # dns_add of each record
+DEPUTY = 'deputy'  # deputy_add of each login
+EMAIL = 'email'  # email_add of each mailbox
+DONE = 'done'
+STAGES = (REGISTER, WAIT, DKIM, COUNTRY, DNS, DEPUTY, EMAIL)
+
+ADDED = 'added'  # Registration status of domain ready for settings
+
+STAGE = 'stage'  # Domain entered stage
+FINISHED = 'finished'  # Domain is onboarded
+FAILED = 'failed'  # Step of domain failed, domain is stopped at its stage
+
+OCCUPIED = 'occupied'  # Error of add done before: by run stopped before its state was saved
+
+
+def onboarding_spec(spec):
+    """
+    Spec of domain onboarding
+    :param spec: Domain name / dict: domain, country, dkim (default True), dns - list of dns_add kwargs,
+        deputies - list of logins, emails - list of (login, password) / dict of email_add kwargs
+    :raise ValueError: no domain
+    :return: dict
+    """
+    if isinstance(spec, str):
+        spec = {'domain': spec}
+    if not spec.get('domain'):
+        raise ValueError('Domain required')
+    return dict(spec)
+
+
+class DomainState(object):
+    """
+    Stage of domain and time spent on each stage
+    """
+
+    __slots__ = ('domain', 'spec', 'stage', 'stage_started', 'timings', 'progress', 'status', 'error')
+
+    def __init__(self, spec, saved=None):
+        """
+        Init
+        :param spec: onboarding_spec
+        :param saved: state dict of checkpoint
+        """
+        self.domain = spec['domain']
+        self.spec = spec
+        self.stage = REGISTER
+        self.stage_started = None  # time stage was entered
+        self.timings = {}  # stage -> seconds
+        self.progress = 0  # items of stage done: dns records, deputies, emails
+        self.status = None  # last registration status
+        self.error = None
+        if saved:
+            for key in ('stage', 'stage_started', 'timings', 'progress', 'status', 'error'):
+                setattr(self, key, saved.get(key, getattr(self, key)))
+
+    def __repr__(self):
+        return '<DomainState %s %s%s>' % (self.domain, self.stage, ' %s' % self.error if self.error else '')
+
+    @property
+    def finished(self):
+        return self.stage == DONE
+
+    def to_dict(self):
+        """
+        State for checkpoint
+        :return: dict
+        """
+        return {'stage': self.stage, 'stage_started': self.stage_started, 'timings': self.timings,
+                'progress': self.progress, 'status': self.status, 'error': self.error}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+class Onboarding(object):
+    """
+    Onboarding of domains of registrar token. Steps of domains run concurrently in workers, domains waiting for
+    registration are polled together: by domain_list_all when it takes fewer requests than polling each one.
+    Events (event, DomainState) are passed to on_event callback from worker threads:
+
+        with YandexPddFleet('<TOKEN>', workers=16) as fleet:
+            onboarding = fleet.onboard(specs, checkpoint=Checkpoint('onboarding.checkpoint'))
+            onboarding.run()
+            print(onboarding.report())
+
+    Domain is stopped at stage of failed step, run() again continues from it. Adds repeated after crash
+    (error occupied) are treated as done, DNS records already in zone are not added again
+    """
+
+    def __init__(self, fleet, specs, checkpoint=None, job='onboarding', workers=8, min_interval=5.0,
+                 max_interval=120.0, backoff=1.5, wait_timeout=None, on_page=100, on_event=None):
+        """
+        Init
+        :param fleet: YandexPddFleet of registrar token
+        :param specs: iterable of onboarding_spec: Domain name / dict
+        :param checkpoint: Checkpoint: states of domains are saved and restored
+        :param job: job name in checkpoint
+        :param workers: steps of domains run concurrently
+        :param min_interval: min seconds between polls of registration statuses
+        :param max_interval: max seconds between polls
+        :param backoff: interval multiplier after poll without changes
+        :param wait_timeout: seconds domain waits for registration before it fails / None - no limit
+        :param on_page: domains on page of domain_list_all poll
+        :param on_event: callable(event, DomainState)
+        """
+        self.fleet = fleet
+        self.checkpoint = checkpoint
+        self.job = job
+        self.workers = max(1, workers)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.wait_timeout = wait_timeout
+        self.on_page = on_page
+        self.on_event = on_event
+        self.interval = min_interval
+        self.polls = 0
+        self.poll_requests = 0
+        self.poll_errors = 0
+        self.poll_error = None  # error of last failed poll
+        self._list_pages = None  # pages of domain_list_all, known after first list poll
+        self._waiting_added = threading.Event()  # domain entered WAIT: next poll after min_interval
+        job_state = checkpoint.job(job) if checkpoint is not None else None
+        saved = job_state.states if job_state is not None else {}
+        self.states = {}
+        for spec in specs:
+            spec = onboarding_spec(spec)
+            self.states[spec['domain']] = DomainState(spec, saved.get(spec['domain']))
+
+    def _emit(self, event, state):
+        if self.on_event is not None:
+            self.on_event(event, state)
+
+    def _save(self, state):
+        if self.checkpoint is not None:
+            self.checkpoint.state(self.job, state.domain, state.to_dict())
+
+    def _next(self, state, now=None):
+        """
+        Move domain to next stage
+        """
+        now = time.time() if now is None else now
+        started = state.stage_started if state.stage_started is not None else now
+        state.timings[state.stage] = state.timings.get(state.stage, 0.0) + now - started
+        i = STAGES.index(state.stage) + 1
+        state.stage = STAGES[i] if i < len(STAGES) else DONE
+        state.stage_started = now
+        state.progress = 0
+        self._save(state)
+        if state.stage == WAIT:
+            self._waiting_added.set()
+        self._emit(FINISHED if state.finished else STAGE, state)
+
+    def _fail(self, state, error):
+        state.error = str(error.args[0]) if error.args else type(error).__name__
+        self._save(state)
+        self._emit(FAILED, state)
+
+    @staticmethod
+    def _add(func, *args, **kwargs):
+        """
+        Add, error occupied means it is done
+        """
+        try:
+            return func(*args, **kwargs)
+        except YandexPddExceptionY as e:
+            if not e.args or e.args[0] != OCCUPIED:
+                raise
+
+    def _items(self, state, func, items):
+        """
+        Add items of stage from progress of domain
+        """
+        for i in range(state.progress, len(items)):
+            self._add(spec_call, func, items[i])
+            state.progress = i + 1
+            self._save(state)
+
+    def _step(self, client, state):
+        """
+        Run current stage of domain
+        """
+        spec = state.spec
+        if state.stage == REGISTER:
+            self._add(client.domain_register)
+        elif state.stage == DKIM:
+            if spec.get('dkim', True):
+                client.dkim_enable()
+        elif state.stage == COUNTRY:
+            if spec.get('country'):
+                client.domain_settings_set_country(spec['country'])
+        elif state.stage == DNS:
+            records = spec.get('dns') or []
+            if records:
+                client._cache_drop('dns/list')
+                current = client.dns_list()
+                records = [r for r in records if not any(
+                    dns_name(c) == dns_name(r) and not dns_changes(c, r, DNS_IDENTITY) for c in current)]
+                state.progress = 0
+            self._items(state, client.dns_add, records)
+        elif state.stage == DEPUTY:
+            self._items(state, client.deputy_add, spec.get('deputies') or [])
+        elif state.stage == EMAIL:
+            self._items(state, client.email_add, spec.get('emails') or [])
+        self._next(state)
+
+    def _advance(self, state):
+        """
+        Run stages of domain until it waits for registration, is done or fails
+        """
+        if state.stage_started is None:
+            state.stage_started = time.time()
+        client = self.fleet.client(state.domain)
+        try:
+            while state.stage not in (WAIT, DONE):
+                self._step(client, state)
+        except Exception as e:
+            self._fail(state, e)
+
+    def _statuses(self, domains):
+        """
+        Registration statuses of domains: by domain_list_all when it takes fewer requests than polling each one
+        :param domains: Domain names
+        :raise YandexPddException: page of domain_list_all failed
+        :return: dict: domain -> status, failed domain_registration_status are missing
+        """
+        statuses = {}
+        if len(domains) > 1 and (self._list_pages is None or self._list_pages < len(domains)):
+            client = self.fleet.client(None)
+            r = client.domain_list(page=1, on_page=self.on_page)
+            self._list_pages = pages_count(r, self.on_page)
+            self.poll_requests += 1
+            items = list(r['domains'])
+            if self._list_pages < len(domains):
+                job = BulkJob(lambda page: client.domain_list(page=page, on_page=self.on_page),
+                              range(2, self._list_pages + 1), workers=self.workers)
+                for r in job.results():
+                    if r.error is not None:
+                        raise r.error
+                    items += r.result['domains']
+                self.poll_requests += self._list_pages - 1
+            statuses = {item['name']: item.get('status') for item in items}
+        rest = [d for d in domains if d not in statuses]
+        if rest:
+            self.poll_requests += len(rest)
+            job = BulkJob(lambda domain: self.fleet.client(domain).domain_registration_status(), rest,
+                          workers=self.workers)
+            statuses.update((r.spec, r.result) for r in job if r.ok)
+        return statuses
+
+    def poll(self):
+        """
+        Poll registration statuses of waiting domains once, added ones go to next stage.
+        Failed poll is counted in poll_errors, next one is after longer interval
+        :return: list of DomainState with changed status
+        """
+        waiting = [s for s in self.states.values() if s.stage == WAIT and s.error is None]
+        if not waiting:
+            return []
+        try:
+            statuses = self._statuses([s.domain for s in waiting])
+        except Exception as e:
+            statuses = None
+            self.poll_errors += 1
+            self.poll_error = str(e.args[0]) if e.args else type(e).__name__
+        now = time.time()
+        changed = []
+        for state in waiting:
+            status = statuses.get(state.domain) if statuses is not None else None
+            if status is not None and status != state.status:
+                state.status = status
+                changed.append(state)
+                if status != ADDED:
+                    self._save(state)
+            if state.status == ADDED:
+                self._next(state, now)
+            elif self.wait_timeout is not None and now - state.stage_started > self.wait_timeout:
+                self._fail(state, Exception('registration_timeout'))
+        self.polls += 1
+        if statuses is None:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        elif changed:
+            self.interval = max(self.min_interval, self.interval / self.backoff ** 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return changed
+
+    def run(self, timeout=None, retry_failed=True):
+        """
+        Onboard domains until all of them are done or failed
+        :param timeout: max seconds / None - no limit, steps in progress are finished
+        :param retry_failed: continue failed domains from stage of their error
+        :return: self
+        """
+        if retry_failed:
+            for state in self.states.values():
+                if state.error is not None and state.stage == WAIT:
+                    state.stage_started = time.time()  # wait_timeout again
+                state.error = None
+        deadline = None if timeout is None else time.time() + timeout
+        next_poll = 0.0
+        in_flight = {}  # future -> DomainState
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                now = time.time()
+                if deadline is None or now < deadline:
+                    for state in self.states.values():
+                        if len(in_flight) >= self.workers:
+                            break
+                        if state.stage not in (WAIT, DONE) and state.error is None and state not in in_flight.values():
+                            in_flight[executor.submit(self._advance, state)] = state
+                if self._waiting_added.is_set():
+                    self._waiting_added.clear()
+                    self.interval = self.min_interval
+                    next_poll = min(next_poll, now + self.min_interval)
+                waiting = any(s.stage == WAIT and s.error is None for s in self.states.values())
+                if waiting and now >= next_poll and (deadline is None or now < deadline):
+                    self.poll()
+                    next_poll = time.time() + self.interval
+                    continue
+                if not in_flight and (not waiting or (deadline is not None and now >= deadline)):
+                    return self
+                poll_in = max(0.0, next_poll - now) if waiting else None
+                if deadline is not None:
+                    poll_in = max(0.0, deadline - now) if poll_in is None else min(poll_in, max(0.0, deadline - now))
+                if not in_flight:
+                    time.sleep(poll_in)
+                    continue
+                done, _ = wait(list(in_flight), timeout=poll_in, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+
+    @property
+    def done(self):
+        return all(s.finished or s.error is not None for s in self.states.values())
+
+    def stats(self):
+        """
+        Count of domains by stage and latency of stages
+        :return: dict: stages - stage -> count, failed - count, latency - stage -> dict of count, mean, p50, p95, max,
+            polls, poll_requests, poll_errors - counts
+        """
+        stages = {}
+        failed = 0
+        for state in self.states.values():
+            stages[state.stage] = stages.get(state.stage, 0) + 1
+            failed += state.error is not None
+        latency = {}
+        for stage in STAGES:
+            values = [s.timings[stage] for s in self.states.values() if stage in s.timings]
+            if values:
+                latency[stage] = {'count': len(values), 'mean': sum(values) / len(values),
+                                  'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95),
+                                  'max': max(values)}
+        return {'stages': stages, 'failed': failed, 'latency': latency, 'polls': self.polls,
+                'poll_requests': self.poll_requests, 'poll_errors': self.poll_errors}
+
+    def report(self):
+        """
+        Text report
+        :return: str
+        """
+        stats = self.stats()
+        lines = ['%d domains: %s, %d failed; %d polls by %d requests, %d failed' % (
+            len(self.states), ', '.join('%s %d' % (stage, stats['stages'][stage])
+                                        for stage in STAGES + (DONE,) if stage in stats['stages']),
+            stats['failed'], stats['polls'], stats['poll_requests'], stats['poll_errors'])]
+        for stage in STAGES:
+            item = stats['latency'].get(stage)
+            if item is not None:
+                lines.append('%-8s %5d  mean %8.2fs  p50 %8.2fs  p95 %8.2fs  max %8.2fs' % (
+                    stage, item['count'], item['mean'], item['p50'], item['p95'], item['max']))
+        return '\n'.join(lines)
@@ -0,0 +1,176 @@
+# coding: utf8
+
+"""
+Client side rate limit and retries of failed requests
+"""
+
+import random
+import threading
+import time
+
+THROTTLE_ERRORS = ('too_many_requests', 'ratelimit', 'rate_limit', 'limit_exceeded')  # Request rejected by rate
+TEMPORARY_ERRORS = ('no_reply', 'timeout', 'internal_error', 'service_unavailable')  # Temporary yandex errors
+
+THROTTLE = 'throttle'  # Request rejected by rate limit, not executed
+CONNECT = 'connect'  # Request was not sent
+TEMPORARY = 'temporary'  # Temporary error, request could be executed
+
+
+class RateLimiter(object):
+    """
+    Token bucket rate limiter, thread safe. Rate is cut when requests are throttled, once per cooldown: throttled
+    requests sent concurrently are one signal. Rate goes back up by share of itself after each success request.
+    Share one limiter by clients with same token:
+
+        limiter = RateLimiter.shared('<TOKEN>', rate=20)
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate=10.0, burst=None, min_rate=0.5, max_rate=None, increase=0.02, decrease=0.5,
+                 cooldown=1.0):
+        """
+        Init
+        :param rate: requests per second
+        :param burst: max requests at once, rate by default
+        :param min_rate: rate is not decreased below
+        :param max_rate: rate is not increased above, rate by default
+        :param increase: share of rate added after success request
+        :param decrease: rate multiplier after throttled request
+        :param cooldown: seconds after decrease other throttled requests do not decrease rate
+        """
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self.min_rate = min_rate
+        self.max_rate = float(max_rate or rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._decreased = None  # time of last decrease
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, token, **kwargs):
+        """
+        Limiter shared by all clients with token
+        :param token: PDD Token
+        :param kwargs: args of new limiter
+        :return: RateLimiter
+        """
+        with cls._shared_lock:
+            limiter = cls._shared.get(token)
+            if limiter is None:
+                limiter = cls._shared[token] = cls(**kwargs)
+            return limiter
+
+    def delay(self):
+        """
+        Take token for one request
+        :return: seconds to wait before request
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        Wait for token
+        """
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+
+    def throttled(self):
+        """
+        Request was throttled, decrease rate if it was not decreased within cooldown
+        """
+        with self._lock:
+            now = time.time()
+            if self._decreased is not None and now - self._decreased < self.cooldown:
+                return
+            self._decreased = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+    def success(self):
+        """
+        Request succeeded, increase rate
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * (1 + self.increase))
+
+
+class RetryPolicy(object):
+    """
+    Retries of failed requests with exponential backoff and jitter.
+    Requests not executed by server (throttled, not sent) are retried for all methods,
+    temporary errors - only for idempotent methods
+    """
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30.0, jitter=True, throttle_errors=THROTTLE_ERRORS,
+                 temporary_errors=TEMPORARY_ERRORS):
+        """
+        Init
+        :param retries: max retries of request
+        :param backoff: delay before first retry, seconds, doubled for next ones
+        :param max_backoff: max delay, seconds
+        :param jitter: randomize delay
+        :param throttle_errors: yandex errors of rate limit
+        :param temporary_errors: yandex temporary errors
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.throttle_errors = frozenset(throttle_errors)
+        self.temporary_errors = frozenset(temporary_errors)
+
+    def classify(self, error):
+        """
+        Kind of error
+        :param error: YandexPddException / YandexPddExceptionY
+        :return: THROTTLE / CONNECT / TEMPORARY / None - not retryable
+        """
+        status = getattr(error, 'status', None)
+        if status == 429:
+            return THROTTLE
+        if getattr(error, 'sent', True) is False:
+            return CONNECT
+        code = error.args[0] if error.args else None
+        if code in self.throttle_errors:
+            return THROTTLE
+        if code in self.temporary_errors:
+            return TEMPORARY
+        if getattr(error, 'transport', False) or (status is not None and status >= 500):
+            return TEMPORARY
+        return None
+
+    def retryable(self, kind, attempt, idempotent):
+        """
+        Can request be retried
+        :param kind: classify()
+        :param attempt: retries done
+        :param idempotent: request can be repeated safely
+        :return: bool
+        """
+        if kind is None or attempt >= self.retries:
+            return False
+        return kind != TEMPORARY or idempotent
+
+    def delay(self, attempt):
+        """
+        Delay before retry
+        :param attempt: retries done
+        :return: seconds
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay *= random.uniform(0.5, 1.0)
+        return delay
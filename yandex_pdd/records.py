@@ -0,0 +1,157 @@
+# coding: utf8
+
+"""
+Compact typed results: __slots__ records instead of response dicts, YandexPdd(..., typed=True).
+Fields of record are slots, fields missing in response are None, unknown fields are kept in extra dict.
+Records support dict access: record['login'], record.get('login'), so code written for dicts keeps working.
+"""
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        from json import loads as json_loads
+
+
+class Record(object):
+    """
+    Base of typed records
+    """
+
+    __slots__ = ('_extra',)
+
+    fields = ()  # Names of slots
+    shared = ()  # Fields with few distinct values, one object is kept for each string value
+    key = None  # Field used when record is created from scalar: email of subscriber
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.fields and getattr(self, key) is not None or bool(self._extra and key in self._extra)
+
+    def __getattr__(self, key):
+        # Only called for names missing in slots: unknown fields of response
+        extra = object.__getattribute__(self, '_extra')
+        if extra is not None and key in extra:
+            return extra[key]
+        raise AttributeError(key)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, ' '.join(
+            '%s=%r' % (key, getattr(self, key)) for key in self.fields[:2]))
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def get(self, key, default=None):
+        """
+        Value of field
+        :param key: field name
+        :param default: value of missing field
+        :return: mixed
+        """
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def to_dict(self):
+        """
+        Record to response dict, fields with None are skipped
+        :return: dict
+        """
+        ret = {key: getattr(self, key) for key in self.fields if getattr(self, key) is not None}
+        if self._extra:
+            ret.update(self._extra)
+        return ret
+
+
+def record_class(name, fields, shared=(), key=None, doc=None):
+    """
+    Create record class. __init__ is generated for fields: one dict lookup per field, no loops
+    :param name: class name
+    :param fields: names of slots
+    :param shared: fields with few distinct values: flags, types, statuses, strings of them are interned
+    :param key: field set when record is created from scalar
+    :param doc: docstring of class
+    :return: class
+    """
+    fields = tuple(fields)
+    lines = ['def __init__(self, data):']
+    if key is not None:
+        lines += ['    if not isinstance(data, dict):', '        data = {%r: data}' % key]
+    lines.append('    get = data.get')
+    for field in fields:
+        if field in shared:
+            lines.append('    value = get(%r)' % field)
+            # Only strings: 1 == True would give value of other type
+            lines.append('    self.%s = values.setdefault(value, value) if value.__class__ is str else value' % field)
+        else:
+            lines.append('    self.%s = get(%r)' % (field, field))
+    lines += [
+        '    extra = data.keys() - field_set',
+        '    self._extra = {k: data[k] for k in extra} if extra else None',
+    ]
+    namespace = {'field_set': frozenset(fields), 'values': {}}
+    exec('\n'.join(lines) + '\n', namespace)
+    return type(name, (Record,), {
+        '__slots__': fields, '__init__': namespace['__init__'], '__doc__': doc,
+        'fields': fields, 'shared': tuple(shared), 'key': key,
+    })
+
+
+Account = record_class('Account', (
+    'uid', 'login', 'enabled', 'ready', 'maillist', 'iname', 'fname', 'sex', 'birth_date', 'hintq', 'aliases',
+), shared=('enabled', 'ready', 'maillist', 'sex'), doc='Account of email_list')
+
+Domain = record_class('Domain', (
+    'name', 'status', 'country', 'nsdelegated', 'no_mx', 'logo_enabled', 'logo_url', 'aliases', 'master_admin',
+), shared=('status', 'country', 'nsdelegated', 'no_mx', 'logo_enabled'), doc='Domain of domain_list')
+
+DnsRecord = record_class('DnsRecord', (
+    'record_id', 'type', 'domain', 'fqdn', 'subdomain', 'content', 'ttl', 'priority', 'weight', 'port', 'target',
+    'admin_mail',
+), shared=('type', 'domain', 'ttl', 'priority'), doc='DNS record of dns_list, dns_add')
+
+Subscriber = record_class('Subscriber', ('email', 'can_send_on_behalf'), shared=('can_send_on_behalf',),
+                          key='email', doc='Subscriber of email_ml_subscribers')
+
+
+def records_convert(r, key, cls):
+    """
+    Response with items replaced by records, response is not changed: it can be shared by coalesced calls
+    :param r: response dict
+    :param key: key of list / dict of items
+    :param cls: Record class
+    :return: new dict / r - no items
+    """
+    items = r.get(key)
+    if isinstance(items, list):
+        r = dict(r)
+        r[key] = [cls(item) for item in items]
+    elif isinstance(items, dict):
+        r = dict(r)
+        r[key] = cls(items)
+    return r
@@ -0,0 +1,438 @@
+# coding: utf8
+
+"""
+Local SQLite snapshot of domains state: accounts, mail lists with subscribers, DNS records, deputies, DKIM.
+Refresh writes only changed rows, lookups are served by indexes without api requests
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PARTS = ('accounts', 'maillists', 'dns', 'deputies', 'dkim')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS accounts (
+    domain TEXT NOT NULL, login TEXT NOT NULL, uid TEXT, data TEXT NOT NULL, PRIMARY KEY (domain, login));
+CREATE INDEX IF NOT EXISTS accounts_uid ON accounts (domain, uid);
+CREATE TABLE IF NOT EXISTS maillists (
+    domain TEXT NOT NULL, maillist TEXT NOT NULL, uid TEXT, data TEXT NOT NULL, PRIMARY KEY (domain, maillist));
+CREATE TABLE IF NOT EXISTS subscribers (
+    domain TEXT NOT NULL, maillist TEXT NOT NULL, subscriber TEXT NOT NULL, data TEXT NOT NULL,
+    PRIMARY KEY (domain, maillist, subscriber));
+CREATE INDEX IF NOT EXISTS subscribers_subscriber ON subscribers (domain, subscriber);
+CREATE TABLE IF NOT EXISTS dns (
+    domain TEXT NOT NULL, record_id TEXT NOT NULL, type TEXT, subdomain TEXT, data TEXT NOT NULL,
+    PRIMARY KEY (domain, record_id));
+CREATE INDEX IF NOT EXISTS dns_name ON dns (domain, type, subdomain);
+CREATE TABLE IF NOT EXISTS deputies (
+    domain TEXT NOT NULL, login TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (domain, login));
+CREATE TABLE IF NOT EXISTS dkim (domain TEXT NOT NULL PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS refreshes (
+    domain TEXT NOT NULL, part TEXT NOT NULL, refreshed REAL NOT NULL, PRIMARY KEY (domain, part));
+'''
+
+# part -> (table, key columns of row besides domain, index columns)
+TABLES = {
+    'accounts': ('accounts', ('login',), ('uid',)),
+    'maillists': ('maillists', ('maillist',), ('uid',)),
+    'subscribers': ('subscribers', ('maillist', 'subscriber'), ()),
+    'dns': ('dns', ('record_id',), ('type', 'subdomain')),
+    'deputies': ('deputies', ('login',), ()),
+    'dkim': ('dkim', (), ()),
+}
+
+# part -> api paths read by fetch, their cached responses are dropped before
+PATHS = {
+    'accounts': ('email/list',),
+    'maillists': ('email/ml/list', 'email/ml/subscribers'),
+    'dns': ('dns/list',),
+    'deputies': ('deputy/list',),
+    'dkim': ('dkim/status',),
+}
+
+
+def item_dict(item):
+    """
+    Response item to dict
+    :param item: dict / Record / str
+    :return: dict
+    """
+    if hasattr(item, 'to_dict'):
+        return item.to_dict()
+    return item
+
+
+def lower(value):
+    return str(value).lower() if value is not None else None
+
+
+def email_key(value, domain):
+    """
+    Key of login / email in snapshot: lowercased, qualified by domain, so user and user@domain.com are the same
+    :param value: login / email
+    :param domain: Domain name
+    :return: str / None
+    """
+    value = lower(value)
+    if value is None or '@' in value or not domain:
+        return value
+    return '%s@%s' % (value, domain.lower())
+
+
+def part_rows(part, data, domain=None):
+    """
+    Rows of part by api responses
+    :param part: name of part
+    :param data: fetched data of part
+    :param domain: Domain name, qualifies bare logins
+    :return: dict: table -> {key tuple: (index values tuple, data dict)}
+    """
+    if part == 'accounts':
+        return {'accounts': {(email_key(a['login'], domain),): ((str(a.get('uid')),), a)
+                             for a in map(item_dict, data)}}
+    if part == 'maillists':
+        maillists, subscribers = data
+        ret = {'maillists': {}, 'subscribers': {}}
+        for m in map(item_dict, maillists):
+            ret['maillists'][(email_key(m['maillist'], domain),)] = ((str(m.get('uid')),), m)
+        for maillist, items in subscribers.items():
+            for s in map(item_dict, items):
+                if isinstance(s, str):
+                    s = {'subscriber': s}
+                value = {'subscriber': email_key(s.get('subscriber') or s.get('email'), domain)}
+                if s.get('can_send_on_behalf') is not None:
+                    value['can_send_on_behalf'] = s['can_send_on_behalf']
+                ret['subscribers'][(email_key(maillist, domain), value['subscriber'])] = ((), value)
+        return ret
+    if part == 'dns':
+        return {'dns': {(str(r['record_id']),): ((str(r.get('type')).upper(), lower(r.get('subdomain') or '@')), r)
+                        for r in map(item_dict, data)}}
+    if part == 'deputies':
+        return {'deputies': {(email_key(login, domain),): ((), {'login': login}) for login in data}}
+    if part == 'dkim':
+        return {'dkim': {(): ((), item_dict(data))}}
+    raise ValueError('Unknown part: %s' % part)
+
+
+class Snapshot(object):
+    """
+    SQLite snapshot of domains, thread safe. Many domains can be kept in one file:
+
+        snapshot = Snapshot('pdd.sqlite')
+        snapshot.refresh(app)  # fetch state of app domain, write changed rows
+        snapshot.login('domain.com', 1130000012345678)
+        snapshot.maillists_of('domain.com', 'user@domain.com')
+    """
+
+    def __init__(self, path=':memory:'):
+        """
+        Init
+        :param path: database file
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._refresher = None
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop background refresh, close database
+        """
+        self.refresh_stop()
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, *args):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # REFRESH
+    # -----------------------------------------------------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_drop(client, part):
+        """
+        Drop cached responses of part in client, snapshot is made from current state
+        :param client: YandexPdd / AsyncYandexPdd
+        :param part: accounts / maillists / dns / deputies / dkim
+        """
+        for path in PATHS.get(part, ()):
+            client._cache_drop(path)
+
+    @staticmethod
+    def fetch(client, part, workers=4):
+        """
+        Fetch part of domain state by api
+        :param client: YandexPdd
+        :param part: accounts / maillists / dns / deputies / dkim
+        :param workers: requests run concurrently
+        :return: data for write()
+        """
+        Snapshot._cache_drop(client, part)
+        if part == 'accounts':
+            return client.email_list_all(workers=workers)
+        if part == 'maillists':
+            maillists = client.email_ml_list()
+            names = [item_dict(m)['maillist'] for m in maillists]
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                subscribers = executor.map(lambda name: client.email_ml_subscribers(maillist=name), names)
+                return maillists, dict(zip(names, subscribers))
+        if part == 'dns':
+            return client.dns_list()
+        if part == 'deputies':
+            return client.deputy_list()
+        if part == 'dkim':
+            return client.dkim_status()
+        raise ValueError('Unknown part: %s' % part)
+
+    @staticmethod
+    async def fetch_async(client, part, workers=4):
+        """
+        Fetch part of domain state by AsyncYandexPdd
+        :param client: AsyncYandexPdd
+        :param part: accounts / maillists / dns / deputies / dkim
+        :param workers: requests run concurrently
+        :return: data for write()
+        """
+        Snapshot._cache_drop(client, part)
+        if part == 'accounts':
+            return await client.email_list_all(workers=workers)
+        if part == 'maillists':
+            maillists = await client.email_ml_list()
+            names = [item_dict(m)['maillist'] for m in maillists]
+            job = client._bulk(client.email_ml_subscribers, [{'maillist': name} for name in names], workers, None)
+            results = await job.results()
+            for r in results:
+                if not r.ok:
+                    raise r.error
+            return maillists, {name: r.result for name, r in zip(names, results)}
+        if part in ('dns', 'deputies', 'dkim'):
+            return await {'dns': client.dns_list, 'deputies': client.deputy_list, 'dkim': client.dkim_status}[part]()
+        raise ValueError('Unknown part: %s' % part)
+
+    def write(self, domain, part, data):
+        """
+        Write fetched part, only changed rows
+        :param domain: Domain name
+        :param part: accounts / maillists / dns / deputies / dkim
+        :param data: fetch() result
+        :return: dict: inserted, updated, deleted, unchanged
+        """
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        with self._lock, self._db:
+            for table, rows in part_rows(part, data, domain).items():
+                _, keys, indexes = TABLES[table]
+                where = ' AND '.join(['domain = ?'] + ['%s = ?' % key for key in keys])
+                current = {tuple(row[key] for key in keys): row['data'] for row in self._db.execute(
+                    'SELECT %s FROM %s WHERE domain = ?' % (', '.join(keys + ('data',)), table), (domain,))}
+                for key, (index, value) in rows.items():
+                    value = json.dumps(value, sort_keys=True, default=str)
+                    old = current.pop(key, None)
+                    if old == value:
+                        counts['unchanged'] += 1
+                    elif old is None:
+                        columns = ('domain',) + keys + indexes + ('data',)
+                        self._db.execute('INSERT INTO %s (%s) VALUES (%s)' % (
+                            table, ', '.join(columns), ', '.join('?' * len(columns))),
+                            (domain,) + key + index + (value,))
+                        counts['inserted'] += 1
+                    else:
+                        self._db.execute('UPDATE %s SET %s WHERE %s' % (
+                            table, ', '.join('%s = ?' % column for column in indexes + ('data',)), where),
+                            index + (value, domain) + key)
+                        counts['updated'] += 1
+                for key in current:
+                    self._db.execute('DELETE FROM %s WHERE %s' % (table, where), (domain,) + key)
+                    counts['deleted'] += 1
+            self._db.execute('INSERT OR REPLACE INTO refreshes (domain, part, refreshed) VALUES (?, ?, ?)',
+                             (domain, part, time.time()))
+        return counts
+
+    def refresh(self, client, parts=PARTS, workers=4):
+        """
+        Fetch state of client domain and write changed rows
+        :param client: YandexPdd
+        :param parts: parts of state
+        :param workers: requests run concurrently
+        :return: dict: part -> counts of write()
+        """
+        return {part: self.write(client._domain, part, self.fetch(client, part, workers)) for part in parts}
+
+    async def refresh_async(self, client, parts=PARTS, workers=4):
+        """
+        Fetch state of AsyncYandexPdd domain and write changed rows
+        :param client: AsyncYandexPdd
+        :param parts: parts of state
+        :param workers: requests run concurrently
+        :return: dict: part -> counts of write()
+        """
+        ret = {}
+        for part in parts:
+            ret[part] = self.write(client._domain, part, await self.fetch_async(client, part, workers))
+        return ret
+
+    def refresh_background(self, clients, interval=300, parts=PARTS, workers=4, on_error=None):
+        """
+        Refresh domains of clients in background thread, until refresh_stop() / close()
+        :param clients: YandexPdd / list of them
+        :param interval: seconds between refreshes
+        :param parts: parts of state
+        :param workers: requests run concurrently
+        :param on_error: callback(client, exception)
+        :return: threading.Thread
+        """
+        if not isinstance(clients, (list, tuple)):
+            clients = [clients]
+        self.refresh_stop()
+        stop = threading.Event()
+
+        def run():
+            while not stop.is_set():
+                for client in clients:
+                    try:
+                        self.refresh(client, parts, workers)
+                    except Exception as e:
+                        if on_error is not None:
+                            on_error(client, e)
+                stop.wait(interval)
+
+        thread = threading.Thread(target=run, name='SnapshotRefresh', daemon=True)
+        self._refresher = (thread, stop)
+        thread.start()
+        return thread
+
+    def refresh_stop(self):
+        """
+        Stop background refresh
+        """
+        if self._refresher is not None:
+            thread, stop = self._refresher
+            self._refresher = None
+            stop.set()
+            thread.join()
+
+    def refreshed(self, domain, part):
+        """
+        Time of last refresh of part
+        :param domain: Domain name
+        :param part: accounts / maillists / dns / deputies / dkim
+        :return: time.time() / None - never
+        """
+        rows = self._query('SELECT refreshed FROM refreshes WHERE domain = ? AND part = ?', domain, part)
+        return rows[0]['refreshed'] if rows else None
+
+    # -----------------------------------------------------------------------------------------------------------------
+    # LOOKUPS
+    # -----------------------------------------------------------------------------------------------------------------
+
+    def domains(self):
+        """
+        Domains in snapshot
+        :return: list of domain names
+        """
+        return [row['domain'] for row in self._query('SELECT DISTINCT domain FROM refreshes ORDER BY domain')]
+
+    def accounts(self, domain):
+        """
+        Accounts of domain
+        :return: list of dict of email_list
+        """
+        return [json.loads(row['data']) for row in self._query(
+            'SELECT data FROM accounts WHERE domain = ? ORDER BY login', domain)]
+
+    def account(self, domain, login=None, uid=None):
+        """
+        Account by login or uid
+        :return: dict / None
+        """
+        if login is not None:
+            rows = self._query('SELECT data FROM accounts WHERE domain = ? AND login = ?', domain,
+                               email_key(login, domain))
+        else:
+            rows = self._query('SELECT data FROM accounts WHERE domain = ? AND uid = ?', domain, str(uid))
+        return json.loads(rows[0]['data']) if rows else None
+
+    def uid(self, domain, login):
+        """
+        Uid of login
+        :return: str / None
+        """
+        rows = self._query('SELECT uid FROM accounts WHERE domain = ? AND login = ?', domain, email_key(login, domain))
+        return rows[0]['uid'] if rows else None
+
+    def login(self, domain, uid):
+        """
+        Login of uid, qualified by domain: user@domain.com
+        :return: str / None
+        """
+        rows = self._query('SELECT login FROM accounts WHERE domain = ? AND uid = ?', domain, str(uid))
+        return rows[0]['login'] if rows else None
+
+    def maillists(self, domain):
+        """
+        Mail lists of domain
+        :return: list of dict of email_ml_list
+        """
+        return [json.loads(row['data']) for row in self._query(
+            'SELECT data FROM maillists WHERE domain = ? ORDER BY maillist', domain)]
+
+    def subscribers(self, domain, maillist):
+        """
+        Subscribers of mail list
+        :return: list of email
+        """
+        return [row['subscriber'] for row in self._query(
+            'SELECT subscriber FROM subscribers WHERE domain = ? AND maillist = ? ORDER BY subscriber',
+            domain, email_key(maillist, domain))]
+
+    def maillists_of(self, domain, email):
+        """
+        Mail lists containing email
+        :return: list of mail list emails
+        """
+        return [row['maillist'] for row in self._query(
+            'SELECT maillist FROM subscribers WHERE domain = ? AND subscriber = ? ORDER BY maillist',
+            domain, email_key(email, domain))]
+
+    def dns(self, domain, type=None, subdomain=None):
+        """
+        DNS records of domain
+        :param type: filter by type
+        :param subdomain: filter by subdomain, @ - domain itself
+        :return: list of dict of dns_list
+        """
+        sql, args = 'SELECT data FROM dns WHERE domain = ?', [domain]
+        if type is not None:
+            sql, args = sql + ' AND type = ?', args + [type.upper()]
+        if subdomain is not None:
+            sql, args = sql + ' AND subdomain = ?', args + [subdomain.lower()]
+        return [json.loads(row['data']) for row in self._query(sql + ' ORDER BY type, subdomain', *args)]
+
+    def deputies(self, domain):
+        """
+        Deputies of domain
+        :return: list of login
+        """
+        return [json.loads(row['data'])['login'] for row in self._query(
+            'SELECT data FROM deputies WHERE domain = ? ORDER BY login', domain)]
+
+    def dkim(self, domain):
+        """
+        DKIM status of domain
+        :return: dict / None
+        """
+        rows = self._query('SELECT data FROM dkim WHERE domain = ?', domain)
+        return json.loads(rows[0]['data']) if rows else None
@@ -0,0 +1,295 @@
+# coding: utf8
+
+"""
+Reconciliation of domain state with desired one: DNS records, mail list subscribers
+"""
+
+from .bulk import AsyncBulkJob, BulkJob
+
+DNS_IDENTITY = ('content', 'priority', 'weight', 'port', 'target')  # Fields of record identity
+DNS_FIELDS = DNS_IDENTITY + ('ttl', 'admin_mail')  # Fields of record set by dns_add / dns_edit
+DNS_KEEP_TYPES = ('SOA', 'NS')  # Records of these types are not deleted by default
+FLAG_TRUE = (True, 1, '1', 'yes', 'true')
+
+
+def dns_value(value):
+    """
+    Normalized value of record field
+    :param value: mixed
+    :return: str / None
+    """
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def dns_name(record):
+    """
+    Type and subdomain of record
+    :param record: dict
+    :return: tuple
+    """
+    return str(record['type']).upper(), (record.get('subdomain') or '@').lower()
+
+
+def dns_changes(current, desired, fields):
+    """
+    Fields of desired record differ from current one
+    :param current: record dict of dns_list
+    :param desired: record dict
+    :param fields: fields to compare, only ones set in desired
+    :return: dict
+    """
+    return {key: desired[key] for key in fields
+            if desired.get(key) is not None and dns_value(desired[key]) != dns_value(current.get(key))}
+
+
+class Plan(object):
+    """
+    Changes applied by steps, operations of each step run concurrently
+    """
+
+    results = None  # (operation, BulkResult) after apply
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, ', '.join(
+            '%s %d' % (operation, len(specs)) for operation, _, specs in self.steps(None)))
+
+    @property
+    def empty(self):
+        """
+        Nothing to change
+        :return: bool
+        """
+        return not any(specs for _, _, specs in self.steps(None))
+
+    @property
+    def errors(self):
+        """
+        Failed operations after apply
+        :return: list of (operation, BulkResult)
+        """
+        return [(operation, r) for operation, r in self.results or () if not r.ok]
+
+    def steps(self, client):
+        """
+        Steps of plan
+        :param client: YandexPdd / None
+        :return: list of (operation, method / None, specs)
+        """
+        raise NotImplementedError
+
+    def apply(self, client, workers=4):
+        """
+        Apply changes
+        :param client: YandexPdd
+        :param workers: operations run concurrently
+        :return: self
+        """
+        self.results = []
+        for operation, method, specs in self.steps(client):
+            if specs:
+                self.results += [(operation, r) for r in BulkJob(method, specs, workers=workers).results()]
+        return self
+
+    async def apply_async(self, client, workers=4):
+        """
+        Apply changes by AsyncYandexPdd
+        :param client: AsyncYandexPdd
+        :param workers: operations run concurrently
+        :return: self
+        """
+        self.results = []
+        for operation, method, specs in self.steps(client):
+            if specs:
+                results = await AsyncBulkJob(method, specs, workers=workers).results()
+                self.results += [(operation, r) for r in results]
+        return self
+
+
+class DnsPlan(Plan):
+    """
+    Changes of DNS zone: records to add, edit and delete.
+    Created by plan(), applied by apply() - deletes, then edits, then adds, each step concurrently
+    """
+
+    def __init__(self, adds=None, edits=None, deletes=None, unchanged=None):
+        """
+        Init
+        :param adds: list of dns_add kwargs
+        :param edits: list of dns_edit kwargs
+        :param deletes: list of records to delete
+        :param unchanged: list of records kept as is
+        """
+        self.adds = adds or []
+        self.edits = edits or []
+        self.deletes = deletes or []
+        self.unchanged = unchanged or []
+
+    @classmethod
+    def plan(cls, current, desired, keep_types=DNS_KEEP_TYPES):
+        """
+        Minimal changes from current records to desired ones. Edit is preferred over delete and add
+        :param current: records of dns_list
+        :param desired: records dicts: type, subdomain, content, priority, weight, port, target, ttl, admin_mail
+        :param keep_types: types of current records not deleted when missing in desired
+        :return: DnsPlan
+        """
+        plan = cls()
+        current = list(current)
+        rest = []
+        for record in desired:
+            name = dns_name(record)
+            for i, c in enumerate(current):
+                if dns_name(c) == name and not dns_changes(c, record, DNS_IDENTITY):
+                    del current[i]
+                    changes = dns_changes(c, record, DNS_FIELDS)
+                    if changes:
+                        plan.edits.append(dict(changes, record_id=c['record_id']))
+                    else:
+                        plan.unchanged.append(c)
+                    break
+            else:
+                rest.append(record)
+        for record in rest:
+            name = dns_name(record)
+            for i, c in enumerate(current):
+                if dns_name(c) == name:
+                    del current[i]
+                    plan.edits.append(dict(dns_changes(c, record, DNS_FIELDS), record_id=c['record_id']))
+                    break
+            else:
+                add = {key: record[key] for key in DNS_FIELDS if record.get(key) is not None}
+                add.update(type=name[0], subdomain=name[1])
+                plan.adds.append(add)
+        keep_types = set(t.upper() for t in keep_types or ())
+        for c in current:
+            if dns_name(c)[0] in keep_types:
+                plan.unchanged.append(c)
+            else:
+                plan.deletes.append(c)
+        return plan
+
+    def steps(self, client):
+        """
+        Steps of plan
+        :param client: YandexPdd / None
+        :return: list of (operation, method / None, specs)
+        """
+        return [
+            ('delete', client and client.dns_del, [{'record_id': c['record_id']} for c in self.deletes]),
+            ('edit', client and client.dns_edit, self.edits),
+            ('add', client and client.dns_add, self.adds),
+        ]
+
+
+def flag(value):
+    """
+    Yandex flag to bool
+    :param value: bool / yes / no / None
+    :return: bool / None - unknown
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.lower()
+    return value in FLAG_TRUE
+
+
+def subscribers_map(subscribers):
+    """
+    Subscribers to dict
+    :param subscribers: mapping email -> can send on behalf / iterable of email / dict with subscriber or email
+    :return: dict: lower email -> can send on behalf / None - not set
+    """
+    if isinstance(subscribers, dict):
+        return {email.lower(): flag(value) for email, value in subscribers.items()}
+    ret = {}
+    for item in subscribers:
+        if isinstance(item, str):
+            ret[item.lower()] = None
+        else:
+            email = item.get('subscriber') or item.get('email') or item.get('login')
+            ret[email.lower()] = flag(item.get('can_send_on_behalf'))
+    return ret
+
+
+def maillists_map(desired, domain=None):
+    """
+    Desired mail lists by email
+    :param desired: mapping email / name of mail list -> desired subscribers
+    :param domain: Domain name of names without domain
+    :return: dict: lower email -> desired subscribers
+    """
+    ret = {}
+    for maillist, subscribers in desired.items():
+        maillist = maillist.lower()
+        if '@' not in maillist and domain:
+            maillist = '%s@%s' % (maillist, domain.lower())
+        ret[maillist] = subscribers
+    return ret
+
+
+class MaillistPlan(Plan):
+    """
+    Changes of mail list: subscribers to add, to remove and permissions to send on behalf of list.
+    Applied by apply() - unsubscribes, subscribes, then permissions, each step concurrently
+    """
+
+    def __init__(self, maillist, subscribes=None, unsubscribes=None, permissions=None, unchanged=None):
+        """
+        Init
+        :param maillist: Email of mail list
+        :param subscribes: list of email_ml_subscribe kwargs
+        :param unsubscribes: list of email_ml_unsubscribe kwargs
+        :param permissions: list of email_ml_set_can_send_on_behalf kwargs
+        :param unchanged: list of emails kept as is
+        """
+        self.maillist = maillist
+        self.subscribes = subscribes or []
+        self.unsubscribes = unsubscribes or []
+        self.permissions = permissions or []
+        self.unchanged = unchanged or []
+
+    @classmethod
+    def plan(cls, maillist, current, desired, prune=True):
+        """
+        Changes from current subscribers to desired ones.
+        Permission is changed only if it is set in desired, unknown current permission is set again
+        :param maillist: Email of mail list
+        :param current: subscribers of email_ml_subscribers
+        :param desired: mapping email -> can send on behalf / iterable of email / dict with subscriber
+        :param prune: unsubscribe emails missing in desired
+        :return: MaillistPlan
+        """
+        plan = cls(maillist)
+        current = subscribers_map(current)
+        for email, can_send in subscribers_map(desired).items():
+            if email not in current:
+                spec = {'maillist': maillist, 'subscriber': email}
+                if can_send is not None:
+                    spec['can_send_on_behalf'] = can_send
+                plan.subscribes.append(spec)
+            elif can_send is not None and current[email] is not can_send:
+                plan.permissions.append({'maillist': maillist, 'subscriber': email, 'can_send_on_behalf': can_send})
+            else:
+                plan.unchanged.append(email)
+            current.pop(email, None)
+        for email in current:
+            if prune:
+                plan.unsubscribes.append({'maillist': maillist, 'subscriber': email})
+            else:
+                plan.unchanged.append(email)
+        return plan
+
+    def steps(self, client):
+        """
+        Steps of plan
+        :param client: YandexPdd / None
+        :return: list of (operation, method / None, specs)
+        """
+        return [
+            ('unsubscribe', client and client.email_ml_unsubscribe, self.unsubscribes),
+            ('subscribe', client and client.email_ml_subscribe, self.subscribes),
+            ('permission', client and client.email_ml_set_can_send_on_behalf, self.permissions),
+        ]
@@ -0,0 +1,164 @@
+# coding: utf8
+
+"""
+Pool of PDD tokens of one domain / registrar: requests are spread over tokens,
+failing tokens are removed from rotation for a while
+"""
+
+import itertools
+import threading
+import time
+
+from .ratelimit import THROTTLE, RateLimiter, RetryPolicy
+
+AUTH_ERRORS = ('no_token', 'bad_token', 'no_auth', 'bad_oauth', 'not_allowed')  # Token rejected by yandex
+
+LEAST_LOADED = 'least_loaded'  # Token with fewest requests in flight
+ROUND_ROBIN = 'round_robin'  # Tokens in turn
+
+
+class TokenState(object):
+    """
+    Token of pool with its counters
+    """
+
+    __slots__ = ('token', 'limiter', 'in_flight', 'requests', 'errors', 'throttled', 'quarantined_until')
+
+    def __init__(self, token, limiter=None):
+        """
+        Init
+        :param token: PDD Token
+        :param limiter: RateLimiter of token / None
+        """
+        self.token = token
+        self.limiter = limiter
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0  # auth errors
+        self.throttled = 0  # rate limit errors
+        self.quarantined_until = 0.0
+
+    def __repr__(self):
+        return '<TokenState %s>' % self.name
+
+    @property
+    def name(self):
+        """
+        Token name safe for logs
+        :return: str
+        """
+        return '%s...' % self.token[:6]
+
+    def stats(self, now=None):
+        """
+        Counters of token
+        :param now: time.time()
+        :return: dict
+        """
+        now = time.time() if now is None else now
+        return {
+            'token': self.name, 'in_flight': self.in_flight, 'requests': self.requests, 'errors': self.errors,
+            'throttled': self.throttled, 'quarantined': max(0.0, self.quarantined_until - now),
+            'rate': self.limiter.rate if self.limiter is not None else None,
+        }
+
+
+class TokenPool(object):
+    """
+    Tokens of one domain / registrar, thread safe. Pass it as token of client:
+
+        pool = TokenPool(['<TOKEN1>', '<TOKEN2>', '<TOKEN3>'], rate=10)
+        app = YandexPdd('domain.com', pool)
+
+    Token rejected by yandex (auth error) is quarantined for quarantine seconds,
+    throttled one - for throttle_quarantine seconds, request is repeated with other token
+    """
+
+    def __init__(self, tokens, strategy=LEAST_LOADED, rate=None, quarantine=300.0, throttle_quarantine=1.0,
+                 auth_errors=AUTH_ERRORS, retry=None):
+        """
+        Init
+        :param tokens: list of PDD Tokens
+        :param strategy: LEAST_LOADED / ROUND_ROBIN
+        :param rate: requests per second of each token, adaptive / None - no limit
+        :param quarantine: seconds token is not used after auth error
+        :param throttle_quarantine: seconds token is not used after rate limit error
+        :param auth_errors: yandex errors of rejected token
+        :param retry: RetryPolicy to classify errors
+        """
+        if not tokens:
+            raise ValueError('Tokens required')
+        if strategy not in (LEAST_LOADED, ROUND_ROBIN):
+            raise ValueError('Unknown strategy: %s' % strategy)
+        self.states = [TokenState(token, RateLimiter(rate) if rate else None) for token in tokens]
+        self.strategy = strategy
+        self.quarantine = quarantine
+        self.throttle_quarantine = throttle_quarantine
+        self.auth_errors = frozenset(auth_errors)
+        self.retry = retry or RetryPolicy()
+        self._cycle = itertools.cycle(range(len(self.states)))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.states)
+
+    def __repr__(self):
+        return '<TokenPool %d tokens %s>' % (len(self.states), self.strategy)
+
+    def take(self):
+        """
+        Take token for one request, release() it after request
+        :return: tuple: TokenState, seconds to wait before request
+        """
+        with self._lock:
+            now = time.time()
+            available = [s for s in self.states if s.quarantined_until <= now]
+            delay = 0.0
+            if not available:
+                state = min(self.states, key=lambda s: s.quarantined_until)
+                delay = state.quarantined_until - now
+            elif self.strategy == ROUND_ROBIN:
+                while True:
+                    state = self.states[next(self._cycle)]
+                    if state.quarantined_until <= now:
+                        break
+            else:
+                state = min(available, key=lambda s: (s.in_flight, s.requests))
+            state.in_flight += 1
+            state.requests += 1
+        if state.limiter is not None:
+            delay += state.limiter.delay()
+        return state, delay
+
+    def release(self, state, error=None):
+        """
+        Request with token is done
+        :param state: TokenState of take()
+        :param error: exception of request / None
+        :return: bool - error is caused by token, request can be repeated with other token
+        """
+        code = error.args[0] if error is not None and error.args else None
+        kind = self.retry.classify(error) if error is not None else None
+        with self._lock:
+            state.in_flight -= 1
+            if code in self.auth_errors:
+                state.errors += 1
+                state.quarantined_until = time.time() + self.quarantine
+            elif kind == THROTTLE:
+                state.throttled += 1
+                state.quarantined_until = time.time() + self.throttle_quarantine
+        if state.limiter is not None:
+            if kind == THROTTLE:
+                state.limiter.throttled()
+            elif error is None:
+                state.limiter.success()
+        return code in self.auth_errors or kind == THROTTLE
+
+    def stats(self):
+        """
+        Counters of tokens
+        :return: list of dict
+        """
+        now = time.time()
+        with self._lock:
+            return [state.stats(now) for state in self.states]
@@ -0,0 +1,317 @@
+# coding: utf8
+
+"""
+Http transports of client: sessions with keep-alive connection pool.
+Session is object with request(method, url, params, data, headers, timeout) -> response with
+status_code, content, text and close(). Built-in ones:
+
+- http - standard library http.client, no dependencies, fast import (default).
+  Like requests it uses proxies of environment: HTTP_PROXY, HTTPS_PROXY, NO_PROXY,
+  and CA bundle of REQUESTS_CA_BUNDLE / CURL_CA_BUNDLE / SSL_CERT_FILE
+- requests - requests.Session, imported only when selected: pip install yandex_pdd[requests]
+"""
+
+import base64
+import http.client
+import os
+import sys
+import threading
+from urllib.parse import unquote, urlencode, urlsplit
+
+HTTP = 'http'
+REQUESTS = 'requests'
+DEFAULT_TRANSPORT = HTTP
+
+USER_AGENT = 'yandex-pdd'
+
+CA_BUNDLE_ENV = ('REQUESTS_CA_BUNDLE', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE')  # Checked in order, first one is used
+
+
+class TransportError(Exception):
+    """
+    Request failed on network level
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Init
+        :param args: message
+        :param sent: request could reach server
+        """
+        super(TransportError, self).__init__(*args)
+        self.sent = kwargs.get('sent', True)
+
+
+def request_sent(error):
+    """
+    Could request reach server before error
+    :param error: exception of session.request
+    :return: bool
+    """
+    sent = getattr(error, 'sent', None)
+    if sent is not None:
+        return sent
+    requests = sys.modules.get('requests')
+    if requests is None:
+        return True
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        from urllib3.exceptions import NewConnectionError
+        return not isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return True
+
+
+def form_encode(values):
+    """
+    Urlencode query / form like requests does: None values are not sent
+    :param values: dict
+    :return: str
+    """
+    return urlencode([(k, v) for k, v in values.items() if v is not None])
+
+
+def ssl_context_create():
+    """
+    Default SSL context, verified by CA bundle of environment if set
+    :return: ssl.SSLContext
+    """
+    import ssl
+    bundle = next((os.environ[name] for name in CA_BUNDLE_ENV if os.environ.get(name)), None)
+    if bundle is not None and os.path.isdir(bundle):
+        return ssl.create_default_context(capath=bundle)
+    return ssl.create_default_context(cafile=bundle)
+
+
+def proxy_authorization(proxy):
+    """
+    Proxy-Authorization header of proxy url with credentials
+    :param proxy: urlsplit of proxy url
+    :return: dict
+    """
+    if proxy.username is None:
+        return {}
+    credentials = '%s:%s' % (unquote(proxy.username), unquote(proxy.password or ''))
+    return {'Proxy-Authorization': 'Basic ' + base64.b64encode(credentials.encode('utf8')).decode('ascii')}
+
+
+def timeouts(timeout):
+    """
+    Connect and read timeouts
+    :param timeout: (connect, read) / float for both / None
+    :return: tuple
+    """
+    if isinstance(timeout, (tuple, list)):
+        return timeout[0], timeout[1]
+    return timeout, timeout
+
+
+class HttpResponse(object):
+    """
+    Response of HttpSession
+    """
+
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def __repr__(self):
+        return '<HttpResponse [%s]>' % self.status_code
+
+    @property
+    def text(self):
+        return self.content.decode('utf8', 'replace')
+
+
+class HttpSession(object):
+    """
+    Keep-alive session on http.client, thread safe. Idle connections are kept per host, up to pool_size.
+    Requests go through proxy of scheme unless host is in no_proxy, https ones by CONNECT tunnel
+    """
+
+    def __init__(self, pool_size=10, proxies=None):
+        """
+        Init
+        :param pool_size: max idle connections kept open to host
+        :param proxies: dict: scheme -> proxy url, no -> hosts without proxy / None - of environment
+        """
+        import urllib.request
+        self.pool_size = pool_size
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._idle = {}  # (scheme, host, port) -> list of connections
+        self._lock = threading.Lock()
+        self._ssl_context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _proxy(self, scheme, host):
+        """
+        Proxy of request
+        :param scheme: http / https
+        :param host: host of url
+        :return: urlsplit of proxy url / None - direct connection
+        """
+        proxy = self.proxies.get(scheme)
+        if not proxy:
+            return None
+        import urllib.request
+        if urllib.request.proxy_bypass_environment(host, self.proxies):
+            return None
+        return urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+
+    def _connection(self, key, proxy=None):
+        """
+        Idle connection / new one, not connected
+        :param key: (scheme, host, port)
+        :param proxy: urlsplit of proxy url
+        :return: tuple: HTTPConnection, reused
+        """
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        scheme, host, port = key
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl_context_create()
+            if proxy is not None:
+                connection = http.client.HTTPSConnection(proxy.hostname, proxy.port or 8080, context=self._ssl_context)
+                connection.set_tunnel(host, port, headers=proxy_authorization(proxy))
+                return connection, False
+            return http.client.HTTPSConnection(host, port, context=self._ssl_context), False
+        if proxy is not None:
+            return http.client.HTTPConnection(proxy.hostname, proxy.port or 8080), False
+        return http.client.HTTPConnection(host, port), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.pool_size:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        """
+        Send request
+        :param method: get / post
+        :param url: url
+        :param params: query params
+        :param data: form data
+        :param headers: dict
+        :param timeout: (connect, read) timeouts / float for both / None
+        :raise TransportError: request failed
+        :return: HttpResponse
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        proxy = self._proxy(parts.scheme, parts.hostname)
+        path = parts.path or '/'
+        query = '&'.join(q for q in (parts.query, form_encode(params) if params else '') if q)
+        if query:
+            path += '?' + query
+        request_headers = {'User-Agent': USER_AGENT}
+        if proxy is not None and parts.scheme != 'https':
+            # Plain http proxy gets absolute url
+            path = '%s://%s%s' % (parts.scheme, parts.netloc, path)
+            request_headers.update(proxy_authorization(proxy))
+        body = None
+        if data is not None:
+            body = form_encode(data).encode('utf8')
+            request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request_headers.update(headers or {})
+        connect_timeout, read_timeout = timeouts(timeout)
+        connection, reused = self._connection(key, proxy)
+        while True:
+            if connection.sock is None:
+                connection.timeout = connect_timeout
+                try:
+                    connection.connect()
+                except (OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    raise TransportError(u'Connect error: %s' % e, sent=False)
+            connection.sock.settimeout(read_timeout)
+            try:
+                connection.request(method.upper(), path, body, request_headers)
+            except (ConnectionResetError, BrokenPipeError) as e:
+                connection.close()
+                if reused:
+                    # Idle connection was closed by server before request was written, send again by new one
+                    reused = False
+                    continue
+                raise TransportError(u'Request error: %s' % e)
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise TransportError(u'Request error: %s' % e)
+            try:
+                r = connection.getresponse()
+                content = r.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError) as e:
+                connection.close()
+                if reused and method.lower() == 'get':
+                    # Server closed idle connection without response: GET is sent again, POST could be done
+                    reused = False
+                    continue
+                raise TransportError(u'Request error: %s' % e)
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise TransportError(u'Request error: %s' % e)
+            break
+        if r.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+        return HttpResponse(r.status, r.headers, content)
+
+
+def requests_session_create(pool_size=10):
+    """
+    Create requests.Session with connection pool
+    :param pool_size: max connections kept open to host
+    :return: requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+TRANSPORTS = {
+    HTTP: HttpSession,
+    REQUESTS: requests_session_create,
+}
+
+
+def transport_session(transport=None, pool_size=10):
+    """
+    Create session of transport
+    :param transport: HTTP / REQUESTS / callable(pool_size) -> session / None - DEFAULT_TRANSPORT
+    :param pool_size: max connections kept open to host
+    :return: session
+    """
+    transport = transport or DEFAULT_TRANSPORT
+    if callable(transport):
+        return transport(pool_size)
+    if transport not in TRANSPORTS:
+        raise ValueError('Unknown transport: %s' % transport)
+    return TRANSPORTS[transport](pool_size)
@@ -7,46 +7,100 @@ Yandex.PDD API module
 :version: 0.1b
 """
 
-import requests
-import datetime
 import inspect
+import math
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
+from .bulk import BulkJob
+from .cache import ResponseCache
+from .coalesce import SingleFlight
+from .edits import EditQueue
+from .endpoints import ENDPOINTS, ENDPOINTS_BY_NAME, ENDPOINTS_BY_PATH, endpoints_install
+from .imports import ImportWatcher
+from .metrics import BAD_RESPONSE, ERROR, OK, TRANSPORT, Metrics, RequestInfo
+from .oauth import OAuthTokenCache
+from .ratelimit import THROTTLE, RateLimiter, RetryPolicy
+from .records import json_loads, records_convert
+from .sync import DNS_KEEP_TYPES, DnsPlan, MaillistPlan, maillists_map
+from .tokens import TokenPool
+from .transport import request_sent, transport_session
+
 
 def inspect_args_func(frame):
     """
-    Inspect current def arguments
+    Inspect current def arguments. Deprecated: methods are generated by endpoints table and get arguments as kwargs
     :param frame: inspect.currentframe()
     :return: dict
     """
+    warnings.warn('inspect_args_func is deprecated and will be removed', DeprecationWarning, stacklevel=2)
     args, _, _, values = inspect.getargvalues(frame)
     return {key: values[key] for key in args if key != 'self'}
 
 
 def response_full_d(key):
     """
-    Wrap method of class for returning full response or only one key
+    Wrap method of class for returning full response or only one key.
+    Works for async client too: awaitable response is wrapped by coroutine.
+    Deprecated: endpoints.Endpoint has result key of generated methods
     :param key: key for return / bool
     :return: mixed / bool
     """
+    warnings.warn('response_full_d is deprecated and will be removed', DeprecationWarning, stacklevel=2)
+
+    def response_key(obj, r):
+        if obj.response_full:
+            return r
+        if type(key) is bool:
+            return key
+        return r[key]
+
+    async def response_key_async(obj, r):
+        return response_key(obj, await r)
+
     def wrapper(func):
         @wraps(func)
         def authorize_and_call(*args, **kwargs):
             r = func(*args, **kwargs)
-            if args[0].response_full:
-                return r
-            if type(key) is bool:
-                return key
-            return r[key]
+            if inspect.isawaitable(r):
+                return response_key_async(args[0], r)
+            return response_key(args[0], r)
         return authorize_and_call
     return wrapper
 
 
+def pages_count(r, on_page):
+    """
+    Count of pages in list response
+    :param r: list response, first page
+    :param on_page: Items on page
+    :return: int
+    """
+    if r.get('pages') is not None:
+        return int(r['pages'])
+    return int(math.ceil(float(r['total']) / on_page))
+
+
 class YandexPddException(Exception):
     """
     Exception of module
     """
-    pass
+
+    def __init__(self, *args, **kwargs):
+        """
+        Init
+        :param args: message, details
+        :param transport: request failed on network level
+        :param sent: request could reach server
+        :param status: http status of response
+        """
+        super(YandexPddException, self).__init__(*args)
+        self.transport = kwargs.get('transport', False)
+        self.sent = kwargs.get('sent', True)
+        self.status = kwargs.get('status')
 
 
 class YandexPddExceptionY(Exception):
@@ -56,44 +110,194 @@ class YandexPddExceptionY(Exception):
     pass
 
 
+_shared_sessions = {}  # (token, transport) -> [session, clients count]
+_shared_sessions_lock = threading.Lock()
+
+
+def session_create(pool_size=10, transport=None):
+    """
+    Create keep-alive session with connection pool
+    :param pool_size: max connections kept open to host
+    :param transport: transport.HTTP / transport.REQUESTS / None - transport.DEFAULT_TRANSPORT
+    :return: session of transport
+    """
+    return transport_session(transport, pool_size)
+
+
+def session_acquire(token, pool_size=10, transport=None):
+    """
+    Get session shared by all clients with same token
+    :param token: PDD Token
+    :param pool_size: max connections, used when session is created
+    :param transport: transport of session
+    :return: session of transport
+    """
+    with _shared_sessions_lock:
+        item = _shared_sessions.get((token, transport))
+        if item is None:
+            item = _shared_sessions[(token, transport)] = [session_create(pool_size, transport), 0]
+        item[1] += 1
+        return item[0]
+
+
+def session_release(token, transport=None):
+    """
+    Release shared session, close it when last client is gone
+    :param token: PDD Token
+    :param transport: transport of session
+    """
+    with _shared_sessions_lock:
+        item = _shared_sessions.get((token, transport))
+        if item is None:
+            return
+        item[1] -= 1
+        if item[1] <= 0:
+            del _shared_sessions[(token, transport)]
+            item[0].close()
+
+
+@endpoints_install(ENDPOINTS)
 class YandexPdd(object):
-    """ YandexPdd API object """
+    """ YandexPdd API object, api methods are generated by endpoints.ENDPOINTS """
 
     _domain = None  # Domain name
     _token = None  # PDD Token
     _url = u'https://pddimp.yandex.ru/api2/'  # Request URL
     _registrar = False  # Request as registrar
 
-    response_full = False  # Return full response by method or only functional key
+    _session = None  # Session of transport, created on first request
+    _session_own = True  # Session created by client and closed by it
+    _session_shared = False  # Session shared by clients with same token
+    _session_lock = None
 
-    def __init__(self, domain, token, registrar=False, response_full=False):
+    response_full = False  # Return full response by method or only functional key
+    pool_size = 10  # Max keep-alive connections in pool
+    timeout = (10, 60)  # Connect and read timeouts, seconds
+    cache = None  # ResponseCache of GET requests
+    _counters_cache = None  # ResponseCache of counters of iter_counters with cache_ttl, created on first use
+    rate_limiter = None  # RateLimiter of requests
+    retry = None  # RetryPolicy of failed requests
+    metrics = None  # Metrics of requests
+    hooks_before = ()  # Callables(RequestInfo) before request
+    hooks_after = ()  # Callables(RequestInfo) after request
+    typed = False  # Lists of accounts, domains, DNS records as records
+    coalesce = None  # SingleFlight of GET requests
+    tokens = None  # TokenPool
+    oauth_cache = None  # OAuthTokenCache
+    transport = None  # transport.HTTP / transport.REQUESTS / None - transport.DEFAULT_TRANSPORT
+
+    def __init__(self, domain, token, registrar=False, response_full=False, session=None, share_session=False,
+                 pool_size=10, timeout=(10, 60), cache=None, rate_limiter=None, retry=None, metrics=None, url=None,
+                 typed=False, coalesce=None, oauth_cache=None, transport=None):
         """
         Init
         :param token: PDD Token — https://tech.yandex.ru/pdd/doc/concepts/access-docpage/#access-admin
+            / TokenPool / list of tokens - requests are spread over tokens
         :param domain: Domain name
         :param response_full: Return full response by method or only functional key
         :param registrar: Request as registrar
+        :param session: session to use: requests.Session / transport.HttpSession, not closed by client
+        :param share_session: Use one session for all clients with same token
+        :param pool_size: Max keep-alive connections in pool
+        :param timeout: (connect, read) timeouts in seconds / float for both
+        :param cache: ResponseCache / True - cache with default ttls
+        :param rate_limiter: RateLimiter / True - limiter shared by clients with token
+        :param retry: RetryPolicy / int - count of retries
+        :param metrics: Metrics / True - new Metrics
+        :param url: API url, for example of FakePddServer
+        :param typed: Return records of yandex_pdd.records instead of dicts for lists of accounts, domains, DNS
+        :param coalesce: SingleFlight / True - new one: concurrent identical GET requests share one http request
+        :param oauth_cache: OAuthTokenCache / True - new one: oauth tokens of passport_oauth
+        :param transport: transport.HTTP - standard library / transport.REQUESTS / None - transport.DEFAULT_TRANSPORT
         """
         self._domain = domain
+        if isinstance(token, (list, tuple)):
+            token = TokenPool(token)
         self._token = token
+        self.tokens = token if isinstance(token, TokenPool) else None
+        if url is not None:
+            self._url = url
 
         self._registrar = registrar
         self.response_full = response_full
-
-    def _request(self, name, data, method='post'):
-        """
-        Base request method
+        self.typed = typed
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.transport = transport
+        self._session_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        if session is not None:
+            self._session = session
+            self._session_own = False
+        self._session_shared = share_session
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache if cache is not False else None
+        if rate_limiter is True:
+            rate_limiter = RateLimiter.shared(token)
+        self.rate_limiter = rate_limiter or None
+        if not isinstance(retry, RetryPolicy):
+            retry = RetryPolicy(retries=retry or 0)
+        self.retry = retry
+        self.hooks_before = []
+        self.hooks_after = []
+        if metrics is True:
+            metrics = Metrics()
+        self.metrics = metrics or None
+        if self.metrics is not None:
+            self.hooks_after.append(self.metrics)
+        if coalesce is True:
+            coalesce = SingleFlight()
+        self.coalesce = coalesce or None
+        if oauth_cache is True:
+            oauth_cache = OAuthTokenCache()
+        self.oauth_cache = oauth_cache or None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_session(self):
+        """
+        Session of client, created on first call
+        :return: session of transport
+        """
+        session = self._session
+        if session is not None:
+            return session
+        with self._session_lock:
+            if self._session is None:
+                if self._session_shared:
+                    self._session = session_acquire(self._token, self.pool_size, self.transport)
+                else:
+                    self._session = session_create(self.pool_size, self.transport)
+            return self._session
+
+    def close(self):
+        """
+        Close connections of client. Client can be used further, new session will be opened
+        """
+        with self._session_lock:
+            if self._session is None or not self._session_own:
+                return
+            session, self._session = self._session, None
+            if self._session_shared:
+                session_release(self._token, self.transport)
+            else:
+                session.close()
+
+    def _request_args(self, name, data, method):
+        """
+        Prepare request
         :param name: url path
         :param data: data / args of request
         :param method: request method - get/post
-        :raise YandexPddException: bad request, jsonify failed
-        :raise YandexPddExceptionY: yandex exception - success=false
-        :return: dict
+        :return: tuple: method, url, kwargs
         """
-        for key in data.keys():
-            if data[key] is None:
-                del data[key]
-                continue
+        data = {key: value for key, value in data.items() if value is not None}
         if not data.get('domain'):
             data['domain'] = self._domain
         method = method.lower()
@@ -106,500 +310,628 @@ class YandexPdd(object):
         kwargs.update({
             'headers': {'PddToken': self._token}
         })
-        try:
-            r = getattr(requests, method)(u'%s%s/%s' % (self._url, u'registrar' if self._registrar else u'admin', name), **kwargs)
-        except Exception:
-            raise YandexPddException(u'Request error: send', name, data)
-        try:
-            json = r.json()
-        except Exception:
-            raise YandexPddException(u'Request error: json', name, data, r.text)
+        return method, u'%s%s/%s' % (self._url, u'registrar' if self._registrar else u'admin', name), kwargs
+
+    @staticmethod
+    def _response_check(json):
+        """
+        Check yandex response
+        :param json: response dict
+        :raise YandexPddExceptionY: yandex exception - success=false
+        :return: dict
+        """
         if not json.get('success') or json['success'] != 'ok':
             if not json.get('error'):
                 json['error'] = u'Unknown'
             raise YandexPddExceptionY(json['error'])
         return json
 
-    # -----------------------------------------------------------------------------------------------------------------
-    # DOMAIN ACTIONS
-    # -----------------------------------------------------------------------------------------------------------------
-
-    def domain_list(self, page=1, on_page=30):
+    def _cache_get(self, name, method, data):
         """
-        Domain list
-        :param page: Page
-        :param on_page: Items on page
-        :return: dict
+        Cached response of request
+        :param name: url path
+        :param method: request method - get/post
+        :param data: request params
+        :return: tuple: cache key / None - not cached path, response / None
         """
-        return self._request('domain/domains', inspect_args_func(inspect.currentframe()), method='get')
+        cache = self.cache
+        if cache is None or method != 'get' or cache.ttl(name) <= 0:
+            return None, None
+        key = cache.key(self._registrar, name, data)
+        return key, cache.get(key)
 
-    def domain_list_all(self):
+    def _cache_invalidate(self, name, data):
         """
-        Full list of domains
-        :return: list
+        Remove cached responses changed by request
+        :param name: url path
+        :param data: request params
         """
-        page = 1
-        on_page = 100
-        ret = []
-        while True:
-            r = self.domain_list(page=page, on_page=on_page)
-            ret += r['domains']
-            if len(ret) >= r['total']:
-                break
-            page += 1
-        return ret
+        if self.cache is None:
+            return
+        endpoint = ENDPOINTS_BY_PATH.get(name)
+        self.cache.invalidate(data.get('domain'), endpoint.invalidates if endpoint is not None else None)
 
-    def domain_register(self):
+    def _cache_drop(self, name):
         """
-        Register domain
-        :return: dict
+        Remove cached responses of path, next request reads current state: plan of sync is not made from stale one
+        :param name: url path
         """
-        return self._request('domain/register', inspect_args_func(inspect.currentframe()))
+        if self.cache is not None:
+            self.cache.invalidate(self._domain, (name,))
 
-    @response_full_d('status')
-    def domain_registration_status(self):
+    def add_hook(self, before=None, after=None):
         """
-        Registration status
-        :return: str: domain-activate;mx-activate;added / dict
+        Add request hooks
+        :param before: callable(RequestInfo) called before request is sent
+        :param after: callable(RequestInfo) called after response / error, with duration, size and outcome
+        """
+        if before is not None:
+            self.hooks_before.append(before)
+        if after is not None:
+            self.hooks_after.append(after)
+
+    def _request_start(self, name, method, data):
         """
-        return self._request('domain/registration_status', inspect_args_func(inspect.currentframe()), method='get')
+        Call before request hooks
+        :param name: url path
+        :param method: request method - get/post
+        :param data: data / args of request
+        :return: RequestInfo / None - no hooks
+        """
+        if not self.hooks_before and not self.hooks_after:
+            return None
+        info = RequestInfo(name, method, data.get('domain') or self._domain, time.time())
+        for hook in self.hooks_before:
+            hook(info)
+        return info
+
+    def _request_end(self, info, size, error):
+        """
+        Call after request hooks
+        :param info: RequestInfo of _request_start
+        :param size: size of response / None
+        :param error: exception / None
+        """
+        if info is None:
+            return
+        info.duration = time.time() - info.started
+        info.size = size
+        info.error = error
+        if error is None:
+            info.outcome = OK
+        elif isinstance(error, YandexPddExceptionY):
+            info.outcome = ERROR
+        elif getattr(error, 'transport', False):
+            info.outcome = TRANSPORT
+        else:
+            info.outcome = BAD_RESPONSE
+        for hook in self.hooks_after:
+            hook(info)
 
-    def domain_details(self):
+    def _send(self, name, data, method, url, kwargs):
         """
-        Domain details
+        Send request
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param url: request url
+        :param kwargs: requests args
+        :raise YandexPddException: bad request, jsonify failed
+        :raise YandexPddExceptionY: yandex exception - success=false
         :return: dict
         """
-        return self._request('domain/details', inspect_args_func(inspect.currentframe()), method='get')
+        info = self._request_start(name, method, data)
+        size = None
+        try:
+            try:
+                r = self._get_session().request(method, url, timeout=self.timeout, **kwargs)
+            except Exception as e:
+                raise YandexPddException(u'Request error: send', name, data, transport=True, sent=request_sent(e))
+            size = len(r.content)
+            try:
+                json = json_loads(r.content)
+            except Exception:
+                raise YandexPddException(u'Request error: json', name, data, r.text, status=r.status_code)
+            json = self._response_check(json)
+        except Exception as e:
+            self._request_end(info, size, e)
+            raise
+        self._request_end(info, size, None)
+        return json
 
-    @response_full_d(True)
-    def domain_delete(self):
+    def _retry_delay(self, error, attempt, name, method):
         """
-        Domain delete
-        :return: True / dict
+        Delay before retry of failed request
+        :param error: YandexPddException / YandexPddExceptionY
+        :param attempt: retries done
+        :param name: url path
+        :param method: request method - get/post
+        :return: seconds / None - do not retry
         """
-        return self._request('domain/delete', inspect_args_func(inspect.currentframe()))
+        kind = self.retry.classify(error)
+        if kind == THROTTLE and self.rate_limiter is not None:
+            self.rate_limiter.throttled()
+        endpoint = ENDPOINTS_BY_PATH.get(name)
+        idempotent = endpoint.idempotent if endpoint is not None else method == 'get'
+        if not self.retry.retryable(kind, attempt, idempotent):
+            return None
+        return self.retry.delay(attempt)
 
-    @response_full_d(True)
-    def domain_settings_set_country(self, country):
+    def _send_retry(self, name, data, method, url, kwargs):
         """
-        Set country for domain
-        :param country: Country name by ISO 3166-1
-        :return: True / dict
+        Send request with rate limit and retries
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :param url: request url
+        :param kwargs: requests args
+        :return: dict
         """
-        return self._request('domain/settings/set_country', inspect_args_func(inspect.currentframe()))
-
-    # -----------------------------------------------------------------------------------------------------------------
-    # EMAIL ACTIONS
-    # -----------------------------------------------------------------------------------------------------------------
+        attempt = 0
+        switches = 0
+        while True:
+            token = None
+            if self.tokens is not None:
+                token, delay = self.tokens.take()
+                kwargs['headers'] = {'PddToken': token.token}
+                if delay:
+                    time.sleep(delay)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                json = self._send(name, data, method, url, kwargs)
+            except (YandexPddException, YandexPddExceptionY) as e:
+                # Each token is tried once, quarantine of rejected ones is not waited for
+                if token is not None and self.tokens.release(token, e) and switches < len(self.tokens) - 1:
+                    switches += 1
+                    continue
+                delay = self._retry_delay(e, attempt, name, method)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if token is not None:
+                self.tokens.release(token)
+            if self.rate_limiter is not None:
+                self.rate_limiter.success()
+            return json
 
-    @response_full_d('uid')
-    def email_add(self, login, password):
+    def _request(self, name, data, method='post'):
         """
-        Email add
-        :param login: email
-        :param password: password
-        :return: uid(int) / dict
+        Base request method
+        :param name: url path
+        :param data: data / args of request
+        :param method: request method - get/post
+        :raise YandexPddException: bad request, jsonify failed
+        :raise YandexPddExceptionY: yandex exception - success=false
+        :return: dict
         """
-        return self._request('email/add', inspect_args_func(inspect.currentframe()))
+        method, url, kwargs = self._request_args(name, data, method)
+        params = kwargs.get('params', kwargs.get('data'))
+        key, json = self._cache_get(name, method, params)
+        if json is not None:
+            return json
+        try:
+            if method == 'get' and self.coalesce is not None:
+                json = self.coalesce.do(key or ResponseCache.key(self._registrar, name, params),
+                                        lambda: self._send_retry(name, data, method, url, kwargs))
+            else:
+                json = self._send_retry(name, data, method, url, kwargs)
+        finally:
+            if method == 'post':
+                self._cache_invalidate(name, params)
+        if key is not None:
+            self.cache.set(key, json, self.cache.ttl(name))
+        return json
 
-    def email_list(self, page=1, on_page=30):
+    def _call(self, endpoint, data):
         """
-        Email list
-        :param page: Page
-        :param on_page: Items on page
-        :return: dict
+        Call api method
+        :param endpoint: endpoints.Endpoint
+        :param data: arguments of method
+        :return: mixed
         """
-        return self._request('email/list', inspect_args_func(inspect.currentframe()), method='get')
+        return endpoint.response(self, self._request(endpoint.path, endpoint.prepare(data), endpoint.method))
 
-    def email_list_all(self):
+    def _list_all(self, func, key, on_page, workers, checkpoint=None):
         """
-        Email full list
+        Fetch all pages of list: first one for count of pages, others in parallel
+        :param func: list method with page, on_page args
+        :param key: key of items in response
+        :param on_page: Items on page
+        :param workers: Pages fetched in parallel
+        :param checkpoint: Checkpoint: fetched pages are saved, pages saved by failed walk are not fetched again
         :return: list
         """
-        pages = None
-        page = 1
-        on_page = 100
-        ret = []
-        while True:
-            r = self.email_list(page=page, on_page=on_page)
-            if pages is None:
-                pages = r['pages']
-            ret += r['accounts']
-            if page > pages:
-                break
-            page += 1
+        job, saved = self._list_checkpoint(func, key, on_page, checkpoint)
+
+        def fetch(page):
+            if page in saved:
+                return self._page_restore(func, key, saved[page])
+            r = func(page=page, on_page=on_page)
+            if checkpoint is not None:
+                self._page_save(checkpoint, job, page, key, r)
+            return r
+
+        r = fetch(1)
+        ret = list(r[key])
+        pages = pages_count(r, on_page)
+        if pages > 1:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, pages - 1))) as executor:
+                # All pages are fetched and saved even if one of them fails
+                futures = [executor.submit(fetch, page) for page in range(2, pages + 1)]
+                for future in futures:
+                    ret += future.result()[key]
+        if checkpoint is not None:
+            checkpoint.clear(job)
         return ret
 
-    @response_full_d(True)
-    def email_edit(self, login=None, uid=None, password=None, iname=None, fname=None, enabled=None, birth_date=None, sex=None, hintq=None, hinta=None):
+    def _list_checkpoint(self, func, key, on_page, checkpoint):
         """
-        Email edit
-        :param login: |Login / email
-        :param uid: |Email uid
-        :param password: Password
-        :param iname: First name
-        :param fname: Second name
-        :param enabled: bool
-        :param birth_date: datetime / %Y-%m-%d
-        :param sex: 0-not set;1-male;2-female
-        :param hintq: Secret question
-        :param hinta: Secret answer
-        :return: True / dict
-        """
-        if not login and not uid:
-            raise ValueError('Login or uid required')
-        data = inspect_args_func(inspect.currentframe())
-        if data.get('enabled'):
-            data['enabled'] = 'yes' if data['enabled'] else 'no'
-        if data.get('bith_date'):
-            if isinstance(data['bith_date'], datetime.date):
-                data['bith_date'] = data['bith_date'].strftime('%Y-%m-%d')
-        return self._request('email/edit', data)
-
-    @response_full_d(True)
-    def email_del(self, login=None, uid=None):
-        """
-        Email delete
-        :param login: |Login / email
-        :param uid: |Email uid
-        :return: True / dict
+        Job of list walk in checkpoint
+        :return: tuple: job name, dict of saved pages
         """
-        if not login and not uid:
-            raise ValueError('Login or uid required')
-        return self._request('email/del', inspect_args_func(inspect.currentframe()))
+        if checkpoint is None:
+            return None, {}
+        job = u'%s %s.%s on_page=%d' % (self._domain, func.__name__, key, on_page)
+        state = checkpoint.job(job)
+        return job, dict(state.pages) if state is not None else {}
+
+    @staticmethod
+    def _page_save(checkpoint, job, page, key, r):
+        checkpoint.page(job, page, r[key], {k: v for k, v in r.items() if k != key})
 
-    @response_full_d('counters')
-    def email_counters(self, login=None, uid=None):
+    def _page_restore(self, func, key, saved):
         """
-        Email counters - messages
-        :param login: |Login / email
-        :param uid: |Email uid
+        Response of page saved in checkpoint, items are records for typed clients
+        :param saved: (items, response without items)
         :return: dict
         """
-        if not login and not uid:
-            raise ValueError('Login or uid required')
-        return self._request('email/counters', inspect_args_func(inspect.currentframe()), method='get')
+        items, response = saved
+        r = dict(response)
+        r[key] = items
+        endpoint = ENDPOINTS_BY_NAME.get(func.__name__)
+        if self.typed and endpoint is not None and endpoint.records is not None:
+            r = records_convert(r, *endpoint.records)
+        return r
+
+    def _iter_pages(self, func, key, on_page):
+        """
+        Iterate items of list page by page, next page is fetched in background while current one is processed
+        :param func: list method with page, on_page args, returns full response
+        :param key: key of items in response
+        :param on_page: Items on page
+        :return: generator
+        """
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            page = 1
+            pages = None
+            future = executor.submit(func, page=page, on_page=on_page)
+            while future is not None:
+                r = future.result()
+                items = r[key]
+                if pages is None and (r.get('pages') is not None or r.get('total') is not None):
+                    pages = pages_count(r, on_page)
+                page += 1
+                future = None
+                if (page <= pages) if pages is not None else (len(items) >= on_page):
+                    future = executor.submit(func, page=page, on_page=on_page)
+                for item in items:
+                    yield item
+        finally:
+            executor.shutdown(wait=False)
+
+    def _bulk(self, func, specs, workers, on_done):
+        """
+        Bulk call of method
+        :param func: method
+        :param specs: iterable of items - dict of kwargs / tuple of args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: BulkJob
+        """
+        return BulkJob(func, specs, workers=workers, on_done=on_done)
 
     # -----------------------------------------------------------------------------------------------------------------
-    # MAIL LIST ACTIONS
+    # DOMAIN ACTIONS
     # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d('uid')
-    def email_ml_add(self, maillist):
+    def domain_list_all(self, workers=4, on_page=100, checkpoint=None):
         """
-        Mail list add
-        :param maillist: email
-        :return: uid(int) / dict
+        Full list of domains
+        :param workers: Pages fetched in parallel
+        :param on_page: Items on page
+        :param checkpoint: Checkpoint: walk failed on page N continues from it when called again
+        :return: list
         """
-        return self._request('email/ml/add', inspect_args_func(inspect.currentframe()))
-
-    ml_add = email_ml_add  # Alias
+        return self._list_all(self.domain_list, 'domains', on_page, workers, checkpoint)
 
-    @response_full_d('maillists')
-    def email_ml_list(self):
+    def iter_domains(self, on_page=100):
         """
-        List of mail lists
-        :return: list / dict
+        Iterate domains, page by page
+        :param on_page: Items on page
+        :return: generator of dict
         """
-        return self._request('email/ml/list', inspect_args_func(inspect.currentframe()), method='get')
+        return self._iter_pages(self.domain_list, 'domains', on_page)
 
-    ml_list = email_ml_list  # Alias
+    # -----------------------------------------------------------------------------------------------------------------
+    # EMAIL ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d(True)
-    def email_ml_del(self, maillist=None, maillist_uid=None):
+    def email_list_all(self, workers=4, on_page=100, checkpoint=None):
         """
-        Mail list delete
-        :param maillist: |Email
-        :param maillist_uid: |Email uid
-        :return: True / dict
+        Email full list
+        :param workers: Pages fetched in parallel
+        :param on_page: Items on page
+        :param checkpoint: Checkpoint: walk failed on page N continues from it when called again
+        :return: list
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        return self._request('email/ml/del', inspect_args_func(inspect.currentframe()))
-
-    ml_del = email_ml_del  # Alias
+        return self._list_all(self.email_list, 'accounts', on_page, workers, checkpoint)
 
-    @response_full_d(True)
-    def email_ml_subscribe(self, maillist=None, maillist_uid=None, subscriber=None, subscriber_uid=None, can_send_on_behalf=None):
+    def iter_emails(self, on_page=100):
         """
-        Mail list subscribe email
-        :param maillist: |Email
-        :param maillist_uid: |Email uid
-        :param subscriber: |Email subscriber
-        :param subscriber_uid: |Email subscriber uid
-        :param can_send_on_behalf: can send by email list name
-        :return: True / dict
+        Iterate emails, page by page
+        :param on_page: Items on page
+        :return: generator of dict
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        if not subscriber and not subscriber_uid:
-            raise ValueError('Subscriber or uid required')
-        return self._request('email/ml/subscribe', inspect_args_func(inspect.currentframe()))
-
-    ml_subscribe = email_ml_subscribe  # Alias
+        return self._iter_pages(self.email_list, 'accounts', on_page)
 
-    @response_full_d('subscribers')
-    def email_ml_subscribers(self, maillist=None, maillist_uid=None):
+    def _counters_cached(self, account):
         """
-        Mail list subscribes list
-        :param maillist: | Email
-        :param maillist_uid: |Email uid
-        :return: list / dict
+        Counters of account kept by iter_counters, client cache is not used
+        :param account: dict of email_list
+        :return: tuple: cache key, counters dict / None
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        return self._request('email/ml/subscribers', inspect_args_func(inspect.currentframe()), method='get')
-
-    ml_subscribers = email_ml_subscribers # Alias
+        with self._counters_lock:
+            if self._counters_cache is None:
+                self._counters_cache = ResponseCache(ttls={}, max_size=65536)
+        key = ResponseCache.key(self._registrar, 'email/counters', {'domain': self._domain, 'login': account['login']})
+        return key, self._counters_cache.get(key)
 
-    @response_full_d(True)
-    def email_ml_unsubscribe(self, maillist=None, maillist_uid=None, subscriber=None, subscriber_uid=None):
+    def _counters_of(self, account, cache_ttl=None):
         """
-        Email list unsubscribe email
-        :param maillist: |Email
-        :param maillist_uid: |Email uid
-        :param subscriber: |Email subscriber
-        :param subscriber_uid: |Email subscriber uid
-        :return: True / dict
+        Counters of account, kept for cache_ttl
+        :param account: dict of email_list
+        :param cache_ttl: seconds / None - not kept
+        :return: dict
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        if not subscriber and not subscriber_uid:
-            raise ValueError('Subscriber or uid required')
-        return self._request('email/ml/unsubscribe', inspect_args_func(inspect.currentframe()))
-
-    ml_unsubscribe = email_ml_unsubscribe # Alias
+        if not cache_ttl:
+            return self.email_counters(login=account['login'])
+        key, counters = self._counters_cached(account)
+        if counters is None:
+            counters = self.email_counters(login=account['login'])
+            self._counters_cache.set(key, counters, cache_ttl)
+        return counters
+
+    def iter_counters(self, workers=8, on_page=100, cache_ttl=None):
+        """
+        Counters of all accounts: accounts are listed page by page, counters are fetched concurrently
+        while next pages are loading
+        :param workers: counters fetched concurrently
+        :param on_page: Items on page of email_list
+        :param cache_ttl: seconds counters are kept by client for next calls / None - not kept
+        :return: generator of BulkResult in order of completion: spec - account, result - counters dict
+        """
+        accounts = ((account, cache_ttl) for account in self.iter_emails(on_page=on_page))
+        for r in self._bulk(self._counters_of, accounts, workers, None):
+            r.spec = r.spec[0]
+            yield r
+
+    def collect_counters(self, workers=8, on_page=100, cache_ttl=None, on_error=None):
+        """
+        Counters of all accounts, see iter_counters
+        :param workers: counters fetched concurrently
+        :param on_page: Items on page of email_list
+        :param cache_ttl: seconds counters are kept by client for next calls / None - not kept
+        :param on_error: callback(account, exception) for failed accounts, they are missing in result
+        :return: dict: login -> counters dict
+        """
+        ret = {}
+        for r in self.iter_counters(workers, on_page, cache_ttl):
+            if r.ok:
+                ret[r.spec['login']] = r.result
+            elif on_error is not None:
+                on_error(r.spec, r.error)
+        return ret
 
-    @response_full_d('can_send_on_behalf')
-    def email_ml_get_can_send_on_behalf(self, maillist=None, maillist_uid=None, subscriber=None, subscriber_uid=None):
+    def email_add_many(self, specs, workers=8, on_done=None):
         """
-        Email list get subscriber can send mail by name of mail list
-        :param maillist: |Email
-        :param maillist_uid: |Email uid
-        :param subscriber: |Email subscriber
-        :param subscriber_uid: |Email subscriber uid
-        :return: bool / dict
+        Email add for many mailboxes
+        :param specs: iterable of (login, password) / dict of email_add args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: BulkJob - iterable of BulkResult
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        if not subscriber and not subscriber_uid:
-            raise ValueError('Subscriber or uid required')
-        return self._request('email/ml/get_can_send_on_behalf', inspect_args_func(inspect.currentframe()), method='get')
-
-    ml_send_get = email_ml_get_can_send_on_behalf # Alias
+        return self._bulk(self.email_add, specs, workers, on_done)
 
-    @response_full_d(True)
-    def email_ml_set_can_send_on_behalf(self, maillist=None, maillist_uid=None, subscriber=None, subscriber_uid=None, can_send_on_behalf=None):
+    def email_edit_many(self, specs, workers=8, on_done=None):
         """
-        Email list set subscriber can send mail by name of mail list
-        :param maillist: |Email
-        :param maillist_uid: |Email uid
-        :param subscriber: |Email subscriber
-        :param subscriber_uid: |Email subscriber uid
-        :param can_send_on_behalf: can send by email list name
-        :return: True / dict
+        Email edit for many mailboxes
+        :param specs: iterable of dict of email_edit args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: BulkJob - iterable of BulkResult
         """
-        if not maillist and not maillist_uid:
-            raise ValueError('Maillist or uid required')
-        if not subscriber and not subscriber_uid:
-            raise ValueError('Subscriber or uid required')
-        return self._request('email/ml/set_can_send_on_behalf', inspect_args_func(inspect.currentframe()))
-
-    ml_send_set = email_ml_set_can_send_on_behalf  # Alias
-
-    # -----------------------------------------------------------------------------------------------------------------
-    # IMPORT MAILBOX ACTIONS
-    # -----------------------------------------------------------------------------------------------------------------
+        return self._bulk(self.email_edit, specs, workers, on_done)
 
-    @response_full_d(True)
-    def import_check_settings(self, method='imap', server='imap.yandex.ru', port=993, ssl=True):
-        """
-        Check that yandex can import server
-        :param method: imap;imap4;pop;pop3
-        :param server: Domain name / ip ext server
-        :param port: Port
-        :param ssl: bool
-        :return: True / dict
-        """
-        return self._request('import/check_settings', inspect_args_func(inspect.currentframe()), method='get')
-
-    @response_full_d(True)
-    def import_start_one_import(self, method='imap', server='imap.yandex.ru', port=993, ssl=True, ext_login=None, ext_passwd=None, int_login=None, int_passwd=None):
-        """
-        Import mailbox
-        :param method: imap;imap4;pop;pop3
-        :param server: Domain name / ip ext server
-        :param port: Port
-        :param ssl: bool
-        :param ext_login: External login
-        :param ext_passwd: External password
-        :param int_login: opt, internal login
-        :param int_passwd: opt, internal password
-        :return:
-        """
-        data = inspect_args_func(inspect.currentframe())
-        for key in data:
-            for key_fix in ['ext', 'int']:
-                if key.startswith('%s_' % key_fix):
-                    data['%s-%s' % (key_fix, key[len(key_fix) + 1:])] = data[key]
-                    del data[key]
-        return self._request('import/start_one_import', data)
-
-    @response_full_d('import')
-    def import_check_imports(self, page=1, on_page=10):
-        """
-        Check status of imports
-        :param page: Page
-        :param on_page: Items on page
-        :return: list / dict
+    def email_edit_queue(self, window=0.2, workers=4):
         """
-        return self._request('import/check_imports', inspect_args_func(inspect.currentframe()), method='get')
+        Write-behind queue of email edit: changes of mailbox made within window are sent by one request
+        :param window: seconds changes of mailbox are collected before request
+        :param workers: requests sent concurrently
+        :return: EditQueue
+        """
+        return EditQueue(self, window, workers)
 
-    @response_full_d(True)
-    def import_stop_all_imports(self):
+    def email_del_many(self, specs, workers=8, on_done=None):
         """
-        Stop all imports
-        :return: True / dict
+        Email delete for many mailboxes
+        :param specs: iterable of login / dict of email_del args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: BulkJob - iterable of BulkResult
         """
-        return self._request('import/stop_all_imports', inspect_args_func(inspect.currentframe()))
+        return self._bulk(self.email_del, specs, workers, on_done)
 
     # -----------------------------------------------------------------------------------------------------------------
-    # ADMIN ACTIONS
+    # MAIL LIST ACTIONS
     # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d(True)
-    def deputy_add(self, login):
-        """
-        Add subadmin for domain
-        :param login: Email, *@yandex.ru
-        :return: True / dict
-        """
-        return self._request('deputy/add', inspect_args_func(inspect.currentframe()))
+    def sync_maillist(self, maillist, desired_subscribers, dry_run=False, workers=4, prune=True):
+        """
+        Bring subscribers of mail list to desired ones
+        :param maillist: Email of mail list
+        :param desired_subscribers: iterable of email / mapping email -> can send on behalf
+        :param dry_run: only plan changes
+        :param workers: operations run concurrently
+        :param prune: unsubscribe emails missing in desired
+        :return: MaillistPlan
+        """
+        self._cache_drop('email/ml/subscribers')
+        current = self._request('email/ml/subscribers', {'maillist': maillist}, method='get')['subscribers']
+        plan = MaillistPlan.plan(maillist, current, desired_subscribers, prune=prune)
+        if dry_run:
+            return plan
+        return plan.apply(self, workers=workers)
+
+    def sync_maillists(self, desired, dry_run=False, workers=4, prune=True, list_workers=1):
+        """
+        Bring subscribers of mail lists to desired ones. Lists of email_ml_list missing in desired are not changed
+        :param desired: mapping email / name of mail list -> desired subscribers of sync_maillist
+        :param dry_run: only plan changes
+        :param workers: mail lists processed concurrently
+        :param prune: unsubscribe emails missing in desired
+        :param list_workers: operations of one mail list run concurrently, up to workers * list_workers requests
+        :return: dict: lower email of mail list -> MaillistPlan / exception, YandexPddExceptionY('not_found') - no list
+        """
+        desired = maillists_map(desired, self._domain)
+        self._cache_drop('email/ml/list')
+        maillists = self._request('email/ml/list', {}, method='get')['maillists']
+        maillists = {item['maillist'].lower(): item['maillist'] for item in maillists}
+
+        def sync(maillist):
+            return self.sync_maillist(maillist, desired[maillist.lower()], dry_run=dry_run, workers=list_workers,
+                                      prune=prune)
+
+        job = self._bulk(sync, [maillists[maillist] for maillist in desired if maillist in maillists], workers, None)
+        ret = {r.spec.lower(): r.result if r.ok else r.error for r in job}
+        for maillist in desired:
+            if maillist not in maillists:
+                ret[maillist] = YandexPddExceptionY('not_found')
+        return ret
 
-    @response_full_d('deputies')
-    def deputy_list(self):
-        """
-        Get subadmin list for domain
-        :return: list / dict
-        """
-        return self._request('deputy/list', inspect_args_func(inspect.currentframe()), method='get')
+    # -----------------------------------------------------------------------------------------------------------------
+    # IMPORT MAILBOX ACTIONS
+    # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d(True)
-    def deputy_delete(self, login):
+    def iter_imports(self, on_page=10):
         """
-        Remove subadmin from domain
-        :param login: Email, *@yandex.ru
-        :return: True / dict
+        Iterate status of imports, page by page
+        :param on_page: Items on page
+        :return: generator of dict
         """
-        return self._request('deputy/delete', inspect_args_func(inspect.currentframe()))
-
-    # -----------------------------------------------------------------------------------------------------------------
-    # DKIM ACTIONS
-    # -----------------------------------------------------------------------------------------------------------------
+        def func(page, on_page):
+            return self._request('import/check_imports', {'page': page, 'on_page': on_page}, method='get')
+        return self._iter_pages(func, 'import', on_page)
 
-    @response_full_d('dkim')
-    def dkim_status(self, secretkey=None):
+    def import_start_many(self, specs, workers=4, on_done=None):
         """
-        DKIM get status
-        :param secretkey: bool, get secret key
-        :return: dict
+        Import many mailboxes
+        :param specs: iterable of dict of import_start_one_import args
+        :param workers: items called concurrently
+        :param on_done: callback(job) when all items are done
+        :return: BulkJob - iterable of BulkResult
         """
-        data = inspect_args_func(inspect.currentframe())
-        data['secretkey'] = 'yes' if data['secretkey'] else None
-        return self._request('dkim/status', data, method='get')
+        return self._bulk(self.import_start_one_import, specs, workers, on_done)
 
-    @response_full_d('dkim')
-    def dkim_enable(self):
+    def import_watch(self, logins=None, **kwargs):
         """
-        DKIM enable
-        :return: dict
+        Watcher of imports
+        :param logins: logins of tracked imports / None - all imports
+        :param kwargs: args of ImportWatcher: on_event, min_interval, max_interval, stall_timeout...
+        :return: ImportWatcher
         """
-        return self._request('dkim/enable', inspect_args_func(inspect.currentframe()))
+        return ImportWatcher(self, logins, **kwargs)
 
-    @response_full_d('dkim')
-    def dkim_disable(self):
+    def import_migrate(self, specs, workers=4, timeout=None, **kwargs):
         """
-        DKIM disable
-        :return: dict
+        Start imports of mailboxes and wait until all of them are finished or stalled
+        :param specs: iterable of dict of import_start_one_import args
+        :param workers: imports started concurrently
+        :param timeout: max seconds of watching / None - no limit
+        :param kwargs: args of ImportWatcher: on_event, min_interval, max_interval, stall_timeout...
+        :return: ImportWatcher
         """
-        return self._request('dkim/disable', inspect_args_func(inspect.currentframe()))
+        watcher = ImportWatcher(self, [], **kwargs)
+        for r in self.import_start_many(specs, workers).results():
+            watcher.add(r.spec, r.error)
+        return watcher.watch(timeout)
 
     # -----------------------------------------------------------------------------------------------------------------
     # DNS ACTIONS
     # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d('record')
-    def dns_add(self, type, admin_mail=None, content=None, priority=None, weight=None, port=None, target=None, subdomain=None, ttl=None):
-        """
-        DNS add record
-        :param type: SRV;TXT;NS;MX;SOA;A;AAAA;CNAME.
-        :param admin_mail: admin mail
-        :param content: value
-        :param priority: int
-        :param weight: int
-        :param port: int
-        :param target: value
-        :param subdomain: value
-        :param ttl: int
-        :return: dict
-        """
-        return self._request('dns/add', inspect_args_func(inspect.currentframe()))
-
-    @response_full_d('records')
-    def dns_list(self):
-        """
-        DNS get records
-        :return: list / dict
-        """
-        return self._request('dns/list', inspect_args_func(inspect.currentframe()), method='get')
-
-    @response_full_d(True)
-    def dns_edit(self, record_id, admin_mail=None, content=None, priority=None, weight=None, port=None, target=None, subdomain=None, ttl=None):
+    def sync_dns(self, desired_records, dry_run=False, workers=4, keep_types=DNS_KEEP_TYPES):
         """
-        DNS edit record
-        :param record_id: Record id
-        :param admin_mail: admin mail
-        :param content: value
-        :param priority: int
-        :param weight: int
-        :param port: int
-        :param target: value
-        :param subdomain: value
-        :param ttl: int
-        :return: True / dict
+        Bring DNS zone to desired records by minimal count of dns_add / dns_edit / dns_del
+        :param desired_records: list of dict: type, subdomain, content, priority, weight, port, target, ttl
+        :param dry_run: only plan changes
+        :param workers: operations run concurrently
+        :param keep_types: types of records not deleted when missing in desired
+        :return: DnsPlan
         """
-        return self._request('dns/edit', inspect_args_func(inspect.currentframe()))
-
-    @response_full_d(True)
-    def dns_del(self, record_id):
-        """
-        DNS delete record
-        :param record_id: Record id
-        :return: True / dict
-        """
-        return self._request('dns/del', inspect_args_func(inspect.currentframe()))
+        self._cache_drop('dns/list')
+        current = self._request('dns/list', {}, method='get')['records']
+        plan = DnsPlan.plan(current, desired_records, keep_types=keep_types)
+        if dry_run:
+            return plan
+        return plan.apply(self, workers=workers)
 
     # -----------------------------------------------------------------------------------------------------------------
     # AUTH ACTIONS
     # -----------------------------------------------------------------------------------------------------------------
 
-    @response_full_d('oauth-token')
-    def email_get_oauth_token(self, login=None, uid=None):
+    def oauth_token(self, login=None, uid=None, refresh=False):
         """
-        Get oauth token
+        Oauth token of mailbox, from oauth cache when it is set
         :param login: |Email / login
         :param uid: |Email uid
-        :return: str / dict
-        """
-        return self._request('email/get_oauth_token', inspect_args_func(inspect.currentframe()))
+        :param refresh: get new token even if cached one is not expired
+        :return: str
+        """
+        cache = self.oauth_cache
+        if cache is not None and not refresh:
+            token = cache.get(self._domain, login, uid)
+            if token is not None:
+                return token
+        token = self.email_get_oauth_token(login=login, uid=uid)
+        if cache is not None:
+            cache.set(self._domain, token, login, uid)
+        return token
+
+    def oauth_prefetch(self, logins, workers=8, on_done=None):
+        """
+        Get tokens of many mailboxes ahead of time: missing in oauth cache and expiring soon.
+        Tokens are fetched before return
+        :param logins: iterable of Email / login
+        :param workers: tokens fetched concurrently
+        :param on_done: callback(job) when all items are done
+        :return: list of BulkResult in order of fetched logins
+        """
+        if self.oauth_cache is None:
+            raise ValueError('oauth_cache is not set')
+        logins = [(login, None, True) for login in logins if not self.oauth_cache.fresh(self._domain, login)]
+        return self._bulk(self.oauth_token, logins, workers, on_done).results()
 
     def passport_oauth(self, retpath, access_token=None, email=None):
         """
         Get link for auth
         :param retpath: return url
         :param access_token: |access token
-        :param email: |email
-        :return:
+        :param email: |email, token is taken from oauth cache when it is set
+        :return: str
         """
         data = {
             'retpath': retpath,
@@ -608,5 +940,6 @@ class YandexPdd(object):
         if not data['access_token']:
             if not email:
                 raise ValueError('Access token or email required')
-            data['access_token'] = self.email_get_oauth_token(login=email)
-        return ''''https://passport.yandex.ru/passport?mode=oauth&access_token=%(access_token)s&type=trusted-pdd-partner&retpath=%(retpath)s''' % data
+            data['access_token'] = self.oauth_token(login=email)
+        return ('https://passport.yandex.ru/passport?mode=oauth&access_token=%(access_token)s'
+                '&type=trusted-pdd-partner&retpath=%(retpath)s') % data